@@ -1,16 +1,226 @@
 #include <WiFi.h>
 #include <HTTPClient.h>
 #include <ArduinoJson.h>
+#include <Preferences.h>
+#include <sys/time.h>
 
-// wifi 
+// wifi
 const char* ssid = "Ronits_phone";
 const char* password = "hotspott";
 
 // server id
-const char* serverURL = "http://10.43.232.8:5000/api/data";  // Adjust to your PC IP
+// readings go to the async ingestion server (port 5001), which keeps the
+// connection open between uploads
+const char* uploadURL = "http://10.43.232.8:5001/api/data/upload";  // Adjust to your PC IP
+const char* stationsURL = "http://10.43.232.8:5000/api/stations";
+
+// binary packets (port 5002) instead of JSON uploads; set to 0 for JSON
+#define USE_BINARY_PACKETS 1
+const char* serverHost = "10.43.232.8";
+const uint16_t packetPort = 5002;
+
+// station id, unique per node
+const char* stationId = "default";
+const char* stationName = "ESP32 station";
+
+// a reading every SAMPLE_INTERVAL_MS, uploaded in batches every
+// UPLOAD_INTERVAL_MS (sooner once UPLOAD_BATCH are waiting); readings
+// stay buffered until the server acks them, so outages lose nothing
+// until the buffer fills
+const unsigned long SAMPLE_INTERVAL_MS = 10000;
+const unsigned long UPLOAD_INTERVAL_MS = 60000;
+const uint16_t UPLOAD_BATCH = 30;
+#define BUFFER_SIZE 512  // 20 KB, over an hour of readings
+
+// kept across loop() so the TCP connection is reused
+WiFiClient dataClient;
+HTTPClient dataHttp;
+WiFiClient packetClient;
+
+// packet layout shared with the server (little-endian, no padding)
+struct __attribute__((packed)) PacketHeader {
+  char magic[2];        // "WX"
+  uint8_t version;      // 2: sequenced, the session follows
+  uint8_t stationLen;
+  uint16_t count;       // records following the station id
+};
+
+struct __attribute__((packed)) PacketRecord {
+  uint32_t seq;
+  int64_t timestamp;    // epoch ms, 0 = time received
+  float values[7];      // temperature, humidity, pressure, air_quality,
+                        // wind_speed, wind_direction, rainfall
+};
+
+struct __attribute__((packed)) PacketAck {
+  char magic[2];        // "WA"
+  uint8_t status;       // 0 ok, 1 invalid, 2 unknown station, 3 busy, 4 failed
+  uint8_t reserved;
+  uint32_t seq;         // highest sequence number stored without a gap
+};
+
+// readings not acked yet, oldest first
+PacketRecord buffer[BUFFER_SIZE];
+uint16_t bufferHead = 0;
+uint16_t bufferCount = 0;
+
+// bumped on every boot, so sequence numbers can start again from 1
+uint32_t session = 0;
+uint32_t nextSeq = 1;
+
+unsigned long lastSample = 0;
+unsigned long lastUpload = 0;
+
+void registerStation() {
+  HTTPClient http;
+  http.begin(stationsURL);
+  http.addHeader("Content-Type", "application/json");
+
+  DynamicJsonDocument doc(128);
+  doc["station_id"] = stationId;
+  doc["name"] = stationName;
+
+  String json;
+  serializeJson(doc, json);
+  int code = http.POST(json);
+  Serial.printf("Station registered. HTTP Response code: %d\n", code);
+  http.end();
+}
+
+// epoch ms from NTP, or 0 (server time) until the clock is set
+int64_t currentTimestamp() {
+  struct timeval tv;
+  gettimeofday(&tv, NULL);
+  if (tv.tv_sec < 1600000000) {
+    return 0;
+  }
+  return (int64_t)tv.tv_sec * 1000 + tv.tv_usec / 1000;
+}
+
+void sampleReading() {
+  if (bufferCount == BUFFER_SIZE) {
+    // keep the buffered readings; a gap in the sequence would stall uploads
+    Serial.println("Buffer full, reading dropped");
+    return;
+  }
+
+  // Create random test data
+  float temperature = random(200, 350) / 10.0;   // 20.0 - 35.0 °C
+  float humidity = random(400, 900) / 10.0;      // 40% - 90%
+  float pressure = random(9900, 10400) / 10.0;   // 990 - 1040 hPa
+  int air_quality = random(10, 200);              // arbitrary AQI value
+  float wind_speed = random(0, 200) / 10.0;       // 0 - 20 km/h
+  float wind_direction = random(0, 360);          // 0° - 359°
+  float rainfall = random(0, 50) / 10.0;         // 0 - 5.0 mm
+
+  PacketRecord record = {nextSeq++, currentTimestamp(),
+                         {temperature, humidity, pressure, (float)air_quality,
+                          wind_speed, wind_direction, rainfall}};
+  buffer[(bufferHead + bufferCount) % BUFFER_SIZE] = record;
+  bufferCount++;
+}
+
+// drops the buffered readings the server has stored
+void acknowledge(uint32_t ackSeq) {
+  while (bufferCount > 0 && buffer[bufferHead].seq <= ackSeq) {
+    bufferHead = (bufferHead + 1) % BUFFER_SIZE;
+    bufferCount--;
+  }
+}
+
+#if USE_BINARY_PACKETS
+// sends the oldest buffered readings as one sequenced packet over the
+// kept-open TCP connection; returns the acked seq, or -1 on failure
+int64_t uploadBatch(uint16_t count) {
+  if (!packetClient.connected() && !packetClient.connect(serverHost, packetPort)) {
+    return -1;
+  }
+  PacketHeader header = {{'W', 'X'}, 2, (uint8_t)strlen(stationId), count};
+  packetClient.write((const uint8_t*)&header, sizeof(header));
+  packetClient.write((const uint8_t*)&session, sizeof(session));
+  packetClient.write((const uint8_t*)stationId, header.stationLen);
+  for (uint16_t i = 0; i < count; i++) {
+    packetClient.write((const uint8_t*)&buffer[(bufferHead + i) % BUFFER_SIZE], sizeof(PacketRecord));
+  }
+
+  PacketAck ack;
+  packetClient.setTimeout(5);
+  if (packetClient.readBytes((uint8_t*)&ack, sizeof(ack)) != sizeof(ack) || ack.magic[0] != 'W' || ack.magic[1] != 'A') {
+    packetClient.stop();  // reconnect on the next upload
+    return -1;
+  }
+  return ack.status == 0 ? (int64_t)ack.seq : -1;
+}
+#else
+// posts the oldest buffered readings to /api/data/upload; returns the
+// acked seq, or -1 on failure
+int64_t uploadBatch(uint16_t count) {
+  static const char* fields[7] = {"temperature", "humidity", "pressure", "air_quality",
+                                  "wind_speed", "wind_direction", "rainfall"};
+  DynamicJsonDocument doc(256 + count * 256);
+  doc["station_id"] = stationId;
+  doc["session"] = session;
+  JsonArray readings = doc.createNestedArray("readings");
+  for (uint16_t i = 0; i < count; i++) {
+    const PacketRecord& record = buffer[(bufferHead + i) % BUFFER_SIZE];
+    JsonObject reading = readings.createNestedObject();
+    reading["seq"] = record.seq;
+    if (record.timestamp) {
+      reading["timestamp"] = record.timestamp;
+    }
+    for (int f = 0; f < 7; f++) {
+      reading[fields[f]] = record.values[f];
+    }
+    reading["air_quality"] = (int)record.values[3];
+  }
+
+  String json;
+  serializeJson(doc, json);
+  HTTPClient& http = dataHttp;
+  http.begin(dataClient, uploadURL);
+  http.addHeader("Content-Type", "application/json");
+  int code = http.POST(json);
+  int64_t ackSeq = -1;
+  if (code == 200) {
+    DynamicJsonDocument response(256);
+    if (!deserializeJson(response, http.getString())) {
+      ackSeq = response["ack"].as<uint32_t>();
+    }
+  }
+  // leaves the connection open for the next upload
+  http.end();
+  return ackSeq;
+}
+#endif
+
+// uploads everything buffered, a batch at a time, until the buffer is
+// empty or an upload fails; unacked readings are resent next time
+void uploadBuffered() {
+  while (bufferCount > 0) {
+    uint16_t count = bufferCount < UPLOAD_BATCH ? bufferCount : UPLOAD_BATCH;
+    int64_t ackSeq = uploadBatch(count);
+    if (ackSeq < 0) {
+      Serial.printf("Upload failed, %u readings buffered\n", bufferCount);
+      return;
+    }
+    uint16_t before = bufferCount;
+    acknowledge((uint32_t)ackSeq);
+    Serial.printf("Uploaded %u readings, ack %u\n", before - bufferCount, (uint32_t)ackSeq);
+    if (bufferCount == before) {
+      return;  // nothing new acked; try again at the next upload
+    }
+  }
+}
 
 void setup() {
   Serial.begin(115200);
+
+  Preferences prefs;
+  prefs.begin("weather", false);
+  session = prefs.getUInt("session", 0) + 1;
+  prefs.putUInt("session", session);
+  prefs.end();
+
   WiFi.begin(ssid, password);
 
   Serial.println("Connecting to WiFi...");
@@ -21,46 +231,34 @@ void setup() {
   Serial.println("\nWiFi connected!");
   Serial.print("IP Address: ");
   Serial.println(WiFi.localIP());
+
+  // modem sleep between uploads; the association and connection stay up
+  WiFi.setSleep(true);
+  configTime(0, 0, "pool.ntp.org");
+  registerStation();
+  dataHttp.setReuse(true);
 }
 
 void loop() {
-  if (WiFi.status() == WL_CONNECTED) {
-    HTTPClient http;
-    http.begin(serverURL);
-    http.addHeader("Content-Type", "application/json");
-
-    // Create random test data
-    float temperature = random(200, 350) / 10.0;   // 20.0 - 35.0 °C
-    float humidity = random(400, 900) / 10.0;      // 40% - 90%
-    float pressure = random(9900, 10400) / 10.0;   // 990 - 1040 hPa
-    int air_quality = random(10, 200);              // arbitrary AQI value
-    float wind_speed = random(0, 200) / 10.0;       // 0 - 20 km/h
-    float wind_direction = random(0, 360);          // 0° - 359°
-    float rainfall = random(0, 50) / 10.0;         // 0 - 5.0 mm
-
-    // Build JSON document
-    DynamicJsonDocument doc(256);
-    doc["temperature"] = temperature;
-    doc["humidity"] = humidity;
-    doc["pressure"] = pressure;
-    doc["air_quality"] = air_quality;
-    doc["wind_speed"] = wind_speed;
-    doc["wind_direction"] = wind_direction;
-    doc["rainfall"] = rainfall;
-
-    String json;
-    serializeJson(doc, json);
-
-    // Send POST request
-    int code = http.POST(json);
-    Serial.printf("Data sent. HTTP Response code: %d\n", code);
-    Serial.println(json);
-
-    http.end();
-  } else {
-    Serial.println("WiFi disconnected. Reconnecting...");
-    WiFi.begin(ssid, password);
+  unsigned long now = millis();
+  if (lastSample == 0 || now - lastSample >= SAMPLE_INTERVAL_MS) {
+    lastSample = now;
+    sampleReading();
+  }
+
+  // a full batch goes out early, but no more often than samples are taken
+  unsigned long waited = now - lastUpload;
+  bool due = bufferCount > 0 && (waited >= UPLOAD_INTERVAL_MS ||
+                                 (bufferCount >= UPLOAD_BATCH && waited >= SAMPLE_INTERVAL_MS));
+  if (due) {
+    lastUpload = now;
+    if (WiFi.status() == WL_CONNECTED) {
+      uploadBuffered();
+    } else {
+      Serial.println("WiFi disconnected. Reconnecting...");
+      WiFi.begin(ssid, password);
+    }
   }
 
-  delay(30000); // sends data every 30 seconds
+  delay(100);
 }
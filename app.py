@@ -1,56 +1,3484 @@
-from flask import Flask, request, jsonify, send_file, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, abort, make_response
 import sqlite3
-import pandas as pd
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import datetime, timedelta, timezone
+import asyncio
+import atexit
+import base64
+import functools
+import gzip
+import hashlib
+import heapq
+import itertools
+import csv
 import json
+import math
 import os
 import io
+import queue
+import re
+import socket
+import threading
+import struct
+import time
+from collections import OrderedDict
+import zlib
+from contextlib import contextmanager
+from concurrent.futures import Future, InvalidStateError
+from http import HTTPStatus
+
+from urllib.parse import quote
+
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Initialize Flask app; static files are served by static_asset()
+app = Flask(__name__, static_folder=None)
+app.config['JSON_SORT_KEYS'] = False
+
+# Database configuration
+DATABASE_PATH = 'weather_data.db'
+
+# Connection pool size and the pragmas every connection is opened with
+DB_POOL_SIZE = 8
+DB_BUSY_TIMEOUT = 5.0
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY'
+}
+
+# Cache headers for dashboard pages (always revalidate, usually a 304)
+# and for content-versioned static assets
+PAGE_CACHE_CONTROL = 'no-cache'
+STATIC_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Version of the stored data, bumped by every write this process makes.
+# Data endpoints use it as their ETag, so unchanged polls get a 304
+# without touching SQLite. The boot token keeps ETags from one run
+# from matching the next. Worker processes share the boot token and a
+# counter ('shared', see share_data_version()) so every worker gives
+# the same data the same ETag.
+_data_version = {'boot': os.urandom(4).hex(), 'version': 0, 'shared': None}
+_data_version_lock = threading.Lock()
+
+# How often (seconds) a process serving reads checks SQLite for
+# commits made by the writer process
+FOLLOW_INTERVAL = 0.2
+
+# Follower thread of this process and the newest reading it has applied
+_follower = {'thread': None, 'last_id': 0}
+
+# Response cache for read endpoints: most entries kept and how long
+# (seconds) an entry may be served before it is recomputed
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = 30.0
+
+# key -> (expiry, body, status, headers), least recently used first
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+# key -> Event set when the request computing that key finishes
+_response_cache_pending = {}
+_response_cache_stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+# Rendered pages and static assets, with precompressed bodies
+_page_cache = {}
+_asset_cache = {}
+
+# Idle connections kept for reuse by db_connection()
+_db_pool = queue.LifoQueue()
+
+# Timestamps are stored as UTC epoch milliseconds and shown in IST
+IST = timedelta(hours=5, minutes=30)
+IST_TZ = timezone(IST, 'IST')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+IST_MS = IST // timedelta(milliseconds=1)
+
+# Accepted timestamps: the IST months datetime can represent whole
+MIN_TIMESTAMP = (datetime(1, 2, 1, tzinfo=IST_TZ) - EPOCH) // timedelta(milliseconds=1)
+MAX_TIMESTAMP = (datetime(9999, 12, 1, tzinfo=IST_TZ) - EPOCH) // timedelta(milliseconds=1)
+
+# Columns of weather_readings, in table order
+READING_COLUMNS = ['id', 'timestamp', 'temperature', 'humidity', 'pressure',
+                   'air_quality', 'wind_speed', 'wind_direction', 'rainfall',
+                   'station_id']
+
+# Fields every posted reading must carry
+REQUIRED_FIELDS = ['temperature', 'humidity', 'pressure',
+                   'air_quality', 'wind_speed', 'wind_direction', 'rainfall']
+
+# Most readings accepted by one POST /api/data/batch
+MAX_BATCH_SIZE = 10000
+
+# Write-behind ingestion: queued requests before POSTs get 429, and the
+# group commit limits (rows per transaction, seconds to wait for more)
+INGEST_QUEUE_SIZE = 10000
+INGEST_FLUSH_ROWS = 500
+INGEST_FLUSH_INTERVAL = 0.05
+
+# How long (seconds) the writer keeps retrying a group while another
+# writer, such as a month being archived, holds the database lock
+INGEST_BUSY_TIMEOUT = 120
+INGEST_RETRY_DELAY = 0.5
+
+_ingest_queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+_ingest_writer = None
+_ingest_writer_lock = threading.Lock()
+
+# station_id -> last timestamp handed out by server_timestamps()
+_server_timestamps = {}
+# Key set on readings stamped by server_timestamps(); never echoed back
+STAMPED = '_stamped'
+_server_timestamps_lock = threading.Lock()
+
+# station_id -> (session, last_seq) of sequenced uploads, as last
+# committed by this process's writer; answers acks without a query
+_station_sequences = {}
+
+# Response sent when the ingestion queue is at capacity
+QUEUE_FULL_RESPONSE = ({'error': 'Ingestion queue full, retry later'}, 429, {'Retry-After': '1'})
+
+# Async ingestion server: port, accept backlog, largest request body
+# (bytes) and how long (seconds) an idle keep-alive connection is held.
+# Sensors posting every 30 seconds keep one connection open each.
+INGEST_PORT = 5001
+INGEST_BACKLOG = 4096
+INGEST_MAX_BODY = 8 * 1024 * 1024
+INGEST_IDLE_TIMEOUT = 75
+
+# While stopping, connections idle this long (seconds) are hung up; a
+# client busier than that is answered with Connection: close instead
+INGEST_DRAIN_IDLE = 0.5
+
+# POST paths served by the async ingestion server
+INGEST_ROUTE = re.compile(r'/api(?:/stations/(?P<station>[^/]+))?/data(?:/(?P<kind>batch|upload))?')
+
+# Running ingestion server: its thread and event loop, an asyncio.Event
+# that asks it to stop, its open connections, those idle between
+# requests (with the time they went idle) and the UDP packets being
+# stored
+_ingest_server = {'thread': None, 'loop': None, 'stop': None,
+                  'connections': set(), 'idle': {}, 'datagrams': set()}
+
+# Page sizes for GET /api/data
+DEFAULT_PAGE_LIMIT = 500
+MAX_PAGE_LIMIT = 5000
+
+# Live stream settings: per-client backlog and keepalive interval (seconds)
+STREAM_QUEUE_SIZE = 256
+STREAM_KEEPALIVE = 15
+
+# Queues of connected /api/stream clients
+_stream_subscribers = set()
+_stream_lock = threading.Lock()
+
+# Readings kept in memory per station by the recent-readings ring
+RING_SIZE = 1000
+
+# Station that readings posted without a station_id belong to, and the
+# form registered station ids must take
+DEFAULT_STATION = 'default'
+STATION_ID_PATTERN = re.compile(r'[A-Za-z0-9_.-]{1,64}')
+
+# Ids of registered stations, filled by load_stations()
+_stations = set()
+_stations_lock = threading.Lock()
+
+# Ids found unregistered -> when (monotonic) SQLite last said so. For
+# STATION_MISS_TTL seconds they are answered from memory, so a
+# misconfigured node does not cost a query, on the ingestion event
+# loop, per request; at most STATION_MISS_LIMIT are remembered.
+_station_misses = OrderedDict()
+STATION_MISS_TTL = 5
+STATION_MISS_LIMIT = 1024
+
+# station id -> ReadingRing, filled by load_recent_readings(). The ring
+# under None holds the newest readings of every station.
+_rings = {}
+_rings_lock = threading.Lock()
+
+# Sensor columns summarised by /api/stats
+METRICS = ['temperature', 'humidity', 'pressure', 'air_quality',
+           'wind_speed', 'wind_direction', 'rainfall']
+
+# Binary ingestion packets, for nodes that send over UDP or a kept-open
+# TCP connection instead of HTTP/JSON. Little-endian: a header of magic
+# b'WX', format version, station id length and record count, the ASCII
+# station id, then `count` 40-byte records of sequence number,
+# timestamp (epoch ms, 0 for the time received) and the METRICS as
+# float32. Every packet is answered with an ack: magic b'WA', a PACKET_*
+# status and the highest sequence number stored. Sequenced packets
+# (PACKET_SEQUENCED_VERSION) follow the header with the node's session
+# and are stored like /api/data/upload: the ack is the highest seq
+# stored without a gap.
+PACKET_PORT = 5002
+PACKET_MAGIC = b'WX'
+PACKET_VERSION = 1
+PACKET_SEQUENCED_VERSION = 2
+PACKET_HEADER = struct.Struct('<2sBBH')
+PACKET_SESSION = struct.Struct('<I')
+PACKET_RECORD = np.dtype([('seq', '<u4'), ('timestamp', '<i8')] + [(metric, '<f4') for metric in METRICS])
+PACKET_ACK_MAGIC = b'WA'
+PACKET_ACK = struct.Struct('<2sBxI')
+PACKET_OK, PACKET_INVALID, PACKET_UNKNOWN_STATION, PACKET_BUSY, PACKET_FAILED = range(5)
+
+# Receive buffer (bytes) for the UDP packet socket, absorbing bursts
+PACKET_UDP_BUFFER = 4 * 1024 * 1024
+
+# Running count/sum/min/max per metric for each station, covering rows
+# up to last_id, plus archived partitions once `archived` is set
+_aggregates = {'last_id': 0, 'archived': False, 'stations': {}}
+_aggregates_lock = threading.Lock()
+
+# Rollup resolutions, finest first, with their bucket length in
+# milliseconds. Buckets are aligned to IST minutes, hours and days.
+ROLLUP_RESOLUTIONS = {
+    'minute': 60 * 1000,
+    'hour': 60 * 60 * 1000,
+    'day': 24 * 60 * 60 * 1000
+}
+
+# Response formats for bulk reads, selected with ?format= or the Accept header
+READ_FORMATS = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.weather.columnar+json',
+    'binary': 'application/vnd.weather.columns',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Export formats: mimetype and file extension
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+# Rows fetched from SQLite per export chunk
+EXPORT_CHUNK_ROWS = 5000
+
+# Default and largest point counts for /api/series, and the window
+# used when no range is given
+DEFAULT_SERIES_POINTS = 500
+MAX_SERIES_POINTS = 5000
+DEFAULT_SERIES_WINDOW = timedelta(hours=24)
+
+# Seconds between background rollup compactions
+ROLLUP_INTERVAL = 60
+
+# Most buckets /api/rollup returns when picking a resolution itself
+ROLLUP_MAX_POINTS = 1000
+
+# Time partitioning: readings from IST months before the current one and
+# the PARTITION_HOT_MONTHS before it are moved, once rolled up, from
+# weather_readings into one SQLite file per month under PARTITION_DIR
+# (next to the database). Raw partitions of months that ended more than
+# RETENTION_DAYS ago are deleted; their rollups and stats are kept.
+# None keeps raw readings forever.
+PARTITION_DIR = 'partitions'
+PARTITION_HOT_MONTHS = 1
+RETENTION_DAYS = None
+
+# Cold tier: partitions of months that ended more than COLD_AFTER_DAYS
+# ago are sealed into compressed column chunks of up to SEAL_CHUNK_ROWS
+# readings of one station each
+COLD_AFTER_DAYS = 90
+SEAL_CHUNK_ROWS = 4096
+
+# schema migrations
+
+def _migrate_create_readings(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS weather_readings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            temperature REAL NOT NULL,
+            humidity REAL NOT NULL,
+            pressure REAL NOT NULL,
+            air_quality INTEGER NOT NULL,
+            wind_speed REAL NOT NULL,
+            wind_direction REAL NOT NULL,
+            rainfall REAL NOT NULL
+        )
+    """)
+
+
+def _migrate_timestamp_index(conn):
+    # Serves ORDER BY timestamp, latest-reading seeks and time windows
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_weather_readings_timestamp
+        ON weather_readings (timestamp)
+    """)
+
+
+def _migrate_create_rollups(conn):
+    # Time-bucketed rollups, maintained by compact_rollups()
+    metric_columns = ''.join(
+        f", {metric}_sum REAL, {metric}_min REAL, {metric}_max REAL" for metric in METRICS
+    )
+    for resolution in ('minute', 'hour', 'day'):
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS weather_rollup_{resolution} (
+                bucket TEXT PRIMARY KEY,
+                count INTEGER NOT NULL{metric_columns}
+            )
+        """)
+
+    # Highest weather_readings id folded into each rollup table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            resolution TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    """)
+
+
+# Other formats the old API may have stored as sent, tried in order
+LEGACY_TIMESTAMP_FORMATS = [
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y',
+    '%d-%m-%Y %H:%M:%S', '%d-%m-%Y %H:%M', '%d-%m-%Y',
+    '%Y/%m/%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y/%m/%d',
+]
+
+
+def _legacy_timestamp(value):
+    """
+    Parse a timestamp stored by the old API, which kept whatever the
+    client sent: ISO 8601 or epoch milliseconds, else one of
+    LEGACY_TIMESTAMP_FORMATS as naive IST. Returns None if none fit.
+    """
+    try:
+        return parse_timestamp(value.strip() if isinstance(value, str) else value)
+    except (ValueError, OverflowError):
+        pass
+    for fmt in LEGACY_TIMESTAMP_FORMATS:
+        try:
+            parsed = datetime.strptime(value.strip(), fmt).replace(tzinfo=IST_TZ)
+        except (AttributeError, ValueError):
+            continue
+        return parse_timestamp((parsed - EPOCH) // timedelta(milliseconds=1))
+    return None
+
+
+def _migrate_epoch_timestamps(conn):
+    # Rebuild weather_readings with timestamp as INTEGER epoch milliseconds
+    # (UTC). Existing ISO text is naive IST, as written by api_data().
+    # Rows in no known format are placed 1 ms after the row before them
+    # in id (arrival) order, or before the row after them if none before
+    # parses, so that (station_id, timestamp) stays unique.
+    converted, unparsed = {}, []
+    for row_id, value in conn.execute("SELECT id, timestamp FROM weather_readings ORDER BY id"):
+        converted[row_id] = _legacy_timestamp(value)
+        if converted[row_id] is None:
+            unparsed.append((row_id, value))
+    previous = None
+    for row_id, timestamp in converted.items():
+        if timestamp is None and previous is not None:
+            timestamp = converted[row_id] = previous + 1
+        previous = timestamp
+    # Only rows before the first parseable one are left; with none, now
+    following = (datetime.now(timezone.utc) - EPOCH) // timedelta(milliseconds=1)
+    for row_id in reversed(list(converted)):
+        if converted[row_id] is None:
+            converted[row_id] = following - 1
+        following = converted[row_id]
+    for row_id, value in unparsed:
+        app.logger.warning(f"Reading {row_id} has an unparseable timestamp {value!r}; "
+                           f"stored as {format_timestamp(converted[row_id])}")
+
+    conn.create_function('epoch_ms_of', 1, converted.__getitem__, deterministic=True)
+    conn.execute("""
+        CREATE TABLE weather_readings_epoch (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            temperature REAL NOT NULL,
+            humidity REAL NOT NULL,
+            pressure REAL NOT NULL,
+            air_quality INTEGER NOT NULL,
+            wind_speed REAL NOT NULL,
+            wind_direction REAL NOT NULL,
+            rainfall REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT INTO weather_readings_epoch
+        SELECT id, epoch_ms_of(id), temperature, humidity, pressure,
+               air_quality, wind_speed, wind_direction, rainfall
+        FROM weather_readings ORDER BY id
+    """)
+    sequence = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'weather_readings'"
+    ).fetchone()
+    conn.execute("DROP TABLE weather_readings")
+    conn.execute("ALTER TABLE weather_readings_epoch RENAME TO weather_readings")
+    if sequence is not None:
+        # Keep ids of deleted rows from being reused
+        conn.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'weather_readings'",
+            (sequence[0],)
+        )
+    conn.execute("""
+        CREATE INDEX idx_weather_readings_timestamp
+        ON weather_readings (timestamp)
+    """)
+
+    # Rollup buckets become epoch milliseconds too; compaction refills them
+    metric_columns = ''.join(
+        f", {metric}_sum REAL, {metric}_min REAL, {metric}_max REAL" for metric in METRICS
+    )
+    for resolution in ('minute', 'hour', 'day'):
+        conn.execute(f"DROP TABLE weather_rollup_{resolution}")
+        conn.execute(f"""
+            CREATE TABLE weather_rollup_{resolution} (
+                bucket INTEGER PRIMARY KEY,
+                count INTEGER NOT NULL{metric_columns}
+            )
+        """)
+    conn.execute("DELETE FROM rollup_state")
+
+
+def _migrate_stations(conn):
+    # Readings carry the station that sent them; existing rows came from
+    # the one station there used to be
+    conn.execute("""
+        CREATE TABLE stations (
+            station_id TEXT PRIMARY KEY,
+            name TEXT,
+            latitude REAL,
+            longitude REAL,
+            registered_at INTEGER NOT NULL
+        )
+    """)
+    conn.execute(
+        "INSERT INTO stations (station_id, name, registered_at) VALUES ('default', 'Default station', ?)",
+        ((datetime.now(timezone.utc) - EPOCH) // timedelta(milliseconds=1),)
+    )
+    conn.execute(
+        "ALTER TABLE weather_readings ADD COLUMN station_id TEXT NOT NULL DEFAULT 'default'"
+    )
+    # Serves per-station time windows and latest-reading seeks
+    conn.execute("""
+        CREATE INDEX idx_weather_readings_station_timestamp
+        ON weather_readings (station_id, timestamp)
+    """)
+
+
+def _migrate_partitions(conn):
+    # Catalog of monthly partitions moved out of weather_readings by
+    # archive_partitions(), and the per-station aggregates of their rows
+    conn.execute("""
+        CREATE TABLE partitions (
+            month TEXT PRIMARY KEY,
+            start INTEGER NOT NULL,
+            end INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            max_id INTEGER NOT NULL,
+            dropped_at INTEGER
+        )
+    """)
+    metric_columns = ''.join(
+        f", {metric}_sum REAL, {metric}_min REAL, {metric}_max REAL" for metric in METRICS
+    )
+    conn.execute(f"""
+        CREATE TABLE partition_stats (
+            month TEXT NOT NULL,
+            station_id TEXT NOT NULL,
+            count INTEGER NOT NULL{metric_columns},
+            PRIMARY KEY (month, station_id)
+        )
+    """)
+
+
+def _migrate_sealed_partitions(conn):
+    # When a partition started being sealed into compressed chunks, and
+    # how many of its rows are sealed so far
+    conn.execute("ALTER TABLE partitions ADD COLUMN sealed_at INTEGER")
+    conn.execute("ALTER TABLE partitions ADD COLUMN sealed_rows INTEGER NOT NULL DEFAULT 0")
+
+
+def _migrate_station_sequences(conn):
+    # Sequenced uploads: the session a node is sending in (a counter it
+    # bumps on every boot) and the highest sequence number stored from
+    # it without a gap
+    conn.execute("ALTER TABLE stations ADD COLUMN seq_session INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE stations ADD COLUMN last_seq INTEGER NOT NULL DEFAULT 0")
+
+
+def _migrate_reading_keys(conn):
+    # A station takes one reading per instant, so (station_id, timestamp)
+    # identifies a reading and insert_readings() can skip redelivered
+    # ones. Earlier duplicates keep their first copy, and the rollup
+    # buckets that counted the others are recomputed.
+    duplicates = conn.execute("""
+        SELECT id, timestamp FROM weather_readings
+        WHERE id NOT IN (SELECT MIN(id) FROM weather_readings GROUP BY station_id, timestamp)
+    """).fetchall()
+    conn.executemany("DELETE FROM weather_readings WHERE id = ?", [(row[0],) for row in duplicates])
+
+    columns = ['bucket', 'count'] + [f'{metric}_{agg}' for metric in METRICS for agg in ('sum', 'min', 'max')]
+    for resolution, length in ROLLUP_RESOLUTIONS.items():
+        row = conn.execute("SELECT last_id FROM rollup_state WHERE resolution = ?", (resolution,)).fetchone()
+        last_id = row[0] if row else 0
+        buckets = {timestamp - (timestamp + IST_MS) % length for row_id, timestamp in duplicates if row_id <= last_id}
+        selects = [f'timestamp - (timestamp + {IST_MS}) % {length}', 'COUNT(*)']
+        selects += [f'{agg}({metric})' for metric in METRICS for agg in ('SUM', 'MIN', 'MAX')]
+        conn.executemany(f"DELETE FROM weather_rollup_{resolution} WHERE bucket = ?", [(b,) for b in buckets])
+        conn.executemany(
+            f"INSERT INTO weather_rollup_{resolution} ({', '.join(columns)}) "
+            f"SELECT {', '.join(selects)} FROM weather_readings "
+            f"WHERE timestamp >= ? AND timestamp < ? AND id <= ? GROUP BY 1",
+            [(b, b + length, last_id) for b in buckets]
+        )
+
+    conn.execute("DROP INDEX idx_weather_readings_station_timestamp")
+    conn.execute("""
+        CREATE UNIQUE INDEX idx_weather_readings_station_timestamp
+        ON weather_readings (station_id, timestamp)
+    """)
+
+
+
+def _migrate_station_rollups(conn):
+    # Rollup buckets are kept per station, keyed (station_id, bucket).
+    # They are recomputed from the readings each table had folded in:
+    # hot rows up to its last_id and the rows of every archived month,
+    # gathered once into a temporary table. Whatever an old bucket held
+    # beyond that (months dropped by retention) stays in a row with a
+    # NULL station_id, so rollups over all stations keep their totals.
+    metrics = ', '.join(METRICS)
+    conn.execute(f"""
+        CREATE TEMP TABLE rollup_source (
+            id INTEGER PRIMARY KEY, station_id TEXT, timestamp INTEGER,
+            {', '.join(f'{metric} REAL' for metric in METRICS)}
+        )
+    """)
+    conn.execute(f"INSERT INTO rollup_source SELECT id, station_id, timestamp, {metrics} FROM weather_readings")
+    columns = ['id', 'station_id', 'timestamp'] + METRICS
+    insert = f"INSERT OR IGNORE INTO rollup_source VALUES ({', '.join('?' for _ in columns)})"
+    for month, sealed, _ in route_partitions(conn):
+        partition = open_partition(month)
+        if partition is None:
+            continue
+        try:
+            # Rows copied out but not yet deleted here are already loaded
+            conn.executemany(insert, partition.execute(f"SELECT {', '.join(columns)} FROM weather_readings"))
+            if sealed:
+                conn.executemany(insert, scan_chunks(partition, columns=columns, order_by='id'))
+        finally:
+            partition.close()
+
+    metric_columns = [f'{metric}_{agg}' for metric in METRICS for agg in ('sum', 'min', 'max')]
+    for resolution, length in ROLLUP_RESOLUTIONS.items():
+        row = conn.execute("SELECT last_id FROM rollup_state WHERE resolution = ?", (resolution,)).fetchone()
+        last_id = row[0] if row else 0
+        table = f'weather_rollup_{resolution}'
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        conn.execute(f"""
+            CREATE TABLE {table} (
+                station_id TEXT,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL{''.join(f', {column} REAL' for column in metric_columns)},
+                PRIMARY KEY (station_id, bucket)
+            )
+        """)
+        conn.execute(f"CREATE INDEX idx_{table}_bucket ON {table} (bucket)")
+
+        selects = ['station_id', f'timestamp - (timestamp + {IST_MS}) % {length}', 'COUNT(*)']
+        selects += [f'{agg}({metric})' for metric in METRICS for agg in ('SUM', 'MIN', 'MAX')]
+        conn.execute(
+            f"INSERT INTO {table} (station_id, bucket, count, {', '.join(metric_columns)}) "
+            f"SELECT {', '.join(selects)} FROM rollup_source WHERE id <= ? GROUP BY 1, 2",
+            (last_id,)
+        )
+        remainder = [f'old.{column} - COALESCE(new.{column}, 0)' if column.endswith('_sum') else f'old.{column}'
+                     for column in metric_columns]
+        conn.execute(f"""
+            INSERT INTO {table} (station_id, bucket, count, {', '.join(metric_columns)})
+            SELECT NULL, old.bucket, old.count - COALESCE(new.count, 0), {', '.join(remainder)}
+            FROM {table}_old AS old LEFT JOIN (
+                SELECT bucket, SUM(count) AS count, {', '.join(f'SUM({metric}_sum) AS {metric}_sum' for metric in METRICS)}
+                FROM {table} GROUP BY bucket
+            ) AS new USING (bucket)
+            WHERE old.count > COALESCE(new.count, 0)
+        """)
+        conn.execute(f"DROP TABLE {table}_old")
+    conn.execute("DROP TABLE rollup_source")
+
+
+# Ordered schema migrations: (version, description, function). Append new
+# migrations at the end; never edit or renumber one that has shipped.
+MIGRATIONS = [
+    (1, 'create weather_readings', _migrate_create_readings),
+    (2, 'index weather_readings by timestamp', _migrate_timestamp_index),
+    (3, 'create rollup tables', _migrate_create_rollups),
+    (4, 'store timestamps as epoch milliseconds', _migrate_epoch_timestamps),
+    (5, 'add stations and station_id to readings', _migrate_stations),
+    (6, 'create partition catalog', _migrate_partitions),
+    (7, 'track sealed partitions', _migrate_sealed_partitions),
+    (8, 'track station upload sequences', _migrate_station_sequences),
+    (9, 'make (station_id, timestamp) unique', _migrate_reading_keys),
+    (10, 'keep rollups per station', _migrate_station_rollups),
+]
+
+
+def get_schema_version(conn):
+    """
+    Return the highest migration version applied to the database
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+
+
+def migrate_database(conn):
+    """
+    Apply every pending migration, each in its own transaction, and
+    return the list of versions applied. Databases created before the
+    schema_version table existed are upgraded in place, since the early
+    migrations only create what is missing.
+    """
+    applied = []
+    current = get_schema_version(conn)
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migrate(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.utcnow().isoformat())
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# database functions 
+
+def init_database():
+    """
+    Initialize the SQLite database, bringing its schema up to date
+    with MIGRATIONS, and load the running aggregates.
+    """
+    conn = get_db_connection()
+    applied = migrate_database(conn)
+    if applied:
+        print(f"Applied schema migrations: {', '.join(map(str, applied))}")
+
+    # Load the registered stations and the running aggregates used by /api/stats
+    load_stations(conn)
+    sync_aggregates(conn)
+
+    # Fill the in-memory ring of recent readings
+    load_recent_readings(conn)
+    conn.close()
+
+
+def get_db_connection():
+    """
+    Create and return a database connection with row factory for dict access,
+    configured with DB_PRAGMAS. The connection may be used from any thread,
+    but only by one at a time.
+    """
+    conn = sqlite3.connect(
+        DATABASE_PATH,
+        timeout=DB_BUSY_TIMEOUT,
+        check_same_thread=False,
+        cached_statements=256
+    )
+    conn.row_factory = sqlite3.Row
+    for name, value in DB_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a connection from the pool for the duration of a with block.
+    Connections stay open between requests, so the pragmas and the
+    prepared statement cache are set up once per connection.
+    """
+    try:
+        conn = _db_pool.get_nowait()
+    except queue.Empty:
+        conn = get_db_connection()
+
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        if _db_pool.qsize() < DB_POOL_SIZE:
+            _db_pool.put(conn)
+        else:
+            conn.close()
+
+
+def parse_timestamp(value):
+    """
+    Convert an ISO 8601 string or epoch milliseconds into the stored
+    format, UTC epoch milliseconds. ISO strings without an offset are
+    taken as IST. Raises ValueError on malformed input, and on
+    timestamps outside MIN_TIMESTAMP to MAX_TIMESTAMP.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f'Invalid timestamp: {value!r}')
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f'Invalid timestamp: {value!r}')
+    if isinstance(value, (int, float)):
+        epoch_ms = int(value)
+    elif not isinstance(value, str):
+        raise ValueError(f'Invalid timestamp: {value!r}')
+    elif value.lstrip('-').isdigit():
+        epoch_ms = int(value)
+    else:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=IST_TZ)
+        epoch_ms = (parsed - EPOCH) // timedelta(milliseconds=1)
+
+    if not MIN_TIMESTAMP <= epoch_ms < MAX_TIMESTAMP:
+        raise ValueError(f'Timestamp out of range: {value!r}')
+    return epoch_ms
+
+
+def format_timestamp(epoch_ms):
+    """
+    Render a stored timestamp as ISO 8601 in IST
+    """
+    moment = EPOCH + timedelta(milliseconds=epoch_ms)
+    return moment.astimezone(IST_TZ).isoformat(timespec='milliseconds')
+
+
+def row_to_reading(row):
+    """
+    Convert a weather_readings row into the dict returned by the API
+    """
+    reading = dict(zip(READING_COLUMNS, row))
+    reading['timestamp'] = format_timestamp(reading['timestamp'])
+    return reading
+
+
+def encode_cursor(timestamp, row_id):
+    """
+    Build an opaque pagination cursor pointing at (timestamp, id)
+    """
+    raw = json.dumps([timestamp, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor. Raises ValueError on malformed cursors.
+    """
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # Stored timestamps and ids: ints, not bools, that SQLite can bind
+        if not all(type(value) is int for value in (timestamp, row_id)):
+            raise ValueError(cursor)
+        if not (MIN_TIMESTAMP <= timestamp < MAX_TIMESTAMP and 0 <= row_id < 2 ** 63):
+            raise ValueError(cursor)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    return timestamp, row_id
+
+
+def query_readings(conn, since=None, until=None, after=None, order='asc', limit=None, station_id=None):
+    """
+    Run a keyset-paginated query over weather_readings and the archived
+    partitions overlapping the window, and return a generator of rows,
+    so callers can iterate them without materialising them. close() it
+    to finish the statements early.
+
+    since is inclusive, until is exclusive, after is a (timestamp, id)
+    pair from a previous page. Rows are ordered by (timestamp, id) and
+    limited to one station when station_id is given.
+    """
+    clauses = []
+    params = []
+
+    if station_id is not None:
+        clauses.append("station_id = ?")
+        params.append(station_id)
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("timestamp < ?")
+        params.append(until)
+    if after is not None:
+        op = '>' if order == 'asc' else '<'
+        clauses.append(f"(timestamp, id) {op} (?, ?)")
+        params.extend(after)
+
+    sql = f"SELECT {', '.join(READING_COLUMNS)} FROM weather_readings"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    direction = 'ASC' if order == 'asc' else 'DESC'
+    sql += f" ORDER BY timestamp {direction}, id {direction}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    chunks = dict(since=since, until=until, after=after, station_id=station_id)
+    # The keyset position narrows the window the partitions must cover
+    if after is not None and order == 'asc':
+        since = after[0] if since is None else max(since, after[0])
+    elif after is not None:
+        until = after[0] + 1 if until is None else min(until, after[0] + 1)
+    months = route_partitions(conn, since, until)
+    return routed_query(conn, sql, params, months, key=lambda row: (row[1], row[0]),
+                        reverse=order != 'asc', limit=limit, chunks=chunks,
+                        month_bound=lambda end: (end,))
+
+
+def query_readings_after(conn, after_id=None, after_timestamp=None, limit=DEFAULT_PAGE_LIMIT, station_id=None):
+    """
+    Return a list of readings newer than a client's last seen id (or
+    timestamp), oldest first. With neither given, return the most
+    recent `limit` readings so a client can bootstrap its view.
+    station_id limits the readings to one station.
+    """
+    columns = ', '.join(READING_COLUMNS)
+    station, params = ("station_id = ? AND ", (station_id,)) if station_id is not None else ("", ())
+    if after_id is not None:
+        rows = routed_query(
+            conn,
+            f"SELECT {columns} FROM weather_readings WHERE {station}id > ? ORDER BY id LIMIT ?",
+            params + (after_id, limit),
+            route_partitions(conn, after_id=after_id),
+            key=lambda row: row[0], limit=limit,
+            chunks=dict(order_by='id', after_id=after_id, station_id=station_id)
+        )
+        return list(rows)
+    if after_timestamp is not None:
+        rows = routed_query(
+            conn,
+            f"SELECT {columns} FROM weather_readings WHERE {station}timestamp > ? "
+            f"ORDER BY timestamp, id LIMIT ?",
+            params + (after_timestamp, limit),
+            route_partitions(conn, since=after_timestamp + 1),
+            key=lambda row: (row[1], row[0]), limit=limit,
+            chunks=dict(since=after_timestamp + 1, station_id=station_id)
+        )
+        return list(rows)
+    where = "WHERE station_id = ? " if station_id is not None else ""
+    rows = list(routed_query(
+        conn,
+        f"SELECT {columns} FROM weather_readings {where}ORDER BY timestamp DESC, id DESC LIMIT ?",
+        params + (limit,),
+        route_partitions(conn),
+        key=lambda row: (row[1], row[0]), reverse=True, limit=limit,
+        chunks=dict(station_id=station_id), month_bound=lambda end: (end,)
+    ))
+    rows.reverse()
+    return rows
+
+
+def _is_finite_number(value):
+    # bools are ints to Python, and ints past 64 bits don't fit SQLite
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    if isinstance(value, int):
+        return -2 ** 63 <= value < 2 ** 63
+    return math.isfinite(value)
+
+
+def validate_reading(data):
+    """
+    Check a posted reading, normalise its timestamp to epoch
+    milliseconds and default it to now. Every metric must be a finite
+    number; air_quality is rounded to the integer it is stored as.
+    Readings without a station_id belong to DEFAULT_STATION. Returns an
+    error message, or None if the reading is valid.
+    """
+    if not isinstance(data, dict):
+        return 'Reading must be a JSON object'
+
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            return f'Missing required field: {field}'
+        if not _is_finite_number(data[field]):
+            return f'{field} must be a finite number, not {data[field]!r}'
+    # As decode_packet() does, so every read path sees the stored integer
+    data['air_quality'] = round(data['air_quality'])
+
+    station_id = data.setdefault('station_id', DEFAULT_STATION)
+    if not station_exists(station_id):
+        return f'Unknown station: {station_id!r}'
+
+    # Only the server marks a reading as stamped on arrival
+    data.pop(STAMPED, None)
+    if 'timestamp' not in data:
+        data['timestamp'] = server_timestamps(station_id)[0]
+        data[STAMPED] = True
+    else:
+        try:
+            data['timestamp'] = parse_timestamp(data['timestamp'])
+        except ValueError:
+            return f"Invalid timestamp: {data['timestamp']!r}"
+    return None
+
+
+def server_timestamps(station_id, count=1):
+    """
+    Return `count` arrival timestamps (epoch ms) for a station's
+    readings: from the current time, but past any handed out before, so
+    readings stamped on arrival never share a (station_id, timestamp)
+    key and are not taken for redeliveries
+    """
+    now = (datetime.now(timezone.utc) - EPOCH) // timedelta(milliseconds=1)
+    with _server_timestamps_lock:
+        first = max(now, _server_timestamps.get(station_id, 0) + 1)
+        _server_timestamps[station_id] = first + count - 1
+    return range(first, first + count)
+
+
+def insert_readings(conn, readings, seqs=None):
+    """
+    Insert validated readings with a single executemany in one
+    transaction. A reading whose (station_id, timestamp) is already
+    stored, here or in an archived month, is a redelivery and skipped;
+    except one stamped on arrival, which is moved to the next free
+    millisecond instead. `seqs` gives each reading's (session, seq) if
+    it came in a sequenced upload, or None; see _sequence_readings()
+    for which of those are stored. Returns the readings in order, as
+    stored with their ids, or None for those skipped.
+    """
+    columns = READING_COLUMNS[1:]
+    rows = [tuple(data[column] for column in columns) for data in readings]
+    insert = (f"INSERT INTO weather_readings ({', '.join(columns)}) "
+              f"VALUES ({', '.join('?' for _ in columns)}) "
+              f"ON CONFLICT (station_id, timestamp) DO NOTHING")
+
+    # The immediate lock means every id past the current maximum is
+    # ours, and no month is archived while we check them
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        keep, positions = [True] * len(readings), {}
+        if seqs is not None:
+            keep, positions = _sequence_readings(conn, readings, seqs)
+        archived = _archived_keys(conn, [data for data, kept in zip(readings, keep) if kept])
+        keep = [kept and (data['station_id'], data['timestamp']) not in archived
+                for data, kept in zip(readings, keep)]
+        before = conn.execute("SELECT MAX(id) FROM weather_readings").fetchone()[0] or 0
+        conn.executemany(insert, [row for row, kept in zip(rows, keep) if kept])
+        ids = {
+            (station_id, timestamp): row_id for row_id, timestamp, station_id in conn.execute(
+                "SELECT id, timestamp, station_id FROM weather_readings WHERE id > ?", (before,)
+            )
+        }
+
+        stored = []
+        for data, row, kept in zip(readings, rows, keep):
+            # Popped, so a repeat within the batch is skipped too
+            row_id = ids.pop((data['station_id'], data['timestamp']), None) if kept else None
+            if row_id is None and kept and data.get(STAMPED):
+                row_id, row = _restamp(conn, insert, row)
+            stored.append(None if row_id is None else dict(zip(READING_COLUMNS, (row_id,) + row)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _station_sequences.update(positions)
+    return stored
+
+
+def _restamp(conn, insert, row):
+    """
+    Store a reading stamped on arrival whose timestamp was taken, by
+    another process stamping the station's readings in the same
+    millisecond, at the next free one. Returns its id and row.
+    """
+    timestamp, station_id = row[0], row[-1]
+    while True:
+        timestamp += 1
+        cursor = conn.execute(insert, (timestamp,) + row[1:])
+        if cursor.rowcount:
+            break
+    with _server_timestamps_lock:
+        _server_timestamps[station_id] = max(_server_timestamps.get(station_id, 0), timestamp)
+    return cursor.lastrowid, (timestamp,) + row[1:]
+
+
+def _archived_keys(conn, readings):
+    """
+    Return the (station_id, timestamp) keys of readings already stored
+    in an archived month, which the unique index on weather_readings
+    does not cover
+    """
+    if not readings:
+        return set()
+    timestamps = [data['timestamp'] for data in readings]
+    found = set()
+    for month, sealed, end in route_partitions(conn, min(timestamps), max(timestamps) + 1):
+        start = month_bounds(end - 1)[1]
+        wanted = {}
+        for data in readings:
+            if start <= data['timestamp'] < end:
+                wanted.setdefault(data['station_id'], set()).add(data['timestamp'])
+        partition = open_partition(month)
+        if partition is None:
+            continue
+        try:
+            for station_id, stamps in wanted.items():
+                since, until = min(stamps), max(stamps) + 1
+                stored = [timestamp for timestamp, in partition.execute(
+                    "SELECT timestamp FROM weather_readings "
+                    "WHERE station_id = ? AND timestamp >= ? AND timestamp < ?",
+                    (station_id, since, until)
+                )]
+                if sealed:
+                    stored += [timestamp for timestamp, in scan_chunks(
+                        partition, columns=['timestamp'], since=since, until=until, station_id=station_id
+                    )]
+                found.update((station_id, timestamp) for timestamp in stamps.intersection(stored))
+        finally:
+            partition.close()
+    return found
+
+
+def _sequence_readings(conn, readings, seqs):
+    """
+    Decide which sequenced readings to store, within the insert's
+    transaction. Each station's readings are taken in seq order from
+    just past its acked seq: replays and readings past a gap are
+    skipped, for the node to resend. A newer session (the node
+    rebooted) starts again from seq 1; an older one is stale and
+    skipped. Records where each station got to in the stations table.
+    Returns a keep flag for every reading and {station_id: (session,
+    last_seq)}.
+    """
+    positions = {}
+    keep = []
+    for data, sequence in zip(readings, seqs):
+        if sequence is None:
+            keep.append(True)
+            continue
+        station_id = data['station_id']
+        if station_id not in positions:
+            positions[station_id] = tuple(conn.execute(
+                "SELECT seq_session, last_seq FROM stations WHERE station_id = ?", (station_id,)
+            ).fetchone())
+        current, last_seq = positions[station_id]
+        session, seq = sequence
+        if session > current:
+            current, last_seq = session, 0
+        kept = session == current and seq == last_seq + 1
+        keep.append(kept)
+        positions[station_id] = (current, seq if kept else last_seq)
+
+    conn.executemany(
+        "UPDATE stations SET seq_session = ?, last_seq = ? WHERE station_id = ?",
+        [(session, last_seq, station_id) for station_id, (session, last_seq) in positions.items()]
+    )
+    return keep, positions
+
+
+def sequence_ack(station_id, session):
+    """
+    Return the highest seq stored without a gap from a station's
+    session, as committed by this process's writer, or 0
+    """
+    position = _station_sequences.get(station_id)
+    return position[1] if position is not None and position[0] == session else 0
+
+
+def notify_inserted(conn, readings, version=None):
+    """
+    Run the post-insert hooks for readings returned by insert_readings.
+    For readings another process committed, `version` is the shared
+    data version it bumped to (see follow_writer()).
+    """
+    try:
+        for reading in readings:
+            if not update_aggregates(reading):
+                # Out of order: resync covers this and every later reading
+                sync_aggregates(conn)
+                break
+    except Exception as e:
+        # Still publish the readings, so clients don't miss them
+        app.logger.error(f"Updating the running aggregates failed: {e}")
+
+    append_recent_readings(readings)
+    if version is None:
+        bump_data_version()
+    else:
+        adopt_data_version(version)
+    for reading in readings:
+        publish_reading(dict(reading, timestamp=format_timestamp(reading['timestamp'])))
+
+
+# station functions
+
+def load_stations(conn):
+    """
+    Load the ids of all registered stations
+    """
+    rows = conn.execute("SELECT station_id FROM stations").fetchall()
+    with _stations_lock:
+        _stations.update(row[0] for row in rows)
+
+
+def station_exists(station_id):
+    """
+    Return whether station_id is registered, checking SQLite for
+    stations registered since load_stations() ran, at most once every
+    STATION_MISS_TTL seconds for an unregistered one
+    """
+    if not isinstance(station_id, str):
+        return False
+    if station_id in _stations:
+        return True
+    with _stations_lock:
+        missed = _station_misses.get(station_id)
+    if missed is not None and time.monotonic() - missed < STATION_MISS_TTL:
+        return False
+    with db_connection() as conn:
+        row = conn.execute("SELECT 1 FROM stations WHERE station_id = ?", (station_id,)).fetchone()
+    with _stations_lock:
+        if row is None:
+            _station_misses[station_id] = time.monotonic()
+            _station_misses.move_to_end(station_id)
+            while len(_station_misses) > STATION_MISS_LIMIT:
+                _station_misses.popitem(last=False)
+            return False
+        _stations.add(station_id)
+        _station_misses.pop(station_id, None)
+    return True
+
+
+def register_station(conn, station_id, name=None, latitude=None, longitude=None):
+    """
+    Register a station, or update the details given for an existing
+    one. Returns True if the station is new.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        created = conn.execute(
+            "SELECT 1 FROM stations WHERE station_id = ?", (station_id,)
+        ).fetchone() is None
+        conn.execute(
+            "INSERT INTO stations (station_id, name, latitude, longitude, registered_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(station_id) DO UPDATE SET name = COALESCE(excluded.name, name), "
+            "latitude = COALESCE(excluded.latitude, latitude), "
+            "longitude = COALESCE(excluded.longitude, longitude)",
+            (station_id, name, latitude, longitude,
+             (datetime.now(timezone.utc) - EPOCH) // timedelta(milliseconds=1))
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    with _stations_lock:
+        _stations.add(station_id)
+        _station_misses.pop(station_id, None)
+    with _rings_lock:
+        if created and station_id not in _rings:
+            _rings[station_id] = ReadingRing(RING_SIZE)
+    return created
+
+
+def list_stations(conn):
+    """
+    Return every registered station with its reading count
+    """
+    stations = []
+    for row in conn.execute(
+            "SELECT station_id, name, latitude, longitude, registered_at FROM stations ORDER BY station_id"):
+        station = dict(row)
+        station['registered_at'] = format_timestamp(station['registered_at'])
+        station['readings'] = get_aggregates(station['station_id'])['count']
+        stations.append(station)
+    return stations
+
+
+def require_station(view):
+    """
+    Decorate a view routed with an optional station_id so unregistered
+    stations get a 404 before the view runs
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        station_id = kwargs.get('station_id')
+        if station_id is not None and not station_exists(station_id):
+            return jsonify({'error': f'Unknown station: {station_id}'}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# ingestion queue functions
+
+def _drain_ingest_queue(conn, first):
+    """
+    Collect queued requests after `first` until INGEST_FLUSH_ROWS readings
+    or INGEST_FLUSH_INTERVAL seconds, then commit them as one group.
+    Returns False once the stop sentinel has been seen.
+    """
+    items = [first]
+    rows = len(first[0])
+    running = True
+    deadline = time.monotonic() + INGEST_FLUSH_INTERVAL
+    while rows < INGEST_FLUSH_ROWS:
+        timeout = deadline - time.monotonic()
+        try:
+            item = _ingest_queue.get(timeout=timeout) if timeout > 0 else _ingest_queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is None:
+            running = False
+            break
+        items.append(item)
+        rows += len(item[0])
+
+    results = _insert_items(conn, items)
+    try:
+        notify_inserted(conn, [data for result in results if isinstance(result, list) for data in result])
+    except Exception as e:
+        # The readings are committed; the hooks catch up from the table
+        app.logger.error(f"Post-insert hooks failed: {e}")
+    for (_, future, _), result in zip(items, results):
+        if future is None:
+            continue
+        try:
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            # Cancelled by an async client that went away
+            pass
+    return running
+
+
+def _is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and error.sqlite_errorcode in (
+        sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def _insert_items(conn, items):
+    """
+    Insert the readings of queued items as one group and return, for
+    each item, its stored readings or the exception that kept it out.
+    While the database is locked by another writer the group is
+    retried, for up to INGEST_BUSY_TIMEOUT. Any other failure splits the
+    group in half and tries again, so only the items whose readings
+    cannot be stored are rejected.
+    """
+    readings = [data for batch, _, _ in items for data in batch]
+    seqs = None
+    if any(batch_seqs is not None for _, _, batch_seqs in items):
+        seqs = [seq for batch, _, batch_seqs in items for seq in (batch_seqs or [None] * len(batch))]
+
+    deadline = time.monotonic() + INGEST_BUSY_TIMEOUT
+    while True:
+        try:
+            stored = insert_readings(conn, readings, seqs)
+            break
+        except Exception as e:
+            if _is_busy(e) and time.monotonic() < deadline:
+                time.sleep(INGEST_RETRY_DELAY)
+                continue
+            if _is_busy(e) or len(items) == 1:
+                app.logger.error(f"Failed to store {len(readings)} queued readings: {e}")
+                return [e] * len(items)
+            middle = len(items) // 2
+            return _insert_items(conn, items[:middle]) + _insert_items(conn, items[middle:])
+
+    results = []
+    offset = 0
+    for batch, _, _ in items:
+        results.append([data for data in stored[offset:offset + len(batch)] if data is not None])
+        offset += len(batch)
+    return results
+
+
+def _ingest_worker():
+    conn = get_db_connection()
+    try:
+        while True:
+            item = _ingest_queue.get()
+            if item is None or not _drain_ingest_queue(conn, item):
+                break
+    finally:
+        conn.close()
+
+
+def start_ingest_writer():
+    """
+    Start the writer thread that commits queued readings, if it is not
+    already running. Queued readings are flushed at interpreter exit.
+    """
+    global _ingest_writer
+    with _ingest_writer_lock:
+        if _ingest_writer is None or not _ingest_writer.is_alive():
+            _ingest_writer = threading.Thread(target=_ingest_worker, name='ingest-writer', daemon=True)
+            _ingest_writer.start()
+            atexit.register(stop_ingest_writer)
+        return _ingest_writer
+
+
+def stop_ingest_writer(timeout=None):
+    """
+    Flush everything queued so far and stop the writer thread
+    """
+    global _ingest_writer
+    with _ingest_writer_lock:
+        writer, _ingest_writer = _ingest_writer, None
+    if writer is not None and writer.is_alive():
+        _ingest_queue.put(None)
+        writer.join(timeout)
+
+
+def enqueue_readings(readings, wait=False):
+    """
+    Queue validated readings for the writer thread. Raises queue.Full
+    when the queue is at capacity. With wait=True, block until they are
+    committed and return the stored readings.
+    """
+    if wait:
+        return submit_readings(readings).result()
+    start_ingest_writer()
+    _ingest_queue.put_nowait((readings, None, None))
+
+
+def submit_readings(readings, seqs=None):
+    """
+    Queue validated readings and return a Future that resolves to the
+    stored readings once they are committed. `seqs` is the readings'
+    (session, seq) pairs for a sequenced upload. Raises queue.Full when
+    the queue is at capacity.
+    """
+    start_ingest_writer()
+    future = Future()
+    _ingest_queue.put_nowait((readings, future, seqs))
+    return future
+
+
+def accept_reading(data, station_id=None):
+    """
+    Validate a posted reading and queue it without waiting for the
+    commit. Returns (body, status, headers) for the response; shared by
+    POST /api/data and the async ingestion server.
+    """
+    if station_id is not None and isinstance(data, dict):
+        data['station_id'] = station_id
+    error = validate_reading(data)
+    if error:
+        return {'error': error}, 400, {}
+
+    try:
+        enqueue_readings([data])
+    except queue.Full:
+        return QUEUE_FULL_RESPONSE
+
+    return {
+        'success': True,
+        'message': 'Data queued for insertion',
+        'data': {**{key: value for key, value in data.items() if key != STAMPED},
+                 'timestamp': format_timestamp(data['timestamp'])}
+    }, 202, {}
+
+
+def parse_batch(text, ndjson=False):
+    """
+    Parse a batch body, a JSON array or NDJSON. Raises ValueError on
+    malformed JSON.
+    """
+    if ndjson:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return json.loads(text)
+
+
+def check_batch(readings, station_id=None):
+    """
+    Validate a parsed batch in place. Returns (body, status, headers)
+    for the error response, or None if every reading is valid.
+    """
+    if not isinstance(readings, list):
+        return {'error': 'Expected a JSON array of readings'}, 400, {}
+    if len(readings) > MAX_BATCH_SIZE:
+        return {'error': f'Batch exceeds {MAX_BATCH_SIZE} readings'}, 413, {}
+
+    for i, data in enumerate(readings):
+        if station_id is not None and isinstance(data, dict):
+            data['station_id'] = station_id
+        error = validate_reading(data)
+        if error:
+            return {'error': f'Reading {i}: {error}'}, 400, {}
+    return None
+
+
+def batch_stored(stored):
+    """
+    Response body for a committed batch
+    """
+    if not stored:
+        return {'success': True, 'inserted': 0}
+    return {
+        'success': True,
+        'inserted': len(stored),
+        'first_id': stored[0]['id'],
+        'last_id': stored[-1]['id']
+    }
+
+
+def _is_counter(value):
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < 2 ** 32
+
+
+def check_upload(upload, station_id=None):
+    """
+    Validate a sequenced upload in place: a JSON object with the
+    station_id (unless given by the URL), the node's session and its
+    readings, each with a seq, in increasing seq order. The seqs are
+    moved out of the readings into upload['seqs']. Returns (body,
+    status, headers) for the error response, or None if it is valid.
+    """
+    if not isinstance(upload, dict):
+        return {'error': 'Upload must be a JSON object'}, 400, {}
+    if station_id is not None:
+        upload['station_id'] = station_id
+    if not isinstance(upload.get('station_id'), str):
+        return {'error': 'Missing required field: station_id'}, 400, {}
+    if not _is_counter(upload.get('session')):
+        return {'error': 'session must be an integer from 0 to 2**32 - 1'}, 400, {}
+
+    readings = upload.get('readings')
+    error = check_batch(readings, upload['station_id'])
+    if error:
+        return error
+    seqs = []
+    for i, data in enumerate(readings):
+        seq = data.pop('seq', None)
+        if not _is_counter(seq) or seq == 0:
+            return {'error': f'Reading {i}: seq must be an integer from 1 to 2**32 - 1'}, 400, {}
+        if seqs and seq <= seqs[-1]:
+            return {'error': f'Reading {i}: seq must increase'}, 400, {}
+        seqs.append(seq)
+    upload['seqs'] = seqs
+    return None
+
+
+def upload_stored(upload, stored):
+    """
+    Response body for a committed sequenced upload
+    """
+    return {
+        'success': True,
+        'session': upload['session'],
+        'ack': sequence_ack(upload['station_id'], upload['session']),
+        'inserted': len(stored)
+    }
+
+
+# async ingestion server functions
+
+class _RequestError(Exception):
+    """
+    Malformed request; the connection is answered and closed
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_request(reader, line):
+    """
+    Read the rest of an HTTP/1.x request after its request line.
+    Returns (method, path, version, headers, body).
+    """
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise _RequestError(400, 'Malformed request line')
+
+    headers = {}
+    while True:
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # Past the stream's line limit
+            raise _RequestError(431, 'Header line too long')
+        if line in (b'\r\n', b'\n', b''):
+            break
+        if len(headers) >= 100:
+            raise _RequestError(431, 'Too many headers')
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise _RequestError(411, 'Content-Length required')
+    try:
+        length = int(headers.get('content-length', 0))
+        if length < 0:
+            raise ValueError(length)
+    except ValueError:
+        raise _RequestError(400, 'Invalid Content-Length')
+    if length > INGEST_MAX_BODY:
+        raise _RequestError(413, 'Request body too large')
+    body = await reader.readexactly(length)
+    return method, target.split('?', 1)[0], version, headers, body
+
+
+def _http_response(status, body, headers, keep_alive):
+    payload = json.dumps(body).encode()
+    lines = [
+        f'HTTP/1.1 {status} {HTTPStatus(status).phrase}',
+        'Content-Type: application/json',
+        f'Content-Length: {len(payload)}',
+        'Connection: ' + ('keep-alive' if keep_alive else 'close')
+    ]
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload
+
+
+async def _dispatch_ingest(method, path, headers, body):
+    """
+    Handle one ingestion request. Returns (body, status, headers).
+    """
+    match = INGEST_ROUTE.fullmatch(path)
+    if match is None:
+        return {'error': 'Not found; dashboards and reads are served by the Flask app'}, 404, {}
+    if method != 'POST':
+        return {'error': 'Method not allowed'}, 405, {'Allow': 'POST'}
+
+    station_id = match['station']
+    if station_id is not None and not station_exists(station_id):
+        return {'error': f'Unknown station: {station_id}'}, 404, {}
+
+    ndjson = headers.get('content-type', '').split(';')[0].strip() == 'application/x-ndjson'
+    try:
+        text = body.decode('utf-8')
+        data = parse_batch(text, ndjson) if match['kind'] == 'batch' else json.loads(text)
+    except ValueError as e:
+        return {'error': f'Invalid JSON: {e}'}, 400, {}
+
+    if match['kind'] is None:
+        return accept_reading(data, station_id)
+
+    check = check_upload if match['kind'] == 'upload' else check_batch
+    error = check(data, station_id)
+    if error:
+        return error
+    readings = data['readings'] if match['kind'] == 'upload' else data
+    if not readings and match['kind'] == 'batch':
+        return batch_stored([]), 200, {}
+    try:
+        if match['kind'] == 'upload':
+            future = submit_readings(readings, [(data['session'], seq) for seq in data['seqs']])
+        else:
+            future = submit_readings(readings)
+    except queue.Full:
+        return QUEUE_FULL_RESPONSE
+    # The writer thread resolves the future; wait without blocking the loop
+    stored = await asyncio.wrap_future(future)
+    if match['kind'] == 'upload':
+        return upload_stored(data, stored), 200, {}
+    return batch_stored(stored), 201, {}
+
+
+async def _handle_ingest_connection(reader, writer):
+    connections, idle = _ingest_server['connections'], _ingest_server['idle']
+    connections.add(writer)
+    try:
+        while not _ingest_server['stop'].is_set():
+            # Idle until a request line arrives
+            idle[writer] = time.monotonic()
+            try:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), INGEST_IDLE_TIMEOUT)
+                except ValueError:
+                    # Past the stream's line limit
+                    raise _RequestError(400, 'Request line too long')
+                finally:
+                    idle.pop(writer, None)
+                if not line:
+                    break
+                request = await asyncio.wait_for(_read_request(reader, line), INGEST_IDLE_TIMEOUT)
+            except _RequestError as e:
+                writer.write(_http_response(e.status, {'error': str(e)}, {}, False))
+                await writer.drain()
+                break
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                break
+
+            method, path, version, headers, body = request
+            keep_alive = (headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                          and not _ingest_server['stop'].is_set())
+            try:
+                response, status, extra = await _dispatch_ingest(method, path, headers, body)
+            except Exception as e:
+                response, status, extra = {'error': str(e)}, 500, {}
+            writer.write(_http_response(status, response, extra, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.CancelledError):
+        # Cancelled if still busy when the loop shuts down
+        pass
+    finally:
+        idle.pop(writer, None)
+        connections.discard(writer)
+        writer.close()
+
+
+async def _serve_ingest(sock, packet_socks, ready, timeout):
+    loop = _ingest_server['loop'] = asyncio.get_running_loop()
+    _ingest_server['stop'] = stop = asyncio.Event()
+    servers = [await asyncio.start_server(_handle_ingest_connection, sock=sock)]
+    datagram_transport = None
+    if packet_socks is not None:
+        tcp_sock, udp_sock = packet_socks
+        servers.append(await asyncio.start_server(_handle_packet_connection, sock=tcp_sock))
+        datagram_transport, _ = await loop.create_datagram_endpoint(_PacketDatagramProtocol, sock=udp_sock)
+    ready.set()
+    await stop.wait()
+
+    # Stop accepting and give connections `timeout` seconds to finish:
+    # each answers its next request with Connection: close, so a sensor
+    # posting meanwhile is not cut off, and is hung up once it has been
+    # idle for INGEST_DRAIN_IDLE
+    for server in servers:
+        server.close()
+    if datagram_transport is not None:
+        datagram_transport.pause_reading()
+    # Connections accepted just before the close reach the handler on a
+    # later pass of the loop
+    await asyncio.sleep(0.5)
+    connections, idle = _ingest_server['connections'], _ingest_server['idle']
+    deadline = time.monotonic() + timeout
+    while (connections or _ingest_server['datagrams']) and time.monotonic() < deadline:
+        for writer, since in list(idle.items()):
+            if time.monotonic() - since >= INGEST_DRAIN_IDLE:
+                writer.close()
+        await asyncio.sleep(0.05)
+    if datagram_transport is not None:
+        datagram_transport.close()
+
+
+def bind_packet_sockets(host='0.0.0.0', port=PACKET_PORT):
+    """
+    Bind the TCP and UDP sockets for binary packets. Returns (tcp, udp).
+    """
+    tcp_sock = socket.create_server((host, port), backlog=INGEST_BACKLOG)
+    udp_sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_DGRAM)
+    udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, PACKET_UDP_BUFFER)
+    udp_sock.bind((host, port))
+    return tcp_sock, udp_sock
+
+
+def start_ingest_server(host='0.0.0.0', port=INGEST_PORT, sock=None, drain_timeout=30,
+                        packet_port=PACKET_PORT, packet_socks=None):
+    """
+    Start the asyncio ingestion server, which accepts the sensor POST
+    endpoints (/api/data, /api/data/batch and their per-station forms)
+    on many keep-alive connections at once, and binary packets over TCP
+    and UDP on packet_port, and hands readings to the ingestion writer.
+    Runs its event loop in a background thread of this process; returns
+    the thread.
+
+    `sock` and `packet_socks` ((tcp, udp) from bind_packet_sockets())
+    are sockets to serve instead of binding host and the ports; a
+    packet_port of None turns packets off. stop_ingest_server() waits
+    up to `drain_timeout` seconds for requests in flight.
+    """
+    # Bind here so a busy port fails loudly in the caller
+    if sock is None:
+        sock = socket.create_server((host, port), backlog=INGEST_BACKLOG,
+                                    reuse_port=hasattr(socket, 'SO_REUSEPORT'))
+    if packet_socks is None and packet_port is not None:
+        packet_socks = bind_packet_sockets(host, packet_port)
+    start_ingest_writer()
+    ready = threading.Event()
+    thread = threading.Thread(target=asyncio.run, args=(_serve_ingest(sock, packet_socks, ready, drain_timeout),),
+                              name='ingest-server', daemon=True)
+    thread.start()
+    ready.wait()
+    _ingest_server['thread'] = thread
+    return thread
+
+
+def stop_ingest_server():
+    """
+    Stop the ingestion server once the requests in flight are answered,
+    then commit everything still queued
+    """
+    thread, loop = _ingest_server['thread'], _ingest_server['loop']
+    if thread is not None and thread.is_alive():
+        loop.call_soon_threadsafe(_ingest_server['stop'].set)
+        thread.join()
+    _ingest_server['thread'] = None
+    stop_ingest_writer()
+
+
+# binary packet functions
+
+def packet_header_size(version):
+    """
+    Return the size of a packet's header, including the session of a
+    sequenced packet, or None for an unknown version
+    """
+    if version == PACKET_VERSION:
+        return PACKET_HEADER.size
+    if version == PACKET_SEQUENCED_VERSION:
+        return PACKET_HEADER.size + PACKET_SESSION.size
+    return None
+
+
+def decode_packet(data):
+    """
+    Decode a binary packet, checking all of its records at once.
+    Returns (station_id, session, seqs, readings), with a session of
+    None for unsequenced packets. Readings sent without a timestamp are
+    marked STAMPED and left at 0 for stamp_arrivals(), once the station
+    is known. Raises ValueError if the packet is malformed.
+    """
+    if len(data) < PACKET_HEADER.size:
+        raise ValueError('Truncated packet header')
+    magic, version, station_len, count = PACKET_HEADER.unpack_from(data)
+    header_size = packet_header_size(version)
+    if magic != PACKET_MAGIC or header_size is None or len(data) < header_size:
+        raise ValueError('Not a weather packet')
+    session = None
+    if version == PACKET_SEQUENCED_VERSION:
+        session, = PACKET_SESSION.unpack_from(data, PACKET_HEADER.size)
+    if count > MAX_BATCH_SIZE:
+        raise ValueError(f'Packet exceeds {MAX_BATCH_SIZE} readings')
+    offset = header_size + station_len
+    if len(data) != offset + count * PACKET_RECORD.itemsize:
+        raise ValueError('Packet length does not match its record count')
+    station_id = data[header_size:offset].decode('ascii', 'replace')
+    if not STATION_ID_PATTERN.fullmatch(station_id):
+        raise ValueError(f'Invalid station id: {station_id!r}')
+
+    records = np.frombuffer(data, PACKET_RECORD, count, offset)
+    # Through the shortest decimal form, so a float32 23.7 is stored as
+    # 23.7 rather than 23.700000762939453
+    values = np.column_stack([records[metric] for metric in METRICS]).astype(str).astype(np.float64)
+    if not np.isfinite(values).all():
+        raise ValueError('Packet holds a non-finite value')
+    timestamps = records['timestamp'].astype(np.int64)
+    if (timestamps < 0).any() or (timestamps >= MAX_TIMESTAMP).any():
+        raise ValueError('Packet holds an out of range timestamp')
+    unstamped = timestamps == 0
+
+    readings = []
+    for timestamp, row, stamped in zip(timestamps.tolist(), values.tolist(), unstamped.tolist()):
+        reading = dict(zip(METRICS, row), timestamp=timestamp, station_id=station_id)
+        reading['air_quality'] = round(reading['air_quality'])
+        if stamped:
+            reading[STAMPED] = True
+        readings.append(reading)
+
+    seqs = records['seq'].tolist()
+    if session is not None and any(b <= a for a, b in zip(seqs, seqs[1:])):
+        raise ValueError('Sequence numbers must increase')
+    return station_id, session, seqs, readings
+
+
+def stamp_arrivals(station_id, readings):
+    """
+    Give the decoded readings marked STAMPED their arrival timestamps.
+    Only for registered stations, since server_timestamps() keeps an
+    entry for every station it stamps for.
+    """
+    unstamped = [reading for reading in readings if reading.get(STAMPED)]
+    for reading, timestamp in zip(unstamped, server_timestamps(station_id, len(unstamped))):
+        reading['timestamp'] = timestamp
+
+
+async def _ingest_packet(data):
+    """
+    Decode and store one binary packet. Returns the ack to send back.
+    """
+    try:
+        station_id, session, seqs, readings = decode_packet(data)
+    except ValueError:
+        return PACKET_ACK.pack(PACKET_ACK_MAGIC, PACKET_INVALID, 0)
+    if not station_exists(station_id):
+        return PACKET_ACK.pack(PACKET_ACK_MAGIC, PACKET_UNKNOWN_STATION, 0)
+    stamp_arrivals(station_id, readings)
+
+    if readings or session is not None:
+        try:
+            future = submit_readings(readings, None if session is None else [(session, seq) for seq in seqs])
+        except queue.Full:
+            return PACKET_ACK.pack(PACKET_ACK_MAGIC, PACKET_BUSY, 0)
+        try:
+            await asyncio.wrap_future(future)
+        except Exception:
+            return PACKET_ACK.pack(PACKET_ACK_MAGIC, PACKET_FAILED, 0)
+    if session is not None:
+        return PACKET_ACK.pack(PACKET_ACK_MAGIC, PACKET_OK, sequence_ack(station_id, session))
+    return PACKET_ACK.pack(PACKET_ACK_MAGIC, PACKET_OK, max(seqs, default=0))
+
+
+async def _handle_packet_connection(reader, writer):
+    connections, idle = _ingest_server['connections'], _ingest_server['idle']
+    connections.add(writer)
+    try:
+        while not _ingest_server['stop'].is_set():
+            idle[writer] = time.monotonic()
+            try:
+                try:
+                    header = await asyncio.wait_for(reader.readexactly(PACKET_HEADER.size), INGEST_IDLE_TIMEOUT)
+                finally:
+                    idle.pop(writer, None)
+                magic, version, station_len, count = PACKET_HEADER.unpack(header)
+                header_size = packet_header_size(version)
+                if magic != PACKET_MAGIC or header_size is None:
+                    # Not in step with the stream; nothing after this can be framed
+                    writer.write(PACKET_ACK.pack(PACKET_ACK_MAGIC, PACKET_INVALID, 0))
+                    await writer.drain()
+                    break
+                body = await asyncio.wait_for(reader.readexactly(
+                    header_size - PACKET_HEADER.size + station_len + count * PACKET_RECORD.itemsize
+                ), INGEST_IDLE_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                break
+
+            writer.write(await _ingest_packet(header + body))
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        # Cancelled if still busy when the loop shuts down
+        pass
+    finally:
+        idle.pop(writer, None)
+        connections.discard(writer)
+        writer.close()
+
+
+class _PacketDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    One binary packet per datagram, acked to the sender
+    """
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        task = asyncio.ensure_future(self._store(data, addr))
+        _ingest_server['datagrams'].add(task)
+        task.add_done_callback(_ingest_server['datagrams'].discard)
+
+    async def _store(self, data, addr):
+        ack = await _ingest_packet(data)
+        if not self.transport.is_closing():
+            self.transport.sendto(ack, addr)
+
+
+# running aggregate functions
+
+def _reset_aggregates():
+    _aggregates.update(last_id=0, archived=False, stations={})
+
+
+def _station_aggregates(station_id):
+    return _aggregates['stations'].setdefault(
+        station_id, {'count': 0, 'sum': {}, 'min': {}, 'max': {}}
+    )
+
+
+def _fold_aggregates(conn, after_id, up_to_id):
+    """
+    Fold rows with after_id < id <= up_to_id into the running aggregates.
+    Must be called with _aggregates_lock held.
+    """
+    parts = ['station_id', 'COUNT(*)']
+    for metric in METRICS:
+        parts += [f'SUM({metric})', f'MIN({metric})', f'MAX({metric})']
+    rows = conn.execute(
+        f"SELECT {', '.join(parts)} FROM weather_readings WHERE id > ? AND id <= ? "
+        f"GROUP BY station_id",
+        (after_id, up_to_id)
+    ).fetchall()
+    _fold_station_rows(rows)
+    _aggregates['last_id'] = up_to_id
+
+
+def _fold_partition_stats(conn):
+    """
+    Fold the stored aggregates of every archived partition into the
+    running aggregates. Must be called with _aggregates_lock held.
+    """
+    parts = ['station_id', 'SUM(count)']
+    for metric in METRICS:
+        parts += [f'SUM({metric}_sum)', f'MIN({metric}_min)', f'MAX({metric}_max)']
+    rows = conn.execute(
+        f"SELECT {', '.join(parts)} FROM partition_stats GROUP BY station_id"
+    ).fetchall()
+    _fold_station_rows(rows)
+    _aggregates['archived'] = True
+
+
+def _fold_station_rows(rows):
+    # Rows are (station_id, count, then sum/min/max per metric)
+    for row in rows:
+        agg = _station_aggregates(row[0])
+        for i, metric in enumerate(METRICS):
+            total, low, high = row[2 + 3 * i:5 + 3 * i]
+            agg['sum'][metric] = agg['sum'].get(metric, 0) + total
+            agg['min'][metric] = low if metric not in agg['min'] else min(agg['min'][metric], low)
+            agg['max'][metric] = high if metric not in agg['max'] else max(agg['max'][metric], high)
+        agg['count'] += row[1]
+
+
+def sync_aggregates(conn):
+    """
+    Bring the running aggregates in line with the table.
+
+    Rows written since the last sync (e.g. by another process) are
+    folded in by id range; if the table's max id went backwards, rows
+    were deleted or archived and the store is rebuilt from scratch, from
+    the archived partitions' stored aggregates plus the rows still in
+    weather_readings.
+    """
+    # One read snapshot, so rows archived meanwhile are counted once
+    snapshot = not conn.in_transaction
+    if snapshot:
+        conn.execute("BEGIN")
+    try:
+        max_id = conn.execute("SELECT MAX(id) FROM weather_readings").fetchone()[0] or 0
+        with _aggregates_lock:
+            if max_id < _aggregates['last_id']:
+                _reset_aggregates()
+            if not _aggregates['archived']:
+                _fold_partition_stats(conn)
+            if max_id > _aggregates['last_id']:
+                _fold_aggregates(conn, _aggregates['last_id'], max_id)
+    finally:
+        if snapshot:
+            conn.commit()
+
+
+def update_aggregates(reading):
+    """
+    Fold a newly inserted reading into the running aggregates. Returns
+    False if the reading is not the next one in id order, in which case
+    the caller should sync_aggregates() instead.
+    """
+    with _aggregates_lock:
+        if reading['id'] != _aggregates['last_id'] + 1:
+            return False
+        agg = _station_aggregates(reading['station_id'])
+        for metric in METRICS:
+            value = reading[metric]
+            agg['sum'][metric] = agg['sum'].get(metric, 0) + value
+            agg['min'][metric] = min(agg['min'].get(metric, value), value)
+            agg['max'][metric] = max(agg['max'].get(metric, value), value)
+        agg['count'] += 1
+        _aggregates['last_id'] = reading['id']
+        return True
+
+
+def get_aggregates(station_id=None):
+    """
+    Return a consistent snapshot of the running aggregates of one
+    station, or combined over every station
+    """
+    with _aggregates_lock:
+        if station_id is not None:
+            parts = [_aggregates['stations'].get(station_id, {'count': 0, 'sum': {}, 'min': {}, 'max': {}})]
+        else:
+            parts = list(_aggregates['stations'].values())
+
+        combined = {'count': 0, 'sum': {}, 'min': {}, 'max': {}}
+        for agg in parts:
+            combined['count'] += agg['count']
+            for metric in agg['sum']:
+                combined['sum'][metric] = combined['sum'].get(metric, 0) + agg['sum'][metric]
+                combined['min'][metric] = min(combined['min'].get(metric, agg['min'][metric]), agg['min'][metric])
+                combined['max'][metric] = max(combined['max'].get(metric, agg['max'][metric]), agg['max'][metric])
+        return combined
+
+
+# rollup functions
+
+def bucket_start(timestamp, resolution):
+    """
+    Return the start of the rollup bucket containing a stored timestamp
+    """
+    length = ROLLUP_RESOLUTIONS[resolution]
+    return timestamp - (timestamp + IST_MS) % length
+
+
+def compact_rollups(conn):
+    """
+    Fold readings inserted since the last compaction into every rollup
+    table, per station. Runs as one write transaction so the rollups and their
+    high-water marks always move together.
+    """
+    changed = False
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        max_id = conn.execute("SELECT MAX(id) FROM weather_readings").fetchone()[0] or 0
+        for resolution, length in ROLLUP_RESOLUTIONS.items():
+            row = conn.execute(
+                "SELECT last_id FROM rollup_state WHERE resolution = ?", (resolution,)
+            ).fetchone()
+            last_id = row[0] if row else 0
+            if max_id <= last_id:
+                continue
+
+            bucket = f"timestamp - (timestamp + {IST_MS}) % {length}"
+            columns, selects = ['station_id', 'bucket', 'count'], ['station_id', bucket, 'COUNT(*)']
+            updates = ['count = count + excluded.count']
+            for metric in METRICS:
+                columns += [f'{metric}_sum', f'{metric}_min', f'{metric}_max']
+                selects += [f'SUM({metric})', f'MIN({metric})', f'MAX({metric})']
+                updates += [
+                    f'{metric}_sum = {metric}_sum + excluded.{metric}_sum',
+                    f'{metric}_min = MIN({metric}_min, excluded.{metric}_min)',
+                    f'{metric}_max = MAX({metric}_max, excluded.{metric}_max)'
+                ]
+
+            conn.execute(
+                f"INSERT INTO weather_rollup_{resolution} ({', '.join(columns)}) "
+                f"SELECT {', '.join(selects)} FROM weather_readings "
+                f"WHERE id > ? AND id <= ? GROUP BY 1, 2 "
+                f"ON CONFLICT(station_id, bucket) DO UPDATE SET {', '.join(updates)}",
+                (last_id, max_id)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO rollup_state (resolution, last_id) VALUES (?, ?)",
+                (resolution, max_id)
+            )
+            changed = True
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if changed:
+        bump_data_version()
+
+
+def choose_resolution(since, until, max_points=ROLLUP_MAX_POINTS):
+    """
+    Pick the finest rollup resolution that covers the window in at most
+    max_points buckets; unbounded windows get the coarsest table.
+    """
+    if since is None or until is None:
+        return 'day'
+    for resolution, length in ROLLUP_RESOLUTIONS.items():
+        if (until - since) / length <= max_points:
+            return resolution
+    return 'day'
+
+
+def query_rollup(conn, resolution, since=None, until=None, station_id=None):
+    """
+    Return rollup buckets overlapping [since, until), oldest first, with
+    avg/min/max/sum per metric, of one station if station_id is given
+    or else of all stations together
+    """
+    columns = ['bucket', 'SUM(count)']
+    for metric in METRICS:
+        columns += [f'SUM({metric}_sum)', f'MIN({metric}_min)', f'MAX({metric}_max)']
+
+    clauses, params = [], []
+    if station_id is not None:
+        clauses.append("station_id = ?")
+        params.append(station_id)
+    if since is not None:
+        clauses.append("bucket >= ?")
+        params.append(bucket_start(since, resolution))
+    if until is not None:
+        clauses.append("bucket < ?")
+        params.append(until)
+    sql = f"SELECT {', '.join(columns)} FROM weather_rollup_{resolution}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " GROUP BY bucket ORDER BY bucket"
+
+    buckets = []
+    for row in conn.execute(sql, params):
+        count = row[1]
+        bucket = {'bucket': format_timestamp(row[0]), 'count': count}
+        for i, metric in enumerate(METRICS):
+            total, low, high = row[2 + 3 * i:5 + 3 * i]
+            bucket[f'avg_{metric}'] = total / count
+            bucket[f'min_{metric}'] = low
+            bucket[f'max_{metric}'] = high
+            bucket[f'sum_{metric}'] = total
+        buckets.append(bucket)
+    return buckets
+
+
+def _rollup_worker():
+    while True:
+        try:
+            with db_connection() as conn:
+                compact_rollups(conn)
+                archive_partitions(conn)
+        except Exception as e:
+            app.logger.error(f"Rollup compaction failed: {e}")
+        time.sleep(ROLLUP_INTERVAL)
+
+
+def start_rollup_worker():
+    """
+    Start the background thread that keeps the rollup tables current
+    and moves rolled-up months into their partitions
+    """
+    thread = threading.Thread(target=_rollup_worker, name='rollup-worker', daemon=True)
+    thread.start()
+    return thread
+
+
+# partition functions
+
+def month_bounds(timestamp):
+    """
+    Return the IST calendar month holding a stored timestamp as
+    ('YYYY-MM', start, end), with start and end in epoch milliseconds
+    """
+    local = (EPOCH + timedelta(milliseconds=timestamp)).astimezone(IST_TZ)
+    start = local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return (start.strftime('%Y-%m'),
+            (start - EPOCH) // timedelta(milliseconds=1),
+            (end - EPOCH) // timedelta(milliseconds=1))
+
+
+def partition_path(month):
+    """
+    Path of the SQLite file holding an archived month
+    """
+    root = os.path.dirname(os.path.abspath(DATABASE_PATH))
+    return os.path.join(root, PARTITION_DIR, f'weather_readings_{month}.db')
+
+
+def open_partition(month):
+    """
+    Open an archived month read-only, or return None if its file is gone
+    """
+    try:
+        return sqlite3.connect(f"file:{quote(partition_path(month))}?mode=ro",
+                               uri=True, check_same_thread=False)
+    except sqlite3.OperationalError:
+        return None
+
+
+def route_partitions(conn, since=None, until=None, after_id=None):
+    """
+    Return (month, sealed, end) for the archived months, oldest first,
+    that may hold readings in [since, until) or with an id above
+    after_id
+    """
+    clauses, params = ["dropped_at IS NULL"], []
+    if since is not None:
+        clauses.append("end > ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("start < ?")
+        params.append(until)
+    if after_id is not None:
+        clauses.append("max_id > ?")
+        params.append(after_id)
+    return [(row[0], row[1] is not None, row[2]) for row in conn.execute(
+        f"SELECT month, sealed_at, end FROM partitions WHERE {' AND '.join(clauses)} ORDER BY start", params
+    )]
+
+
+def routed_query(conn, sql, params, months, key, reverse=False, limit=None, chunks=None, month_bound=None):
+    """
+    Run a query over weather_readings on the main database and on each
+    archived month, and merge the results, which must each be sorted by
+    key. Sealed months are also scanned with scan_chunks(**chunks),
+    which must select and order the same rows as the query. Returns a
+    generator; close() it to finish the statements early.
+
+    For newest-first queries with a limit, month_bound maps a month's
+    end to a key none of its rows reaches; months are then opened
+    newest first, and only until the rows found fill the limit past it.
+    """
+    if reverse and limit is not None and month_bound is not None:
+        return _newest_rows(conn, sql, params, months, key, limit, chunks, month_bound)
+    cursors = [conn.execute(sql, params)]
+    closers = list(cursors)
+    for month, sealed, _ in months:
+        partition = open_partition(month)
+        if partition is None:
+            # Dropped by retention since it was routed
+            continue
+        closers.append(partition)
+        cursors.append(partition.execute(sql, params))
+        if sealed:
+            cursors.append(scan_chunks(partition, reverse=reverse, **chunks))
+    return _merge_rows(cursors, closers, key, reverse, limit)
+
+
+def _newest_rows(conn, sql, params, months, key, limit, chunks, month_bound):
+    rows = conn.execute(sql, params).fetchall()
+    for month, sealed, end in reversed(months):
+        # Older months end earlier still
+        if len(rows) >= limit and key(rows[limit - 1]) >= month_bound(end):
+            break
+        partition = open_partition(month)
+        if partition is None:
+            continue
+        cursors = [partition.execute(sql, params)]
+        if sealed:
+            cursors.append(scan_chunks(partition, reverse=True, **chunks))
+        rows = list(_merge_rows([iter(rows)] + cursors, [partition], key, True, limit))
+    yield from rows[:limit]
+
+
+def _merge_rows(cursors, closers, key, reverse, limit):
+    merged = None
+    try:
+        if len(cursors) == 1:
+            rows = cursors[0]
+        else:
+            merged = heapq.merge(*cursors, key=key, reverse=reverse)
+            rows = _unique_rows(merged, key)
+        yield from itertools.islice(rows, limit)
+    finally:
+        # The merge must let go of the cursors before they are closed
+        if merged is not None:
+            merged.close()
+        for closer in closers:
+            closer.close()
+
+
+def _unique_rows(rows, key):
+    # A month being re-archived is briefly in both places
+    previous = None
+    for row in rows:
+        current = key(row)
+        if current != previous:
+            previous = current
+            yield row
+
+
+def _create_partition_schema(conn):
+    # Same columns as weather_readings; ids are kept, not reassigned
+    metric_columns = ''.join(
+        f"{metric} {'INTEGER' if metric == 'air_quality' else 'REAL'} NOT NULL, " for metric in METRICS
+    )
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS archive.weather_readings (
+            id INTEGER PRIMARY KEY,
+            timestamp INTEGER NOT NULL,
+            {metric_columns}station_id TEXT NOT NULL
+        )
+    """)
+    # Sealed readings: one compressed block of a station's readings per
+    # chunk, with its time, id and value ranges
+    range_columns = ''.join(f"{metric}_min REAL, {metric}_max REAL, " for metric in METRICS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS archive.chunks (
+            chunk_id INTEGER PRIMARY KEY,
+            station_id TEXT NOT NULL,
+            min_timestamp INTEGER NOT NULL,
+            max_timestamp INTEGER NOT NULL,
+            min_id INTEGER NOT NULL,
+            max_id INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            {range_columns}data BLOB NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS archive.idx_chunks_station_timestamp
+        ON chunks (station_id, min_timestamp)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS archive.idx_weather_readings_timestamp
+        ON weather_readings (timestamp)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS archive.idx_weather_readings_station_timestamp
+        ON weather_readings (station_id, timestamp)
+    """)
+
+
+def _archive_month(conn, month, start, end, up_to_id):
+    """
+    Move rows of one month with id <= up_to_id into its partition file
+    """
+    path = partition_path(month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    columns = ', '.join(READING_COLUMNS)
+    predicate = "timestamp >= ? AND timestamp < ? AND id <= ?"
+    params = (start, end, up_to_id)
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config['JSON_SORT_KEYS'] = False
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        # Copy and commit the partition before deleting anything
+        conn.execute("BEGIN")
+        try:
+            _create_partition_schema(conn)
+            conn.execute(
+                f"INSERT OR REPLACE INTO archive.weather_readings ({columns}) "
+                f"SELECT {columns} FROM main.weather_readings WHERE {predicate}",
+                params
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        stat_columns, selects = ['month', 'station_id', 'count'], ['?', 'station_id', 'COUNT(*)']
+        updates = ['count = count + excluded.count']
+        for metric in METRICS:
+            stat_columns += [f'{metric}_sum', f'{metric}_min', f'{metric}_max']
+            selects += [f'SUM({metric})', f'MIN({metric})', f'MAX({metric})']
+            updates += [
+                f'{metric}_sum = {metric}_sum + excluded.{metric}_sum',
+                f'{metric}_min = MIN({metric}_min, excluded.{metric}_min)',
+                f'{metric}_max = MAX({metric}_max, excluded.{metric}_max)'
+            ]
+
+        # Stats, delete and catalog move together
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"INSERT INTO partition_stats ({', '.join(stat_columns)}) "
+                f"SELECT {', '.join(selects)} FROM main.weather_readings "
+                f"WHERE {predicate} GROUP BY station_id "
+                f"ON CONFLICT(month, station_id) DO UPDATE SET {', '.join(updates)}",
+                (month,) + params
+            )
+            conn.execute(f"DELETE FROM main.weather_readings WHERE {predicate}", params)
+            rows, max_id = conn.execute(
+                "SELECT SUM(rows), MAX(max_id) FROM ("
+                "SELECT COUNT(*) AS rows, MAX(id) AS max_id FROM archive.weather_readings "
+                "UNION ALL SELECT SUM(rows), MAX(max_id) FROM archive.chunks)"
+            ).fetchone()
+            conn.execute(
+                "INSERT INTO partitions (month, start, end, rows, max_id) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(month) DO UPDATE SET rows = excluded.rows, "
+                "max_id = excluded.max_id, dropped_at = NULL",
+                (month, start, end, rows, max_id)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+
+def drop_partition(conn, month, now):
+    """
+    Delete an archived month's raw readings, keeping its catalog entry
+    and stored aggregates (its rollups are untouched)
+    """
+    conn.execute("UPDATE partitions SET dropped_at = ? WHERE month = ?", (now, month))
+    conn.commit()
+    path = partition_path(month)
+    if os.path.exists(path):
+        os.remove(path)
 
-# Database configuration
-DATABASE_PATH = 'weather_data.db'
 
-# database functions 
+def archive_partitions(conn, now=None):
+    """
+    Move whole months before the hot window out of weather_readings into
+    their partition files, once every rollup table covers their rows,
+    drop raw partitions past RETENTION_DAYS and seal those past
+    COLD_AFTER_DAYS. Returns the months archived or dropped.
+    """
+    if now is None:
+        now = (datetime.now(timezone.utc) - EPOCH) // timedelta(milliseconds=1)
+    cutoff = month_bounds(now)[1]
+    for _ in range(PARTITION_HOT_MONTHS):
+        cutoff = month_bounds(cutoff - 1)[1]
+
+    rolled, tables = conn.execute("SELECT MIN(last_id), COUNT(*) FROM rollup_state").fetchone()
+    rolled = rolled if tables == len(ROLLUP_RESOLUTIONS) else 0
+
+    # Rows must be in the running aggregates before they leave the table
+    sync_aggregates(conn)
+
+    changed = []
+    while True:
+        oldest = conn.execute(
+            "SELECT MIN(timestamp) FROM weather_readings WHERE timestamp < ? AND id <= ?",
+            (cutoff, rolled)
+        ).fetchone()[0]
+        if oldest is None:
+            break
+        month, start, end = month_bounds(oldest)
+        _archive_month(conn, month, start, end, rolled)
+        changed.append(month)
+
+    if RETENTION_DAYS is not None:
+        horizon = now - RETENTION_DAYS * 24 * 60 * 60 * 1000
+        expired = conn.execute(
+            "SELECT month FROM partitions WHERE end <= ? AND dropped_at IS NULL ORDER BY start",
+            (horizon,)
+        ).fetchall()
+        for (month,) in expired:
+            drop_partition(conn, month, now)
+            changed.append(month)
+
+    # Sealing moves rows within a partition, so readers see no change
+    cold = conn.execute(
+        "SELECT month FROM partitions WHERE end <= ? AND dropped_at IS NULL "
+        "AND rows > sealed_rows ORDER BY start",
+        (now - COLD_AFTER_DAYS * 24 * 60 * 60 * 1000,)
+    ).fetchall()
+    for (month,) in cold:
+        seal_partition(conn, month, now)
+
+    if changed:
+        bump_data_version()
+    return changed
+
+
+# cold storage functions
+
+def _pack_ints(values, order):
+    """
+    Encode int64 values as `order` levels of differences, narrowed to
+    the smallest integer width that holds them. The first value of each
+    level is kept as a header.
+    """
+    heads = []
+    for _ in range(order):
+        if not len(values):
+            break
+        heads.append(int(values[0]))
+        values = np.diff(values)
+    for width in (1, 2, 4, 8):
+        info = np.iinfo(f'i{width}')
+        if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+            break
+    return (struct.pack(f'<BB{len(heads)}q', len(heads), width, *heads) +
+            values.astype(f'<i{width}').tobytes())
+
+
+def _unpack_ints(buffer, offset, rows):
+    levels, width = struct.unpack_from('<BB', buffer, offset)
+    heads = struct.unpack_from(f'<{levels}q', buffer, offset + 2)
+    offset += 2 + 8 * levels
+    count = rows - levels
+    values = np.frombuffer(buffer, dtype=f'<i{width}', count=count, offset=offset).astype(np.int64)
+    for head in reversed(heads):
+        values = np.concatenate(([head], head + np.cumsum(values)))
+    return values, offset + count * width
+
+
+def _pack_floats(values):
+    """
+    Encode float64 values losslessly: as scaled integer differences when
+    every value round-trips through a few decimal places (sensor output
+    usually does), otherwise as each value's bits XORed with the
+    previous value's (Gorilla style)
+    """
+    # -0.0 has no integer form, so it keeps its bits
+    for places in range(7 if not np.signbit(values[values == 0]).any() else 0):
+        scaled = np.round(values * 10 ** places)
+        if np.all(np.abs(scaled) < 2 ** 53) and np.array_equal(scaled / 10 ** places, values):
+            return b'd' + struct.pack('<B', places) + _pack_ints(scaled.astype(np.int64), 1)
+    bits = values.astype('<f8').view('<u8')
+    previous = np.concatenate((np.zeros(1, dtype='<u8'), bits[:-1]))
+    return b'x' + np.bitwise_xor(bits, previous).tobytes()
+
+
+def _unpack_floats(buffer, offset, rows):
+    kind = buffer[offset:offset + 1]
+    if kind == b'd':
+        places = buffer[offset + 1]
+        scaled, offset = _unpack_ints(buffer, offset + 2, rows)
+        return scaled / 10 ** places, offset
+    bits = np.frombuffer(buffer, dtype='<u8', count=rows, offset=offset + 1)
+    return np.bitwise_xor.accumulate(bits).view('<f8'), offset + 1 + 8 * rows
+
+
+def encode_chunk(ids, timestamps, values):
+    """
+    Compress one station's readings, sorted by (timestamp, id), into a
+    chunk: ids as differences, timestamps as differences of differences
+    (regular intervals make them near zero), then each metric column,
+    all deflated together
+    """
+    parts = [_pack_ints(ids, 1), _pack_ints(timestamps, 2)]
+    parts += [_pack_floats(values[:, i]) for i in range(len(METRICS))]
+    return zlib.compress(b''.join(parts), 9)
 
-def init_database():
+
+def decode_chunk(data, rows):
     """
-    Initialize the SQLite database and create the weather_readings table
-    if it doesn't exist. Also populates with sample data on first run.
+    Inverse of encode_chunk: return (ids, timestamps, values)
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    buffer = zlib.decompress(data)
+    ids, offset = _unpack_ints(buffer, 0, rows)
+    timestamps, offset = _unpack_ints(buffer, offset, rows)
+    values = np.empty((rows, len(METRICS)))
+    for i in range(len(METRICS)):
+        values[:, i], offset = _unpack_floats(buffer, offset, rows)
+    return ids, timestamps, values
 
-    # Create table if not exists
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS weather_readings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            temperature REAL NOT NULL,
-            humidity REAL NOT NULL,
-            pressure REAL NOT NULL,
-            air_quality INTEGER NOT NULL,
-            wind_speed REAL NOT NULL,
-            wind_direction REAL NOT NULL,
-            rainfall REAL NOT NULL
+
+def seal_partition(conn, month, now):
+    """
+    Compress the row-form readings of an archived month into chunks,
+    inside its partition file, and reclaim the space they used
+    """
+    conn.execute("ATTACH DATABASE ? AS archive", (partition_path(month),))
+    try:
+        _create_partition_schema(conn)
+        conn.commit()
+        # From here on readers scan the chunks as well as the rows, so
+        # the move below is invisible to them
+        conn.execute("UPDATE partitions SET sealed_at = COALESCE(sealed_at, ?) WHERE month = ?", (now, month))
+        conn.commit()
+
+        range_columns = [f'{metric}_{bound}' for metric in METRICS for bound in ('min', 'max')]
+        columns = ['station_id', 'min_timestamp', 'max_timestamp', 'min_id', 'max_id', 'rows'] + \
+            range_columns + ['data']
+        insert = (f"INSERT INTO archive.chunks ({', '.join(columns)}) "
+                  f"VALUES ({', '.join('?' for _ in columns)})")
+
+        conn.execute("BEGIN")
+        try:
+            stations = [row[0] for row in conn.execute(
+                "SELECT DISTINCT station_id FROM archive.weather_readings"
+            )]
+            for station_id in stations:
+                rows = conn.execute(
+                    f"SELECT id, timestamp, {', '.join(METRICS)} FROM archive.weather_readings "
+                    f"WHERE station_id = ? ORDER BY timestamp, id",
+                    (station_id,)
+                ).fetchall()
+                data = np.array(rows, dtype=np.float64)
+                for start in range(0, len(data), SEAL_CHUNK_ROWS):
+                    block = data[start:start + SEAL_CHUNK_ROWS]
+                    ids, timestamps, values = block[:, 0].astype(np.int64), block[:, 1].astype(np.int64), block[:, 2:]
+                    ranges = []
+                    for i in range(len(METRICS)):
+                        ranges += [float(values[:, i].min()), float(values[:, i].max())]
+                    conn.execute(insert, [
+                        station_id, int(timestamps[0]), int(timestamps[-1]),
+                        int(ids.min()), int(ids.max()), len(block)
+                    ] + ranges + [encode_chunk(ids, timestamps, values)])
+            conn.execute("DELETE FROM archive.weather_readings")
+            sealed = conn.execute("SELECT COALESCE(SUM(rows), 0) FROM archive.chunks").fetchone()[0]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        conn.execute("VACUUM archive")
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+    conn.execute("UPDATE partitions SET sealed_rows = ? WHERE month = ?", (sealed, month))
+    conn.commit()
+
+
+def scan_chunks(partition, columns=READING_COLUMNS, order_by='time', reverse=False, since=None,
+                until=None, after=None, after_id=None, station_id=None):
+    """
+    Yield the readings in a sealed partition's chunks that match the
+    filters, as rows of `columns`, ordered by (timestamp, id) or by id.
+    Only chunks whose ranges can match are read, and each is decoded
+    only once the rows before it have been yielded.
+
+    since is inclusive and until exclusive; after is a keyset
+    (timestamp, id) position, passed in the direction of `reverse`.
+    """
+    clauses, params = [], []
+    if station_id is not None:
+        clauses.append("station_id = ?")
+        params.append(station_id)
+    if since is not None:
+        clauses.append("max_timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("min_timestamp < ?")
+        params.append(until)
+    if after is not None:
+        clauses.append("min_timestamp <= ?" if reverse else "max_timestamp >= ?")
+        params.append(after[0])
+    if after_id is not None:
+        clauses.append("max_id > ?")
+        params.append(after_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    chunks = partition.execute(
+        f"SELECT chunk_id, station_id, min_timestamp, max_timestamp, min_id, rows FROM chunks {where}",
+        params
+    ).fetchall()
+
+    # Sort keys for rows and the lowest key each chunk could produce
+    if order_by == 'id':
+        row_keys = lambda ids, ts: [(i,) for i in ids.tolist()]
+        chunk_key = lambda chunk: (chunk[4],)
+    elif reverse:
+        row_keys = lambda ids, ts: list(zip((-ts).tolist(), (-ids).tolist()))
+        chunk_key = lambda chunk: (-chunk[3],)
+    else:
+        row_keys = lambda ids, ts: list(zip(ts.tolist(), ids.tolist()))
+        chunk_key = lambda chunk: (chunk[2],)
+    pending = sorted(chunks, key=chunk_key, reverse=True)
+
+    positions = {column: i for i, column in enumerate(READING_COLUMNS)}
+    heap = []
+    while pending or heap:
+        # Decode every chunk that could hold a row before the next one out
+        while pending and (not heap or chunk_key(pending[-1]) <= heap[0][0]):
+            chunk = pending.pop()
+            data = partition.execute("SELECT data FROM chunks WHERE chunk_id = ?", (chunk[0],)).fetchone()[0]
+            ids, timestamps, values = decode_chunk(data, chunk[5])
+
+            mask = np.ones(len(ids), dtype=bool)
+            if since is not None:
+                mask &= timestamps >= since
+            if until is not None:
+                mask &= timestamps < until
+            if after is not None and reverse:
+                mask &= (timestamps < after[0]) | ((timestamps == after[0]) & (ids < after[1]))
+            elif after is not None:
+                mask &= (timestamps > after[0]) | ((timestamps == after[0]) & (ids > after[1]))
+            if after_id is not None:
+                mask &= ids > after_id
+
+            full = [ids[mask].tolist(), timestamps[mask].tolist()]
+            full += [values[mask, i].tolist() for i in range(len(METRICS))]
+            full[positions['air_quality']] = [int(v) for v in full[positions['air_quality']]]
+            full.append([chunk[1]] * int(mask.sum()))
+            keys = row_keys(ids[mask], timestamps[mask])
+            for key, row in zip(keys, zip(*(full[positions[column]] for column in columns))):
+                heapq.heappush(heap, (key, row))
+        if heap:
+            yield heapq.heappop(heap)[1]
+
+
+# downsampling functions
+
+def lttb(x, y, points):
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of
+    the `points` samples of (x, y) that best preserve the line's shape;
+    the first and last samples are always kept.
+    """
+    size = len(x)
+    if points >= size:
+        return np.arange(size)
+    if points < 3:
+        return np.array([0, size - 1][:points])
+
+    # points - 2 buckets over the samples between the fixed end points
+    edges = np.linspace(1, size - 1, points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:size - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:size - 1], edges[:-1] - 1) / counts
+    # The bucket after the last one is the final sample itself
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a])
         )
-    """)
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_downsample(y, points):
+    """
+    Min/max bucketing: keep the first and last samples, split y into
+    (points - 2) // 2 buckets and keep the indices of each bucket's
+    minimum and maximum, in time order.
+    """
+    size = len(y)
+    buckets = (points - 2) // 2
+    if points >= size:
+        return np.arange(size)
+    if buckets < 1:
+        return np.array([0, size - 1][:points])
+
+    starts = np.linspace(0, size, buckets + 1).astype(np.int64)[:-1]
+    counts = np.diff(np.append(starts, size))
+    bucket_of = np.repeat(np.arange(buckets), counts)
+
+    selected = []
+    for reduce in (np.minimum, np.maximum):
+        extreme = np.repeat(reduce.reduceat(y, starts), counts)
+        hits = np.flatnonzero(y == extreme)
+        # First matching sample in each bucket
+        _, first = np.unique(bucket_of[hits], return_index=True)
+        selected.append(hits[first])
+    selected.append([0, size - 1])
+    return np.unique(np.concatenate(selected))
+
+
+def query_series(conn, metrics, since, until, points, method='lttb', station_id=None):
+    """
+    Load the metrics for [since, until), of one station if station_id
+    is given, and downsample each to at most `points` samples. Returns
+    {metric: (timestamps, values)} as arrays.
+    """
+    station, params = ("station_id = ? AND ", (station_id,)) if station_id is not None else ("", ())
+    rows = list(routed_query(
+        conn,
+        f"SELECT id, timestamp, {', '.join(metrics)} FROM weather_readings "
+        f"WHERE {station}timestamp >= ? AND timestamp < ? ORDER BY timestamp, id",
+        params + (since, until),
+        route_partitions(conn, since, until),
+        key=lambda row: (row[1], row[0]),
+        chunks=dict(columns=['id', 'timestamp'] + metrics, since=since, until=until, station_id=station_id)
+    ))
+    data = np.array(rows, dtype=np.float64).reshape(len(rows), len(metrics) + 2)
+    x = data[:, 1]
+
+    series = {}
+    for i, metric in enumerate(metrics):
+        y = data[:, i + 2]
+        if method == 'minmax':
+            index = minmax_downsample(y, points)
+        else:
+            index = lttb(x, y, points)
+        series[metric] = (x[index].astype(np.int64), y[index])
+    return series
+
+
+# response format functions
+
+def negotiate_format():
+    """
+    Pick the response format for a bulk read from ?format= or, failing
+    that, the Accept header. Raises ValueError for unknown formats and
+    LookupError when Arrow is asked for but pyarrow is not installed.
+    """
+    fmt = request.args.get('format')
+    if fmt is None:
+        offered = [mimetype for name, mimetype in READ_FORMATS.items()
+                   if name != 'arrow' or pa is not None]
+        best = request.accept_mimetypes.best_match(offered, default=READ_FORMATS['json'])
+        fmt = next(name for name, mimetype in READ_FORMATS.items() if mimetype == best)
+    if fmt not in READ_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(READ_FORMATS)}")
+    if fmt == 'arrow' and pa is None:
+        raise LookupError('Arrow output requires pyarrow')
+    return fmt
+
+
+def rows_to_columns(rows):
+    """
+    Turn weather_readings rows into one NumPy array per column: int64
+    for id and timestamp (epoch ms), float32 for the metrics and
+    strings for station_id
+    """
+    numeric = READING_COLUMNS[:-1]
+    data = np.array([row[:-1] for row in rows], dtype=np.float64).reshape(len(rows), len(numeric))
+    columns = {}
+    for i, column in enumerate(numeric):
+        dtype = np.int64 if column in ('id', 'timestamp') else np.float32
+        columns[column] = data[:, i].astype(dtype)
+    columns['station_id'] = np.array([row[-1] for row in rows], dtype=object)
+    return columns
+
 
-    # Check if table is empty
-    cursor.execute("SELECT COUNT(*) FROM weather_readings")
-    count = cursor.fetchone()[0]
+def pack_columns(columns):
+    """
+    Encode columns in the binary layout served as format=binary. All
+    values are little-endian:
+
+        magic       4 bytes   b'WXC1'
+        row count   uint32
+        col count   uint32
+        per column  type (1 byte: 'q' int64 or 'f' float32),
+                    name length (1 byte), name (utf-8)
+        zero padding to a multiple of 8 bytes
+        per column  row count values, zero padded to a multiple of 8 bytes
+
+    The padding keeps every column aligned for JavaScript typed arrays.
+    String columns (station_id) are left out.
+    """
+    names = [name for name in columns if columns[name].dtype in (np.int64, np.float32)]
+    rows = len(columns[names[0]]) if names else 0
+    parts = [b'WXC1', struct.pack('<II', rows, len(names))]
+    for name in names:
+        encoded = name.encode()
+        kind = b'q' if columns[name].dtype == np.int64 else b'f'
+        parts.append(kind + struct.pack('<B', len(encoded)) + encoded)
+
+    header = b''.join(parts)
+    body = [header, b'\0' * (-len(header) % 8)]
+    for name in names:
+        block = columns[name].astype(columns[name].dtype.newbyteorder('<')).tobytes()
+        body += [block, b'\0' * (-len(block) % 8)]
+    return b''.join(body)
+
+
+def arrow_columns(columns):
+    """
+    Encode columns as an Arrow IPC stream, with timestamp as a UTC
+    millisecond timestamp type
+    """
+    arrays = {name: pa.array(values) for name, values in columns.items()}
+    arrays['timestamp'] = pa.array(columns['timestamp'], type=pa.timestamp('ms', tz='UTC'))
+    table = pa.table(arrays)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
 
-    
 
-def get_db_connection():
+def columnar_response(rows, fmt, meta):
     """
-    Create and return a database connection with row factory for dict access
+    Build a column-oriented response for rows in the negotiated format.
+    meta (cursor, last id, ...) goes in the body for columnar JSON and
+    in X- headers for the binary formats.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    if fmt == 'columnar':
+        # Keep full precision in JSON; only the binary formats pack float32
+        values = list(zip(*rows)) or [()] * len(READING_COLUMNS)
+        body = {name: list(column) for name, column in zip(READING_COLUMNS, values)}
+        body['timestamp'] = [format_timestamp(t) for t in body['timestamp']]
+        body.update(meta)
+        response = jsonify(body)
+        response.mimetype = READ_FORMATS['columnar']
+        return response
+
+    columns = rows_to_columns(rows)
+    payload = pack_columns(columns) if fmt == 'binary' else arrow_columns(columns)
+    headers = {
+        'X-' + '-'.join(part.capitalize() for part in key.split('_')):
+            value if isinstance(value, str) else json.dumps(value)
+        for key, value in meta.items() if value is not None
+    }
+    return Response(payload, mimetype=READ_FORMATS[fmt], headers=headers)
+
+
+# export functions
+
+def iter_export_chunks(since=None, until=None, station_id=None):
+    """
+    Yield lists of weather_readings rows for [since, until), oldest
+    first, EXPORT_CHUNK_ROWS at a time
+    """
+    with db_connection() as conn:
+        cursor = query_readings(conn, since, until, station_id=station_id)
+        try:
+            while True:
+                rows = list(itertools.islice(cursor, EXPORT_CHUNK_ROWS))
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+def export_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(READING_COLUMNS)
+    for rows in chunks:
+        for row in rows:
+            writer.writerow((row[0], format_timestamp(row[1])) + tuple(row[2:]))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def export_ndjson(chunks):
+    for rows in chunks:
+        yield ''.join(json.dumps(row_to_reading(row)) + '\n' for row in rows).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands written bytes back to a generator
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def export_parquet(chunks):
+    # One row group per chunk; the footer is written on close
+    sink = _ChunkSink()
+    schema = pa.schema(
+        [('id', pa.int64()), ('timestamp', pa.timestamp('ms', tz='UTC'))] +
+        [(metric, pa.int64() if metric == 'air_quality' else pa.float64()) for metric in METRICS] +
+        [('station_id', pa.string())]
+    )
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# recent readings ring functions
+
+class ReadingRing:
+    """
+    Fixed-size ring of the most recent readings, stored column-wise in
+    NumPy arrays in insertion (id) order
+    """
+
+    def __init__(self, size, floor_id=0, floor_timestamp=None):
+        self.size = size
+        # Every row with id > floor_id is in the ring, and none of the
+        # rows outside it is newer than floor_timestamp (None if there
+        # are no such rows)
+        self.floor_id = floor_id
+        self.floor_timestamp = floor_timestamp
+        self.ids = np.zeros(size, dtype=np.int64)
+        self.timestamps = np.zeros(size, dtype=np.int64)
+        self.values = np.zeros((size, len(METRICS)), dtype=np.float64)
+        self.stations = np.empty(size, dtype=object)
+        self.head = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, rows):
+        """
+        Append rows shaped like weather_readings rows, oldest first
+        """
+        if not rows:
+            return
+        data = np.array([row[:-1] for row in rows], dtype=np.float64)
+        stations = np.array([row[-1] for row in rows], dtype=object)
+        with self.lock:
+            # Raise the floors past the rows about to be dropped
+            dropped = self.count + len(data) - self.size
+            if dropped > 0:
+                slots = self._ordered_slots()
+                ids = np.concatenate((self.ids[slots], data[:, 0].astype(np.int64)))
+                timestamps = np.concatenate((self.timestamps[slots], data[:, 1].astype(np.int64)))
+                self.floor_id = max(self.floor_id, int(ids[dropped - 1]))
+                newest = int(timestamps[:dropped].max())
+                if self.floor_timestamp is None or newest > self.floor_timestamp:
+                    self.floor_timestamp = newest
+            data, stations = data[-self.size:], stations[-self.size:]
+            slots = (self.head + np.arange(len(data))) % self.size
+            self.ids[slots] = data[:, 0]
+            self.timestamps[slots] = data[:, 1]
+            self.values[slots] = data[:, 2:]
+            self.stations[slots] = stations
+            self.head = (self.head + len(data)) % self.size
+            self.count = min(self.count + len(data), self.size)
+
+    def last_id(self):
+        """
+        Return the newest id appended, or the floor if the ring is empty
+        """
+        with self.lock:
+            if not self.count:
+                return self.floor_id
+            return int(self.ids[(self.head - 1) % self.size])
+
+    def _ordered_slots(self):
+        return (self.head - self.count + np.arange(self.count)) % self.size
+
+    def _rows(self, slots):
+        rows = []
+        air_quality = 2 + METRICS.index('air_quality')
+        for reading_id, timestamp, values, station_id in zip(
+                self.ids[slots].tolist(), self.timestamps[slots].tolist(),
+                self.values[slots].tolist(), self.stations[slots].tolist()):
+            row = [reading_id, timestamp] + values + [station_id]
+            row[air_quality] = int(row[air_quality])
+            rows.append(tuple(row))
+        return rows
+
+    def _newer_than_floor(self, slots):
+        # Rows outside the ring all have lower ids, so they only win a
+        # timestamp tie against none of these
+        return self.floor_timestamp is None or self.timestamps[slots].min() >= self.floor_timestamp
+
+    def latest(self):
+        """
+        Return the newest row by (timestamp, id), or None if empty or
+        if a row outside the ring (e.g. after a backfill of older
+        readings) may be newer
+        """
+        with self.lock:
+            if not self.count:
+                return None
+            slots = self._ordered_slots()
+            newest = slots[[np.lexsort((self.ids[slots], self.timestamps[slots]))[-1]]]
+            if not self._newer_than_floor(newest):
+                return None
+            return self._rows(newest)[0]
+
+    def recent(self, limit):
+        """
+        Return the `limit` newest rows by timestamp, oldest first, or
+        None if the ring may not hold all of them
+        """
+        with self.lock:
+            if limit > self.count and self.floor_id:
+                return None
+            slots = self._ordered_slots()
+            order = np.lexsort((self.ids[slots], self.timestamps[slots]))
+            slots = slots[order[-limit:]]
+            if len(slots) and not self._newer_than_floor(slots):
+                return None
+            return self._rows(slots)
+
+    def after(self, after_id, limit):
+        """
+        Return up to `limit` rows with id > after_id, oldest first, or
+        None if some of them have already left the ring
+        """
+        with self.lock:
+            if after_id < self.floor_id:
+                return None
+            slots = self._ordered_slots()
+            slots = slots[self.ids[slots] > after_id]
+            return self._rows(slots[:limit])
+
+
+def _load_ring(conn, station_id):
+    station, params = ("WHERE station_id = ? ", (station_id,)) if station_id is not None else ("", ())
+    rows = conn.execute(
+        f"SELECT * FROM (SELECT {', '.join(READING_COLUMNS)} FROM weather_readings {station}"
+        f"ORDER BY id DESC LIMIT ?) ORDER BY id",
+        params + (RING_SIZE,)
+    ).fetchall()
+    # A full load may have left older rows behind in SQLite, and archived
+    # partitions may hold any id up to their max_id, from any time up to
+    # the end of their month
+    floor_id, archived_end = conn.execute("SELECT MAX(max_id), MAX(end) FROM partitions").fetchone()
+    floor_id = floor_id or 0
+    floor_timestamp = archived_end - 1 if archived_end is not None else None
+    if len(rows) == RING_SIZE:
+        floor_id = max(floor_id, rows[0][0] - 1)
+        # Walks the timestamp index down past the ring's backfilled rows
+        clauses = ("station_id = ? AND " if station_id is not None else "") + "id < ?"
+        left = conn.execute(
+            f"SELECT timestamp FROM weather_readings WHERE {clauses} ORDER BY timestamp DESC LIMIT 1",
+            params + (rows[0][0],)
+        ).fetchone()
+        if left is not None and (floor_timestamp is None or left[0] > floor_timestamp):
+            floor_timestamp = left[0]
+    ring = ReadingRing(RING_SIZE, floor_id, floor_timestamp)
+    ring.append([tuple(row) for row in rows])
+    return ring
+
+
+def load_recent_readings(conn):
+    """
+    (Re)fill the recent-readings rings, one for every station plus one
+    across all of them, from the newest rows in SQLite
+    """
+    station_ids = [row[0] for row in conn.execute("SELECT station_id FROM stations")]
+    rings = {station_id: _load_ring(conn, station_id) for station_id in [None] + station_ids}
+    with _rings_lock:
+        _rings.clear()
+        _rings.update(rings)
+
+
+def append_recent_readings(readings):
+    """
+    Add newly stored readings (dicts with raw timestamps) to the rings
+    """
+    by_station = {None: []}
+    for reading in readings:
+        row = tuple(reading[column] for column in READING_COLUMNS)
+        by_station[None].append(row)
+        by_station.setdefault(reading['station_id'], []).append(row)
+    for station_id, rows in by_station.items():
+        ring = _rings.get(station_id)
+        if ring is not None:
+            ring.append(rows)
+
+
+def read_readings_after(after_id=None, after_timestamp=None, limit=DEFAULT_PAGE_LIMIT, station_id=None):
+    """
+    Same rows as query_readings_after(), served from the ring when it
+    holds them and from SQLite otherwise
+    """
+    ring = _rings.get(station_id)
+    if ring is not None and after_timestamp is None:
+        rows = ring.recent(limit) if after_id is None else ring.after(after_id, limit)
+        if rows is not None:
+            return rows
+    with db_connection() as conn:
+        return query_readings_after(conn, after_id, after_timestamp, limit, station_id)
+
+
+# live stream functions
+
+def subscribe_readings():
+    """
+    Register a new live stream client and return its queue
+    """
+    q = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    with _stream_lock:
+        _stream_subscribers.add(q)
+    return q
+
+
+def unsubscribe_readings(q):
+    """
+    Remove a live stream client registered with subscribe_readings
+    """
+    with _stream_lock:
+        _stream_subscribers.discard(q)
+
+
+def publish_reading(reading):
+    """
+    Push a newly inserted reading to every connected stream client.
+    Clients that have fallen too far behind miss the reading rather
+    than blocking the insert path; they catch up on reconnect.
+    """
+    with _stream_lock:
+        subscribers = list(_stream_subscribers)
+    for q in subscribers:
+        try:
+            q.put_nowait(reading)
+        except queue.Full:
+            pass
+
+
+def format_event(reading):
+    """
+    Format a reading as a Server-Sent Events message
+    """
+    return f"id: {reading['id']}\nevent: reading\ndata: {json.dumps(reading)}\n\n"
+
+
+# page caching functions
+
+def build_cached_asset(body, mimetype):
+    """
+    Precompute everything needed to serve a static body: a strong ETag
+    plus gzip (and brotli, if installed) encodings
+    """
+    asset = {
+        'mimetype': mimetype,
+        'etag': hashlib.sha256(body).hexdigest()[:32],
+        'identity': body,
+        'gzip': gzip.compress(body, 9, mtime=0)
+    }
+    if brotli is not None:
+        asset['br'] = brotli.compress(body)
+    return asset
+
+
+def cached_response(asset, cache_control):
+    """
+    Serve a cached asset in the best encoding the client accepts,
+    answering If-None-Match with 304. Each encoding gets its own ETag.
+    """
+    encoding = None
+    for candidate in ('br', 'gzip'):
+        if candidate in asset and candidate in request.accept_encodings:
+            encoding = candidate
+            break
+
+    etag = asset['etag'] + ('-' + encoding if encoding else '')
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(asset[encoding or 'identity'], mimetype=asset['mimetype'])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def load_static_asset(filename):
+    """
+    Return the cached asset for a file under static/, reading and
+    compressing it on first use. Returns None for missing files.
+    """
+    asset = _asset_cache.get(filename)
+    if asset is None:
+        path = safe_join(os.path.join(app.root_path, 'static'), filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            body = f.read()
+        mimetype = {'.css': 'text/css', '.js': 'text/javascript'}.get(
+            os.path.splitext(filename)[1], 'application/octet-stream'
+        )
+        asset = _asset_cache[filename] = build_cached_asset(body, mimetype)
+    return asset
+
+
+@app.template_global()
+def asset_url(filename):
+    """
+    URL of a static asset, versioned by its content hash so it can be
+    cached forever
+    """
+    return f"/static/{filename}?v={load_static_asset(filename)['etag'][:12]}"
+
+
+def serve_page(template):
+    """
+    Serve a dashboard page. Templates are rendered once and kept, so
+    later requests only pay for the ETag check.
+    """
+    page = _page_cache.get(template)
+    if page is None:
+        html = render_template(template, database_path=DATABASE_PATH)
+        page = _page_cache[template] = build_cached_asset(html.encode(), 'text/html')
+    return cached_response(page, PAGE_CACHE_CONTROL)
+
+
+# conditional request functions
+
+def bump_data_version():
+    """
+    Record that stored data changed, invalidating data endpoint ETags
+    """
+    with _data_version_lock:
+        shared = _data_version['shared']
+        if shared is None:
+            _data_version['version'] += 1
+        else:
+            with shared.get_lock():
+                shared.value += 1
+                version = shared.value
+            # A following process adopts it once it has applied the change
+            if _follower['thread'] is None:
+                _data_version['version'] = version
+    clear_response_cache()
+
+
+def adopt_data_version(version):
+    """
+    Move to a shared data version bumped by another process, once this
+    process has applied the changes it covers
+    """
+    with _data_version_lock:
+        if version <= _data_version['version']:
+            return
+        _data_version['version'] = version
+    clear_response_cache()
+
+
+def share_data_version(boot, counter):
+    """
+    Share the data version between processes: `boot` replaces this
+    process's boot token and `counter`, a multiprocessing.Value('q'),
+    holds the version
+    """
+    with _data_version_lock:
+        _data_version['boot'] = boot
+        _data_version['shared'] = counter
+        _data_version['version'] = counter.value
+
+
+def data_etag():
+    """
+    ETag for the current data version and the request's Accept header
+    (which selects the response format on some endpoints)
+    """
+    accept = zlib.crc32(request.headers.get('Accept', '').encode())
+    return f"{_data_version['boot']}.{_data_version['version']}.{accept:08x}"
+
+
+def etag_on_data_version(view):
+    """
+    Decorate a GET data endpoint so that If-None-Match matching the
+    current data version is answered with 304 before the view runs
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+
+        # Taken before the view runs, so a concurrent write can only
+        # make the ETag older than the body, never newer
+        etag = data_etag()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+        return response
+    return wrapper
+
+
+# response cache functions
+
+def clear_response_cache():
+    """
+    Drop every cached response; called whenever stored data changes
+    """
+    with _response_cache_lock:
+        _response_cache.clear()
+
+
+def response_cache_stats():
+    """
+    Return the response cache counters and current size
+    """
+    with _response_cache_lock:
+        return dict(_response_cache_stats, size=len(_response_cache))
+
+
+def cache_response(view):
+    """
+    Decorate a GET endpoint so identical requests share one computed
+    response until the data changes or RESPONSE_CACHE_TTL passes.
+    Concurrent misses for the same key wait for the first one to
+    finish instead of recomputing (single-flight).
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.full_path, request.headers.get('Accept', ''), _data_version['version'])
+        while True:
+            with _response_cache_lock:
+                entry = _response_cache.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    _response_cache.move_to_end(key)
+                    _response_cache_stats['hits'] += 1
+                    return Response(entry[1], status=entry[2], headers=entry[3])
+                _response_cache.pop(key, None)
+
+                pending = _response_cache_pending.get(key)
+                if pending is None:
+                    pending = _response_cache_pending[key] = threading.Event()
+                    _response_cache_stats['misses'] += 1
+                    break
+                _response_cache_stats['coalesced'] += 1
+            # Another request is computing this key; use its result
+            pending.wait()
+
+        try:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                entry = (time.monotonic() + RESPONSE_CACHE_TTL, response.get_data(),
+                         response.status_code, list(response.headers.items()))
+                with _response_cache_lock:
+                    _response_cache[key] = entry
+                    while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                        _response_cache.popitem(last=False)
+                        _response_cache_stats['evictions'] += 1
+        finally:
+            with _response_cache_lock:
+                del _response_cache_pending[key]
+            pending.set()
+        return response
+    return wrapper
+
+
+# writer follower functions
+
+def follow_writer(conn):
+    """
+    Apply commits made by other processes: fold new readings into the
+    aggregates, rings and live streams, and adopt the shared data
+    version. Returns the number of new readings.
+    """
+    # Read before the rows, so the version adopted never claims more
+    # than has been applied
+    shared = _data_version['shared']
+    version = shared.value if shared is not None else None
+
+    rows = conn.execute(
+        f"SELECT {', '.join(READING_COLUMNS)} FROM weather_readings WHERE id > ? ORDER BY id",
+        (_follower['last_id'],)
+    ).fetchall()
+    readings = [dict(zip(READING_COLUMNS, row)) for row in rows]
+    if readings:
+        _follower['last_id'] = readings[-1]['id']
+        notify_inserted(conn, readings, version)
+    elif version is not None:
+        # Archived months, registered stations, rollups
+        adopt_data_version(version)
+    return len(readings)
+
+
+def _follow_worker(conn):
+    seen = None
+    while True:
+        try:
+            # Changes whenever another connection commits to the database
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != seen:
+                seen = data_version
+                follow_writer(conn)
+        except Exception as e:
+            app.logger.error(f"Following the writer failed: {e}")
+        time.sleep(FOLLOW_INTERVAL)
+
+
+def start_follower():
+    """
+    Start the thread that keeps this process's in-memory state current
+    with commits made by the writer process, for processes that serve
+    reads but do not ingest. Call after init_database().
+    """
+    ring = _rings.get(None)
+    _follower['last_id'] = ring.last_id() if ring is not None else _aggregates['last_id']
+    thread = threading.Thread(target=_follow_worker, args=(get_db_connection(),),
+                              name='writer-follower', daemon=True)
+    _follower['thread'] = thread
+    thread.start()
+    return thread
 
 
 # API ENDPOINTS
@@ -59,1262 +3487,511 @@ def get_db_connection():
 @app.route('/')
 def home():
     """Home page"""
-    return f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Weather Monitoring Dashboard</title>
-        <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js"></script>
-        <style>
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
-                background: linear-gradient(-45deg, #667eea, #764ba2, #f093fb, #4facfe);
-                background-size: 400% 400%;
-                animation: gradientShift 15s ease infinite;
-                min-height: 100vh;
-                padding: 20px;
-                position: relative;
-                overflow-x: hidden;
-            }}
-
-            @keyframes gradientShift {{
-                0% {{ background-position: 0% 50%; }}
-                50% {{ background-position: 100% 50%; }}
-                100% {{ background-position: 0% 50%; }}
-            }}
-
-            body::before {{
-                content: '';
-                position: fixed;
-                top: 0;
-                left: 0;
-                width: 100%;
-                height: 100%;
-                background-image: 
-                    radial-gradient(circle at 20% 50%, rgba(255, 255, 255, 0.15) 0%, transparent 50%),
-                    radial-gradient(circle at 80% 80%, rgba(255, 255, 255, 0.15) 0%, transparent 50%),
-                    radial-gradient(circle at 40% 20%, rgba(255, 255, 255, 0.1) 0%, transparent 50%);
-                pointer-events: none;
-                z-index: 0;
-            }}
-
-            .container {{
-                max-width: 1400px;
-                margin: 0 auto;
-                position: relative;
-                z-index: 1;
-            }}
-
-            header {{
-                text-align: center;
-                color: white;
-                margin-bottom: 30px;
-                text-shadow: 0 2px 4px rgba(0, 0, 0, 0.2);
-            }}
-
-            h1 {{
-                font-size: 2.5em;
-                margin-bottom: 10px;
-                animation: fadeInDown 0.8s ease-out;
-            }}
-
-            @keyframes fadeInDown {{
-                from {{
-                    opacity: 0;
-                    transform: translateY(-20px);
-                }}
-                to {{
-                    opacity: 1;
-                    transform: translateY(0);
-                }}
-            }}
-
-            nav {{
-                background: rgba(255, 255, 255, 0.15);
-                backdrop-filter: blur(10px);
-                padding: 15px;
-                border-radius: 15px;
-                margin-bottom: 30px;
-                display: flex;
-                justify-content: center;
-                gap: 20px;
-                box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-            }}
-
-            nav a {{
-                color: white;
-                text-decoration: none;
-                padding: 12px 24px;
-                border-radius: 10px;
-                background: rgba(255, 255, 255, 0.2);
-                transition: all 0.3s;
-                font-weight: 500;
-                border: 1px solid rgba(255, 255, 255, 0.3);
-            }}
-
-            nav a:hover {{
-                background: rgba(255, 255, 255, 0.35);
-                transform: translateY(-2px);
-                box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15);
-            }}
-
-            .stats-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-                gap: 20px;
-                margin-bottom: 30px;
-            }}
-
-            .stat-card {{
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(10px);
-                padding: 25px;
-                border-radius: 20px;
-                box-shadow: 0 10px 30px rgba(0, 0, 0, 0.2);
-                text-align: center;
-                transition: transform 0.3s, box-shadow 0.3s;
-                border: 1px solid rgba(255, 255, 255, 0.5);
-                animation: fadeInUp 0.6s ease-out;
-            }}
-
-            .stat-card:hover {{
-                transform: translateY(-5px);
-                box-shadow: 0 15px 40px rgba(0, 0, 0, 0.3);
-            }}
-
-            @keyframes fadeInUp {{
-                from {{
-                    opacity: 0;
-                    transform: translateY(20px);
-                }}
-                to {{
-                    opacity: 1;
-                    transform: translateY(0);
-                }}
-            }}
-
-            .stat-title {{
-                color: #666;
-                font-size: 0.9em;
-                margin-bottom: 10px;
-                font-weight: 600;
-            }}
-
-            .stat-value {{
-                font-size: 2.5em;
-                font-weight: bold;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                -webkit-background-clip: text;
-                -webkit-text-fill-color: transparent;
-                background-clip: text;
-            }}
-
-            .stat-unit {{
-                font-size: 0.5em;
-                color: #999;
-            }}
-
-            .latest-reading {{
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(10px);
-                padding: 30px;
-                border-radius: 20px;
-                box-shadow: 0 10px 30px rgba(0, 0, 0, 0.2);
-                margin-bottom: 30px;
-                border: 1px solid rgba(255, 255, 255, 0.5);
-            }}
-
-            .latest-reading h2 {{
-                color: #333;
-                margin-bottom: 20px;
-            }}
-
-            .reading-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 15px;
-            }}
-
-            .reading-item {{
-                padding: 15px;
-                background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-                border-radius: 12px;
-                border-left: 4px solid #667eea;
-                transition: transform 0.2s;
-            }}
-
-            .reading-item:hover {{
-                transform: scale(1.05);
-            }}
-
-            .reading-label {{
-                font-size: 0.9em;
-                color: #666;
-                margin-bottom: 5px;
-                font-weight: 500;
-            }}
-
-            .reading-value {{
-                font-size: 1.5em;
-                font-weight: bold;
-                color: #333;
-            }}
-
-            .actions {{
-                display: flex;
-                gap: 15px;
-                justify-content: center;
-                margin-bottom: 30px;
-                flex-wrap: wrap;
-            }}
-
-            button {{
-                padding: 15px 30px;
-                font-size: 1em;
-                border: none;
-                border-radius: 12px;
-                background: rgba(255, 255, 255, 0.95);
-                color: #667eea;
-                font-weight: bold;
-                cursor: pointer;
-                transition: all 0.3s;
-                box-shadow: 0 5px 15px rgba(0, 0, 0, 0.1);
-                border: 2px solid rgba(102, 126, 234, 0.3);
-            }}
-
-            button:hover {{
-                transform: translateY(-3px);
-                box-shadow: 0 8px 25px rgba(0, 0, 0, 0.2);
-                background: white;
-                border-color: #667eea;
-            }}
-
-            button:active {{
-                transform: translateY(-1px);
-            }}
-
-            .db-info {{
-                background: rgba(255, 255, 255, 0.15);
-                backdrop-filter: blur(10px);
-                color: white;
-                padding: 20px;
-                border-radius: 15px;
-                text-align: center;
-                margin-top: 30px;
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-            }}
-
-            .timestamp {{
-                color: #666;
-                font-size: 0.9em;
-                margin-top: 10px;
-            }}
-
-            @media (max-width: 768px) {{
-                h1 {{
-                    font-size: 2em;
-                }}
-
-                nav {{
-                    flex-direction: column;
-                    gap: 10px;
-                }}
-
-                .actions {{
-                    flex-direction: column;
-                }}
-
-                button {{
-                    width: 100%;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <header>
-                <h1>🌤️ Weather Monitoring Dashboard</h1>
-                <p>Real-time Weather Data Logging & Analysis</p>
-            </header>
-
-            <nav>
-                <a href="/">🏠 Home</a>
-                <a href="/logs">📊 Data Logs</a>
-                <a href="/graphs">📈 Graphs</a>
-            </nav>
-
-            <div id="stats-section" class="stats-grid">
-                <!-- Stats will be loaded here -->
-            </div>
-
-            <div class="latest-reading">
-                <h2>📡 Latest Reading</h2>
-                <div id="latest-reading" class="reading-grid">
-                    <!-- Latest reading will be loaded here -->
-                </div>
-                <div class="timestamp" id="last-update">Loading...</div>
-            </div>
-
-            <div class="actions">
-                <button onclick="refreshData()">🔄 Refresh Now</button>
-                <button onclick="exportCSV()">💾 Export CSV</button>
-                <button onclick="location.href='/graphs'">📈 View Charts</button>
-            </div>
-
-            <div class="db-info">
-                <strong>📁 Database:</strong> ./{DATABASE_PATH}<br>
-                <strong>📝 Total Records:</strong> <span id="record-count">0</span>
-            </div>
-        </div>
-
-        <script>
-            // Fetch and display statistics
-            async function loadStats() {{
-                try {{
-                    const response = await fetch('/api/stats');
-                    const stats = await response.json();
-
-                    const statsHTML = `
-                        <div class="stat-card" style="animation-delay: 0.1s">
-                            <div class="stat-title">Average Temperature</div>
-                            <div class="stat-value">
-                                ${{stats.avg_temperature.toFixed(1)}}
-                                <span class="stat-unit">°C</span>
-                            </div>
-                        </div>
-                        <div class="stat-card" style="animation-delay: 0.2s">
-                            <div class="stat-title">Average Humidity</div>
-                            <div class="stat-value">
-                                ${{stats.avg_humidity.toFixed(1)}}
-                                <span class="stat-unit">%</span>
-                            </div>
-                        </div>
-                        <div class="stat-card" style="animation-delay: 0.3s">
-                            <div class="stat-title">Max Wind Speed</div>
-                            <div class="stat-value">
-                                ${{stats.max_wind_speed.toFixed(1)}}
-                                <span class="stat-unit">km/h</span>
-                            </div>
-                        </div>
-                        <div class="stat-card" style="animation-delay: 0.4s">
-                            <div class="stat-title">Total Rainfall</div>
-                            <div class="stat-value">
-                                ${{stats.total_rainfall.toFixed(1)}}
-                                <span class="stat-unit">mm</span>
-                            </div>
-                        </div>
-                    `;
-
-                    document.getElementById('stats-section').innerHTML = statsHTML;
-                }} catch (error) {{
-                    console.error('Error loading stats:', error);
-                }}
-            }}
-
-            // Fetch and display latest reading
-            async function loadLatest() {{
-                try {{
-                    const response = await fetch('/api/latest');
-                    const data = await response.json();
-
-                    const readingHTML = `
-                        <div class="reading-item">
-                            <div class="reading-label">🌡️ Temperature</div>
-                            <div class="reading-value">${{data.temperature}}°C</div>
-                        </div>
-                        <div class="reading-item">
-                            <div class="reading-label">💧 Humidity</div>
-                            <div class="reading-value">${{data.humidity}}%</div>
-                        </div>
-                        <div class="reading-item">
-                            <div class="reading-label">🎈 Pressure</div>
-                            <div class="reading-value">${{data.pressure}} hPa</div>
-                        </div>
-                        <div class="reading-item">
-                            <div class="reading-label">💨 Air Quality</div>
-                            <div class="reading-value">${{data.air_quality}} AQI</div>
-                        </div>
-                        <div class="reading-item">
-                            <div class="reading-label">🌪️ Wind Speed</div>
-                            <div class="reading-value">${{data.wind_speed}} km/h</div>
-                        </div>
-                        <div class="reading-item">
-                            <div class="reading-label">🧭 Wind Direction</div>
-                            <div class="reading-value">${{data.wind_direction}}°</div>
-                        </div>
-                        <div class="reading-item">
-                            <div class="reading-label">🌧️ Rainfall</div>
-                            <div class="reading-value">${{data.rainfall}} mm</div>
-                        </div>
-                    `;
-
-                    document.getElementById('latest-reading').innerHTML = readingHTML;
-                    document.getElementById('last-update').textContent = 
-                        `Last updated: ${{new Date(data.timestamp).toLocaleString()}}`;
-                }} catch (error) {{
-                    console.error('Error loading latest data:', error);
-                }}
-            }}
-
-            // Get total record count
-            async function loadRecordCount() {{
-                try {{
-                    const response = await fetch('/api/data');
-                    const data = await response.json();
-                    document.getElementById('record-count').textContent = data.length;
-                }} catch (error) {{
-                    console.error('Error loading record count:', error);
-                }}
-            }}
-
-            // Refresh all data
-            function refreshData() {{
-                loadStats();
-                loadLatest();
-                loadRecordCount();
-            }}
-
-            // Export CSV
-            function exportCSV() {{
-                window.location.href = '/api/export';
-            }}
-
-            // Auto-refresh every 5 seconds
-            setInterval(refreshData, 5000);
-
-            // Initial load
-            refreshData();
-        </script>
-    </body>
-    </html>
-    """
+    return serve_page('home.html')
 
 @app.route('/logs')
 def logs():
     """Data logs page"""
-    return f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Weather Data Logs</title>
-        <style>
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
-                background: linear-gradient(-45deg, #667eea, #764ba2, #f093fb, #4facfe);
-                background-size: 400% 400%;
-                animation: gradientShift 15s ease infinite;
-                min-height: 100vh;
-                padding: 20px;
-                position: relative;
-                overflow-x: hidden;
-            }}
-
-            @keyframes gradientShift {{
-                0% {{ background-position: 0% 50%; }}
-                50% {{ background-position: 100% 50%; }}
-                100% {{ background-position: 0% 50%; }}
-            }}
-
-            body::before {{
-                content: '';
-                position: fixed;
-                top: 0;
-                left: 0;
-                width: 100%;
-                height: 100%;
-                background-image: 
-                    radial-gradient(circle at 20% 50%, rgba(255, 255, 255, 0.15) 0%, transparent 50%),
-                    radial-gradient(circle at 80% 80%, rgba(255, 255, 255, 0.15) 0%, transparent 50%),
-                    radial-gradient(circle at 40% 20%, rgba(255, 255, 255, 0.1) 0%, transparent 50%);
-                pointer-events: none;
-                z-index: 0;
-            }}
-
-            .container {{
-                max-width: 1600px;
-                margin: 0 auto;
-                position: relative;
-                z-index: 1;
-            }}
-
-            header {{
-                text-align: center;
-                color: white;
-                margin-bottom: 30px;
-                text-shadow: 0 2px 4px rgba(0, 0, 0, 0.2);
-            }}
-
-            h1 {{
-                font-size: 2.5em;
-                margin-bottom: 10px;
-            }}
-
-            nav {{
-                background: rgba(255, 255, 255, 0.15);
-                backdrop-filter: blur(10px);
-                padding: 15px;
-                border-radius: 15px;
-                margin-bottom: 30px;
-                display: flex;
-                justify-content: center;
-                gap: 20px;
-                box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-            }}
-
-            nav a {{
-                color: white;
-                text-decoration: none;
-                padding: 12px 24px;
-                border-radius: 10px;
-                background: rgba(255, 255, 255, 0.2);
-                transition: all 0.3s;
-                font-weight: 500;
-                border: 1px solid rgba(255, 255, 255, 0.3);
-            }}
-
-            nav a:hover {{
-                background: rgba(255, 255, 255, 0.35);
-                transform: translateY(-2px);
-            }}
-
-            .table-container {{
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(10px);
-                padding: 30px;
-                border-radius: 20px;
-                box-shadow: 0 10px 30px rgba(0, 0, 0, 0.2);
-                overflow-x: auto;
-                border: 1px solid rgba(255, 255, 255, 0.5);
-            }}
-
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-            }}
-
-            th {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 15px;
-                text-align: left;
-                font-weight: bold;
-                position: sticky;
-                top: 0;
-            }}
-
-            td {{
-                padding: 12px 15px;
-                border-bottom: 1px solid #eee;
-            }}
-
-            tr:hover {{
-                background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 30%);
-            }}
-
-            .actions {{
-                text-align: center;
-                margin-bottom: 20px;
-            }}
-
-            button {{
-                padding: 12px 25px;
-                font-size: 1em;
-                border: none;
-                border-radius: 12px;
-                background: rgba(255, 255, 255, 0.95);
-                color: #667eea;
-                font-weight: bold;
-                cursor: pointer;
-                transition: all 0.3s;
-                box-shadow: 0 5px 15px rgba(0, 0, 0, 0.1);
-                border: 2px solid rgba(102, 126, 234, 0.3);
-            }}
-
-            button:hover {{
-                transform: translateY(-3px);
-                box-shadow: 0 8px 25px rgba(0, 0, 0, 0.2);
-                background: white;
-            }}
-
-            .db-info {{
-                background: rgba(255, 255, 255, 0.15);
-                backdrop-filter: blur(10px);
-                color: white;
-                padding: 20px;
-                border-radius: 15px;
-                text-align: center;
-                margin-top: 30px;
-                border: 1px solid rgba(255, 255, 255, 0.2);
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <header>
-                <h1>📊 Weather Data Logs</h1>
-                <p>Complete historical weather readings</p>
-            </header>
-
-            <nav>
-                <a href="/">🏠 Home</a>
-                <a href="/logs">📊 Data Logs</a>
-                <a href="/graphs">📈 Graphs</a>
-            </nav>
-
-            <div class="actions">
-                <button onclick="refreshTable()">🔄 Refresh</button>
-            </div>
-
-            <div class="table-container">
-                <table id="data-table">
-                    <thead>
-                        <tr>
-                            <th>ID</th>
-                            <th>Timestamp</th>
-                            <th>Temperature (°C)</th>
-                            <th>Humidity (%)</th>
-                            <th>Pressure (hPa)</th>
-                            <th>Air Quality (AQI)</th>
-                            <th>Wind Speed (km/h)</th>
-                            <th>Wind Direction (°)</th>
-                            <th>Rainfall (mm)</th>
-                        </tr>
-                    </thead>
-                    <tbody id="table-body">
-                        <!-- Data will be loaded here -->
-                    </tbody>
-                </table>
-            </div>
-
-            <div class="db-info">
-                <strong>📁 Database:</strong> ./{DATABASE_PATH}<br>
-                <strong>📝 Total Records:</strong> <span id="record-count">0</span>
-            </div>
-        </div>
-
-        <script>
-            async function loadTableData() {{
-                try {{
-                    const response = await fetch('/api/data');
-                    const data = await response.json();
-
-                    const tbody = document.getElementById('table-body');
-                    tbody.innerHTML = '';
-
-                    // Reverse to show newest first
-                    data.reverse().forEach(row => {{
-                        const tr = document.createElement('tr');
-                        tr.innerHTML = `
-                            <td>${{row.id}}</td>
-                            <td>${{new Date(row.timestamp).toLocaleString()}}</td>
-                            <td>${{row.temperature}}</td>
-                            <td>${{row.humidity}}</td>
-                            <td>${{row.pressure}}</td>
-                            <td>${{row.air_quality}}</td>
-                            <td>${{row.wind_speed}}</td>
-                            <td>${{row.wind_direction}}</td>
-                            <td>${{row.rainfall}}</td>
-                        `;
-                        tbody.appendChild(tr);
-                    }});
-
-                    document.getElementById('record-count').textContent = data.length;
-                }} catch (error) {{
-                    console.error('Error loading table data:', error);
-                }}
-            }}
-
-            function refreshTable() {{
-                loadTableData();
-            }}
-
-            // Initial load
-            loadTableData();
-
-            // Auto-refresh every 10 seconds
-            setInterval(loadTableData, 10000);
-        </script>
-    </body>
-    </html>
-    """
+    return serve_page('logs.html')
 
 @app.route('/graphs')
 def graphs():
     """Graphs page"""
-    return """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Weather Graphs</title>
-        <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js"></script>
-        <style>
-            * {
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }
+    return serve_page('graphs.html')
 
-            body {
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
-                background: linear-gradient(-45deg, #667eea, #764ba2, #f093fb, #4facfe);
-                background-size: 400% 400%;
-                animation: gradientShift 15s ease infinite;
-                min-height: 100vh;
-                padding: 20px;
-                position: relative;
-                overflow-x: hidden;
-            }
+@app.route('/static/<path:filename>')
+def static_asset(filename):
+    """Versioned CSS/JS assets, precompressed and cached for a year"""
+    asset = load_static_asset(filename)
+    if asset is None:
+        abort(404)
+    return cached_response(asset, STATIC_CACHE_CONTROL)
 
-            @keyframes gradientShift {
-                0% { background-position: 0% 50%; }
-                50% { background-position: 100% 50%; }
-                100% { background-position: 0% 50%; }
-            }
+# Continue with API endpoints (same as before)
+@app.route('/api/data', methods=['GET', 'POST'])
+@app.route('/api/stations/<station_id>/data', methods=['GET', 'POST'])
+@etag_on_data_version
+@require_station
+def api_data(station_id=None):
+    """
+    GET: Return a page of weather readings / POST: Insert new reading
 
-            body::before {
-                content: '';
-                position: fixed;
-                top: 0;
-                left: 0;
-                width: 100%;
-                height: 100%;
-                background-image: 
-                    radial-gradient(circle at 20% 50%, rgba(255, 255, 255, 0.15) 0%, transparent 50%),
-                    radial-gradient(circle at 80% 80%, rgba(255, 255, 255, 0.15) 0%, transparent 50%),
-                    radial-gradient(circle at 40% 20%, rgba(255, 255, 255, 0.1) 0%, transparent 50%);
-                pointer-events: none;
-                z-index: 0;
-            }
+    GET accepts since/until (ISO 8601), limit, order (asc/desc) and the
+    cursor returned as next_cursor by the previous page. format (or the
+    Accept header) selects json, columnar, binary or arrow output.
+    Under /api/stations/<station_id> only that station's readings are
+    returned, and posted readings are stored for that station.
+    """
+    if request.method == 'POST':
+        try:
+            # Stored by the ingestion writer; don't wait on the commit
+            body, status, headers = accept_reading(request.get_json(), station_id)
+            return jsonify(body), status, headers
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
 
-            .container {
-                max-width: 1600px;
-                margin: 0 auto;
-                position: relative;
-                z-index: 1;
-            }
+    else:
+        try:
+            since = request.args.get('since')
+            until = request.args.get('until')
+            since = parse_timestamp(since) if since else None
+            until = parse_timestamp(until) if until else None
+
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor) if cursor else None
+
+            limit = request.args.get('limit', DEFAULT_PAGE_LIMIT, type=int)
+            limit = max(1, min(limit, MAX_PAGE_LIMIT))
+
+            order = request.args.get('order', 'asc').lower()
+            if order not in ('asc', 'desc'):
+                return jsonify({'error': 'order must be asc or desc'}), 400
+
+            fmt = negotiate_format()
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 406
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if fmt != 'json':
+            # Column formats need the whole page; it is bounded by limit
+            with db_connection() as conn:
+                rows = list(query_readings(conn, since, until, after, order, limit + 1, station_id))
+            page, more = rows[:limit], len(rows) > limit
+            next_cursor = encode_cursor(page[-1][1], page[-1][0]) if more else None
+            return columnar_response(page, fmt, {'next_cursor': next_cursor})
+
+        def generate():
+            # Fetch one extra row to know whether another page exists
+            with db_connection() as conn:
+                rows = query_readings(conn, since, until, after, order, limit + 1, station_id)
+                yield '{"data":['
+                last = None
+                for i, row in enumerate(rows):
+                    if i == limit:
+                        break
+                    if i:
+                        yield ','
+                    yield json.dumps(row_to_reading(row))
+                    last = row
+                else:
+                    last = None
+                # Finish the statement before the connection goes back to the pool
+                rows.close()
+                next_cursor = encode_cursor(last[1], last[0]) if last else None
+                yield '],"next_cursor":' + json.dumps(next_cursor) + '}'
+
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
+@app.route('/api/data/batch', methods=['POST'])
+@app.route('/api/stations/<station_id>/data/batch', methods=['POST'])
+@require_station
+def api_data_batch(station_id=None):
+    """
+    Insert many readings at once, sent as a JSON array or as NDJSON
+    (Content-Type application/x-ndjson, one reading per line). The
+    whole batch is validated first and committed by the ingestion
+    writer in one transaction before the response is sent.
+    """
+    try:
+        if request.mimetype == 'application/x-ndjson':
+            readings = parse_batch(request.get_data(as_text=True), ndjson=True)
+        else:
+            readings = request.get_json()
+    except ValueError as e:
+        return jsonify({'error': f'Invalid JSON: {e}'}), 400
 
-            header {
-                text-align: center;
-                color: white;
-                margin-bottom: 30px;
-                text-shadow: 0 2px 4px rgba(0, 0, 0, 0.2);
-            }
+    error = check_batch(readings, station_id)
+    if error:
+        body, status, headers = error
+        return jsonify(body), status, headers
 
-            h1 {
-                font-size: 2.5em;
-                margin-bottom: 10px;
-            }
+    if not readings:
+        return jsonify(batch_stored([])), 200
 
-            nav {
-                background: rgba(255, 255, 255, 0.15);
-                backdrop-filter: blur(10px);
-                padding: 15px;
-                border-radius: 15px;
-                margin-bottom: 30px;
-                display: flex;
-                justify-content: center;
-                gap: 20px;
-                box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-            }
+    try:
+        # Committed by the ingestion writer along with any queued POSTs
+        try:
+            stored = enqueue_readings(readings, wait=True)
+        except queue.Full:
+            body, status, headers = QUEUE_FULL_RESPONSE
+            return jsonify(body), status, headers
 
-            nav a {
-                color: white;
-                text-decoration: none;
-                padding: 12px 24px;
-                border-radius: 10px;
-                background: rgba(255, 255, 255, 0.2);
-                transition: all 0.3s;
-                font-weight: 500;
-                border: 1px solid rgba(255, 255, 255, 0.3);
-            }
+        return jsonify(batch_stored(stored)), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-            nav a:hover {
-                background: rgba(255, 255, 255, 0.35);
-                transform: translateY(-2px);
-            }
+@app.route('/api/data/upload', methods=['POST'])
+@app.route('/api/stations/<station_id>/data/upload', methods=['POST'])
+@require_station
+def api_data_upload(station_id=None):
+    """
+    Sequenced upload from a node that buffers its readings: a JSON
+    object with station_id, session and readings, each with a seq.
+    Responds with `ack`, the highest seq stored without a gap. Readings
+    already stored are skipped and those past a gap are left for the
+    node to resend, so it can retry everything after its ack.
+    """
+    upload = request.get_json()
+    error = check_upload(upload, station_id)
+    if error:
+        body, status, headers = error
+        return jsonify(body), status, headers
 
-            .charts-grid {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(500px, 1fr));
-                gap: 20px;
-                margin-bottom: 30px;
-            }
+    try:
+        seqs = [(upload['session'], seq) for seq in upload['seqs']]
+        try:
+            stored = submit_readings(upload['readings'], seqs).result()
+        except queue.Full:
+            body, status, headers = QUEUE_FULL_RESPONSE
+            return jsonify(body), status, headers
 
-            .chart-card {
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(10px);
-                padding: 25px;
-                border-radius: 20px;
-                box-shadow: 0 10px 30px rgba(0, 0, 0, 0.2);
-                border: 1px solid rgba(255, 255, 255, 0.5);
-                transition: transform 0.3s;
-            }
+        return jsonify(upload_stored(upload, stored)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-            .chart-card:hover {
-                transform: translateY(-5px);
-            }
+@app.route('/api/data/delta', methods=['GET'])
+@app.route('/api/stations/<station_id>/data/delta', methods=['GET'])
+@etag_on_data_version
+@require_station
+def api_data_delta(station_id=None):
+    """
+    Return only the readings a polling client has not seen yet.
 
-            .chart-card h3 {
-                margin-bottom: 15px;
-                color: #333;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                -webkit-background-clip: text;
-                -webkit-text-fill-color: transparent;
-                background-clip: text;
-            }
+    Clients pass the last_id from their previous response as after_id
+    (or a timestamp as after). The response carries the new rows, the
+    last_id to send next time and has_more when the limit was reached.
+    Supports the same output formats as GET /api/data.
+    """
+    try:
+        after_id = request.args.get('after_id', type=int)
+        after = request.args.get('after')
+        after_timestamp = parse_timestamp(after) if after else None
 
-            canvas {
-                max-height: 300px;
-            }
+        limit = request.args.get('limit', DEFAULT_PAGE_LIMIT, type=int)
+        limit = max(1, min(limit, MAX_PAGE_LIMIT))
 
-            .db-info {
-                background: rgba(255, 255, 255, 0.15);
-                backdrop-filter: blur(10px);
-                color: white;
-                padding: 20px;
-                border-radius: 15px;
-                text-align: center;
-                margin-top: 30px;
-                border: 1px solid rgba(255, 255, 255, 0.2);
-            }
+        fmt = negotiate_format()
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 406
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-            @media (max-width: 768px) {
-                .charts-grid {
-                    grid-template-columns: 1fr;
-                }
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <header>
-                <h1>📈 Weather Graphs</h1>
-                <p>Real-time interactive charts (auto-updates every 5 seconds)</p>
-            </header>
-
-            <nav>
-                <a href="/">🏠 Home</a>
-                <a href="/logs">📊 Data Logs</a>
-                <a href="/graphs">📈 Graphs</a>
-            </nav>
-
-            <div class="charts-grid">
-                <div class="chart-card">
-                    <h3>🌡️ Temperature</h3>
-                    <canvas id="tempChart"></canvas>
-                </div>
-
-                <div class="chart-card">
-                    <h3>💧 Humidity</h3>
-                    <canvas id="humidityChart"></canvas>
-                </div>
-
-                <div class="chart-card">
-                    <h3>🎈 Pressure</h3>
-                    <canvas id="pressureChart"></canvas>
-                </div>
-
-                <div class="chart-card">
-                    <h3>💨 Air Quality</h3>
-                    <canvas id="airQualityChart"></canvas>
-                </div>
-
-                <div class="chart-card">
-                    <h3>🌪️ Wind Speed</h3>
-                    <canvas id="windSpeedChart"></canvas>
-                </div>
-
-                <div class="chart-card">
-                    <h3>🌧️ Rainfall</h3>
-                    <canvas id="rainfallChart"></canvas>
-                </div>
-
-                <div class="chart-card">
-                    <h3>🧭 Wind Direction</h3>
-                    <canvas id="windDirectionChart"></canvas>
-                </div>
-            </div>
-
-            <div class="db-info">
-                Auto-updating every 5 seconds | Last 50 readings displayed
-            </div>
-        </div>
-
-        <script>
-            // Chart configurations with smooth animations
-            const tempChart = new Chart(document.getElementById('tempChart'), {
-                type: 'line',
-                data: {
-                    labels: [],
-                    datasets: [{
-                        label: 'Temperature (°C)',
-                        data: [],
-                        borderColor: '#FF6384',
-                        backgroundColor: 'rgba(255, 99, 132, 0.1)',
-                        tension: 0.4,
-                        fill: true
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: true,
-                    plugins: {
-                        legend: {
-                            display: true
-                        }
-                    },
-                    scales: {
-                        y: {
-                            beginAtZero: false
-                        }
-                    }
-                }
-            });
-
-            const humidityChart = new Chart(document.getElementById('humidityChart'), {
-                type: 'line',
-                data: {
-                    labels: [],
-                    datasets: [{
-                        label: 'Humidity (%)',
-                        data: [],
-                        borderColor: '#36A2EB',
-                        backgroundColor: 'rgba(54, 162, 235, 0.1)',
-                        tension: 0.4,
-                        fill: true
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: true,
-                    scales: {
-                        y: {
-                            beginAtZero: true,
-                            max: 100
-                        }
-                    }
-                }
-            });
-
-            const pressureChart = new Chart(document.getElementById('pressureChart'), {
-                type: 'line',
-                data: {
-                    labels: [],
-                    datasets: [{
-                        label: 'Pressure (hPa)',
-                        data: [],
-                        borderColor: '#9966FF',
-                        backgroundColor: 'rgba(153, 102, 255, 0.1)',
-                        tension: 0.4,
-                        fill: true
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: true,
-                    scales: {
-                        y: {
-                            beginAtZero: false
-                        }
-                    }
-                }
-            });
-
-            const airQualityChart = new Chart(document.getElementById('airQualityChart'), {
-                type: 'bar',
-                data: {
-                    labels: [],
-                    datasets: [{
-                        label: 'Air Quality (AQI)',
-                        data: [],
-                        backgroundColor: '#4BC0C0'
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: true,
-                    scales: {
-                        y: {
-                            beginAtZero: true
-                        }
-                    }
-                }
-            });
-
-            const windSpeedChart = new Chart(document.getElementById('windSpeedChart'), {
-                type: 'line',
-                data: {
-                    labels: [],
-                    datasets: [{
-                        label: 'Wind Speed (km/h)',
-                        data: [],
-                        borderColor: '#FF9F40',
-                        backgroundColor: 'rgba(255, 159, 64, 0.1)',
-                        tension: 0.4,
-                        fill: true
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: true,
-                    scales: {
-                        y: {
-                            beginAtZero: true
-                        }
-                    }
-                }
-            });
-
-            const rainfallChart = new Chart(document.getElementById('rainfallChart'), {
-                type: 'bar',
-                data: {
-                    labels: [],
-                    datasets: [{
-                        label: 'Rainfall (mm)',
-                        data: [],
-                        backgroundColor: '#1E88E5'
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: true,
-                    scales: {
-                        y: {
-                            beginAtZero: true
-                        }
-                    }
-                }
-            });
-
-            const windDirectionChart = new Chart(document.getElementById('windDirectionChart'), {
-                type: 'radar',
-                data: {
-                    labels: ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW'],
-                    datasets: [{
-                        label: 'Wind Direction Frequency',
-                        data: [0, 0, 0, 0, 0, 0, 0, 0],
-                        backgroundColor: 'rgba(38, 166, 154, 0.2)',
-                        borderColor: '#26A69A',
-                        pointBackgroundColor: '#26A69A'
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: true,
-                    scales: {
-                        r: {
-                            beginAtZero: true
-                        }
-                    }
-                }
-            });
-
-            // Update all charts
-            async function updateCharts() {
-                try {
-                    const response = await fetch('/api/data');
-                    const data = await response.json();
-
-                    // Get last 50 readings
-                    const recent = data.slice(-50);
-
-                    // Extract data
-                    const labels = recent.map(r => new Date(r.timestamp).toLocaleTimeString());
-                    const temps = recent.map(r => r.temperature);
-                    const humidity = recent.map(r => r.humidity);
-                    const pressure = recent.map(r => r.pressure);
-                    const airQuality = recent.map(r => r.air_quality);
-                    const windSpeed = recent.map(r => r.wind_speed);
-                    const rainfall = recent.map(r => r.rainfall);
-
-                    // Update line/bar charts
-                    tempChart.data.labels = labels;
-                    tempChart.data.datasets[0].data = temps;
-                    tempChart.update('none');
-
-                    humidityChart.data.labels = labels;
-                    humidityChart.data.datasets[0].data = humidity;
-                    humidityChart.update('none');
-
-                    pressureChart.data.labels = labels;
-                    pressureChart.data.datasets[0].data = pressure;
-                    pressureChart.update('none');
-
-                    airQualityChart.data.labels = labels;
-                    airQualityChart.data.datasets[0].data = airQuality;
-                    airQualityChart.update('none');
-
-                    windSpeedChart.data.labels = labels;
-                    windSpeedChart.data.datasets[0].data = windSpeed;
-                    windSpeedChart.update('none');
-
-                    rainfallChart.data.labels = labels;
-                    rainfallChart.data.datasets[0].data = rainfall;
-                    rainfallChart.update('none');
-
-                    // Update wind direction chart (frequency distribution)
-                    const directionBins = [0, 0, 0, 0, 0, 0, 0, 0];
-                    recent.forEach(r => {
-                        const dir = r.wind_direction;
-                        const bin = Math.floor(dir / 45) % 8;
-                        directionBins[bin]++;
-                    });
-
-                    windDirectionChart.data.datasets[0].data = directionBins;
-                    windDirectionChart.update('none');
-
-                } catch (error) {
-                    console.error('Error updating charts:', error);
-                }
-            }
+    try:
+        rows = read_readings_after(after_id, after_timestamp, limit, station_id)
+
+        if fmt != 'json':
+            return columnar_response(rows, fmt, {
+                'last_id': rows[-1][0] if rows else after_id,
+                'has_more': len(rows) == limit
+            })
+
+        data = [row_to_reading(row) for row in rows]
+        last_id = data[-1]['id'] if data else after_id
+        return jsonify({
+            'data': data,
+            'last_id': last_id,
+            'has_more': len(data) == limit
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-            // Initial update
-            updateCharts();
+@app.route('/api/stream', methods=['GET'])
+@app.route('/api/stations/<station_id>/stream', methods=['GET'])
+@require_station
+def api_stream(station_id=None):
+    """
+    Server-Sent Events stream of newly inserted readings, of every
+    station or of one.
 
-            // Auto-update every 5 seconds
-            setInterval(updateCharts, 5000);
-        </script>
-    </body>
-    </html>
+    Reconnecting clients send Last-Event-ID (or last_id in the query
+    string) and first receive the readings they missed.
     """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid last event id'}), 400
 
-# Continue with API endpoints (same as before)
-@app.route('/api/data', methods=['GET', 'POST'])
+    # Subscribe before replaying so nothing inserted in between is lost
+    q = subscribe_readings()
 
-def api_data():
-    """GET: Return all weather readings / POST: Insert new reading"""
-    if request.method == 'POST':
+    def generate():
         try:
-            data = request.get_json()
-            required_fields = ['temperature', 'humidity', 'pressure', 
-                             'air_quality', 'wind_speed', 'wind_direction', 'rainfall']
-
-            for field in required_fields:
-                if field not in data:
-                    return jsonify({'error': f'Missing required field: {field}'}), 400
-
-            # Use IST time for timestamp
-            if 'timestamp' not in data:
-                IST = timedelta(hours=5, minutes=30)
-                data['timestamp'] = (datetime.utcnow() + IST).isoformat()
-
-            df = pd.DataFrame([data])
-            conn = sqlite3.connect(DATABASE_PATH)
-            df.to_sql('weather_readings', conn, if_exists='append', index=False)
-            conn.close()
+            yield "retry: 3000\n\n"
+            sent_id = last_id
+            if last_id is not None:
+                rows = read_readings_after(after_id=last_id, limit=MAX_PAGE_LIMIT, station_id=station_id)
+                for row in rows:
+                    reading = row_to_reading(row)
+                    sent_id = reading['id']
+                    yield format_event(reading)
+
+            while True:
+                try:
+                    reading = q.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if sent_id is not None and reading['id'] <= sent_id:
+                    continue
+                if station_id is not None and reading['station_id'] != station_id:
+                    continue
+                sent_id = reading['id']
+                yield format_event(reading)
+        finally:
+            unsubscribe_readings(q)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/rollup', methods=['GET'])
+@app.route('/api/stations/<station_id>/rollup', methods=['GET'])
+@etag_on_data_version
+@cache_response
+@require_station
+def api_rollup(station_id=None):
+    """
+    Return time-bucketed avg/min/max/sum per metric from the rollup
+    tables, of all stations together or of one.
+
+    resolution is minute, hour or day; when omitted the finest table
+    that covers from/to in at most max_points buckets is used.
+    """
+    try:
+        since = request.args.get('from')
+        until = request.args.get('to')
+        since = parse_timestamp(since) if since else None
+        until = parse_timestamp(until) if until else None
+
+        max_points = request.args.get('max_points', ROLLUP_MAX_POINTS, type=int)
+        resolution = request.args.get('resolution') or choose_resolution(since, until, max(1, max_points))
+        if resolution not in ROLLUP_RESOLUTIONS:
+            return jsonify({'error': f"resolution must be one of {', '.join(ROLLUP_RESOLUTIONS)}"}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        with db_connection() as conn:
+            buckets = query_rollup(conn, resolution, since, until, station_id)
+        return jsonify({'resolution': resolution, 'data': buckets}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-            return jsonify({
-                'success': True,
-                'message': 'Data inserted successfully',
-                'data': data
-            }), 201
+@app.route('/api/series', methods=['GET'])
+@app.route('/api/stations/<station_id>/series', methods=['GET'])
+@etag_on_data_version
+@cache_response
+@require_station
+def api_series(station_id=None):
+    """
+    Return a downsampled series per metric for charting.
 
+    metric is one or more comma-separated columns; from/to default to
+    the last 24 hours. points caps the samples per metric and method
+    is lttb (default) or minmax. Without a station, each station with
+    readings in the window gets its own series under 'stations'.
+    """
+    metrics = [m for m in request.args.get('metric', '').split(',') if m]
+    if not metrics:
+        return jsonify({'error': 'Missing required parameter: metric'}), 400
+    for metric in metrics:
+        if metric not in METRICS:
+            return jsonify({'error': f'Unknown metric: {metric}'}), 400
 
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
+    method = request.args.get('method', 'lttb')
+    if method not in ('lttb', 'minmax'):
+        return jsonify({'error': 'method must be lttb or minmax'}), 400
 
-    else:
+    try:
+        until = request.args.get('to')
+        until = parse_timestamp(until) if until else \
+            (datetime.now(timezone.utc) - EPOCH) // timedelta(milliseconds=1)
+        since = request.args.get('from')
+        since = parse_timestamp(since) if since else \
+            until - DEFAULT_SERIES_WINDOW // timedelta(milliseconds=1)
+
+        points = request.args.get('points', DEFAULT_SERIES_POINTS, type=int)
+        points = max(3, min(points, MAX_SERIES_POINTS))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def render(series):
+        return {
+            metric: {
+                'timestamp': [format_timestamp(int(t)) for t in x],
+                'value': y.tolist()
+            }
+            for metric, (x, y) in series.items()
+        }
+
+    try:
+        body = {'from': format_timestamp(since), 'to': format_timestamp(until), 'method': method}
+        with db_connection() as conn:
+            if station_id is not None:
+                body['series'] = render(query_series(conn, metrics, since, until, points, method, station_id))
+            else:
+                # Stations are downsampled apart, not merged into one line
+                body['stations'] = {}
+                for station, in conn.execute("SELECT station_id FROM stations ORDER BY station_id").fetchall():
+                    series = query_series(conn, metrics, since, until, points, method, station)
+                    if len(series[metrics[0]][0]):
+                        body['stations'][station] = render(series)
+        return jsonify(body), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stations', methods=['GET', 'POST'])
+def api_stations():
+    """
+    GET: List registered stations / POST: Register a station
+
+    POST takes station_id plus optional name, latitude and longitude.
+    Registering an existing station updates its details, so nodes can
+    register on every boot.
+    """
+    if request.method == 'GET':
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            df = pd.read_sql_query("SELECT * FROM weather_readings ORDER BY timestamp", conn)
-            conn.close()
-            data = df.to_dict('records')
-            return jsonify(data), 200
+            with db_connection() as conn:
+                sync_aggregates(conn)
+                return jsonify({'stations': list_stations(conn)}), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
-@app.route('/api/latest', methods=['GET'])
-def api_latest():
-    """Return the most recent weather reading"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Station must be a JSON object'}), 400
+    station_id = data.get('station_id')
+    if not isinstance(station_id, str) or not STATION_ID_PATTERN.fullmatch(station_id):
+        return jsonify({'error': 'station_id must be 1-64 letters, digits, _, . or -'}), 400
+    for field in ('latitude', 'longitude'):
+        if data.get(field) is not None and (isinstance(data[field], bool) or not isinstance(data[field], (int, float))):
+            return jsonify({'error': f'{field} must be a number'}), 400
+
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        df = pd.read_sql_query(
-            "SELECT * FROM weather_readings ORDER BY timestamp DESC LIMIT 1",
-            conn
-        )
-        conn.close()
+        with db_connection() as conn:
+            created = register_station(conn, station_id, data.get('name'),
+                                       data.get('latitude'), data.get('longitude'))
+        bump_data_version()
+        return jsonify({'success': True, 'station_id': station_id, 'created': created}), 201 if created else 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        if len(df) == 0:
+@app.route('/api/cache/stats', methods=['GET'])
+def api_cache_stats():
+    """Return response cache hit/miss counters"""
+    return jsonify(response_cache_stats()), 200
+
+@app.route('/api/latest', methods=['GET'])
+@app.route('/api/stations/<station_id>/latest', methods=['GET'])
+@etag_on_data_version
+@cache_response
+@require_station
+def api_latest(station_id=None):
+    """Return the most recent weather reading, of every station or of one"""
+    try:
+        ring = _rings.get(station_id)
+        row = ring.latest() if ring is not None else None
+        if row is None:
+            # Index seek on idx_weather_readings_timestamp, or on
+            # idx_weather_readings_station_timestamp for one station
+            with db_connection() as conn:
+                rows = query_readings(conn, order='desc', limit=1, station_id=station_id)
+                row = next(rows, None)
+                rows.close()
+
+        if row is None:
             return jsonify({'error': 'No data available'}), 404
 
-        data = df.to_dict('records')[0]
-        return jsonify(data), 200
+        return jsonify(row_to_reading(row)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/export', methods=['GET'])
-def api_export():
-    """Export all weather data as CSV file"""
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        df = pd.read_sql_query("SELECT * FROM weather_readings ORDER BY timestamp", conn)
-        conn.close()
-
-        output = io.BytesIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
+@app.route('/api/stations/<station_id>/export', methods=['GET'])
+@require_station
+def api_export(station_id=None):
+    """
+    Export weather data as a file download, streamed from SQLite in
+    chunks so memory use stays flat however large the export is.
 
-        return send_file(
-            output,
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'weather_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        )
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    Accepts from/to (ISO 8601 or epoch ms), format (csv, ndjson or
+    parquet) and gzip=1 to compress csv/ndjson output.
+    """
+    try:
+        since = request.args.get('from')
+        until = request.args.get('to')
+        since = parse_timestamp(since) if since else None
+        until = parse_timestamp(until) if until else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    if fmt == 'parquet' and pq is None:
+        return jsonify({'error': 'Parquet export requires pyarrow'}), 406
+
+    compress = request.args.get('gzip', '0').lower() in ('1', 'true', 'yes')
+    if compress and fmt == 'parquet':
+        return jsonify({'error': 'Parquet output is already compressed'}), 400
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    encoders = {'csv': export_csv, 'ndjson': export_ndjson, 'parquet': export_parquet}
+    body = encoders[fmt](iter_export_chunks(since, until, station_id))
+    if compress:
+        body = gzip_stream(body)
+        mimetype, extension = 'application/gzip', extension + '.gz'
+
+    prefix = f'weather_data_{station_id}' if station_id is not None else 'weather_data'
+    filename = f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
 
 @app.route('/api/stats', methods=['GET'])
-def api_stats():
-    """Return summary statistics of weather data"""
+@app.route('/api/stations/<station_id>/stats', methods=['GET'])
+@etag_on_data_version
+@cache_response
+@require_station
+def api_stats(station_id=None):
+    """Return summary statistics of weather data, of every station or of one"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        df = pd.read_sql_query("SELECT * FROM weather_readings", conn)
-        conn.close()
+        with db_connection() as conn:
+            sync_aggregates(conn)
 
-        if len(df) == 0:
+        agg = get_aggregates(station_id)
+        count = agg['count']
+        if count == 0:
             return jsonify({'error': 'No data available'}), 404
 
+        def avg(metric):
+            return float(agg['sum'][metric] / count)
+
         stats = {
-            'total_readings': len(df),
-            'avg_temperature': float(df['temperature'].mean()),
-            'min_temperature': float(df['temperature'].min()),
-            'max_temperature': float(df['temperature'].max()),
-            'avg_humidity': float(df['humidity'].mean()),
-            'min_humidity': float(df['humidity'].min()),
-            'max_humidity': float(df['humidity'].max()),
-            'avg_pressure': float(df['pressure'].mean()),
-            'min_pressure': float(df['pressure'].min()),
-            'max_pressure': float(df['pressure'].max()),
-            'avg_air_quality': float(df['air_quality'].mean()),
-            'min_air_quality': int(df['air_quality'].min()),
-            'max_air_quality': int(df['air_quality'].max()),
-            'avg_wind_speed': float(df['wind_speed'].mean()),
-            'min_wind_speed': float(df['wind_speed'].min()),
-            'max_wind_speed': float(df['wind_speed'].max()),
-            'total_rainfall': float(df['rainfall'].sum()),
-            'avg_rainfall': float(df['rainfall'].mean())
+            'total_readings': count,
+            'avg_temperature': avg('temperature'),
+            'min_temperature': float(agg['min']['temperature']),
+            'max_temperature': float(agg['max']['temperature']),
+            'avg_humidity': avg('humidity'),
+            'min_humidity': float(agg['min']['humidity']),
+            'max_humidity': float(agg['max']['humidity']),
+            'avg_pressure': avg('pressure'),
+            'min_pressure': float(agg['min']['pressure']),
+            'max_pressure': float(agg['max']['pressure']),
+            'avg_air_quality': avg('air_quality'),
+            'min_air_quality': int(agg['min']['air_quality']),
+            'max_air_quality': int(agg['max']['air_quality']),
+            'avg_wind_speed': avg('wind_speed'),
+            'min_wind_speed': float(agg['min']['wind_speed']),
+            'max_wind_speed': float(agg['max']['wind_speed']),
+            'total_rainfall': float(agg['sum']['rainfall']),
+            'avg_rainfall': avg('rainfall')
         }
 
         return jsonify(stats), 200
@@ -1323,9 +4000,18 @@ def api_stats():
 
 if __name__ == '__main__':
     print("Initializing Weather Monitoring System...")
-    init_database()
+    # The debug reloader runs this block in a watcher process and again
+    # in the serving child; only the child migrates, compacts, archives
+    # and listens for sensors
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_database()
+        start_rollup_worker()
+        start_ingest_server()
     print(f"Database: {os.path.abspath(DATABASE_PATH)}")
     print("Starting Flask server...")
     print("Access the enhanced dashboard at: http://localhost:5000")
+    print(f"Sensors post readings to: http://<this host>:{INGEST_PORT}/api/data")
+    print(f"or send binary packets over TCP or UDP to port {PACKET_PORT}")
+    print("This is the development server; for production run: python -m weather serve --workers N")
 
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,376 @@
+// Chart configurations with smooth animations
+const tempChart = new Chart(document.getElementById('tempChart'), {
+    type: 'line',
+    data: {
+        labels: [],
+        datasets: [{
+            label: 'Temperature (°C)',
+            data: [],
+            borderColor: '#FF6384',
+            backgroundColor: 'rgba(255, 99, 132, 0.1)',
+            tension: 0.4,
+            fill: true
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: true,
+        plugins: {
+            legend: {
+                display: true
+            }
+        },
+        scales: {
+            y: {
+                beginAtZero: false
+            }
+        }
+    }
+});
+
+const humidityChart = new Chart(document.getElementById('humidityChart'), {
+    type: 'line',
+    data: {
+        labels: [],
+        datasets: [{
+            label: 'Humidity (%)',
+            data: [],
+            borderColor: '#36A2EB',
+            backgroundColor: 'rgba(54, 162, 235, 0.1)',
+            tension: 0.4,
+            fill: true
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: true,
+        scales: {
+            y: {
+                beginAtZero: true,
+                max: 100
+            }
+        }
+    }
+});
+
+const pressureChart = new Chart(document.getElementById('pressureChart'), {
+    type: 'line',
+    data: {
+        labels: [],
+        datasets: [{
+            label: 'Pressure (hPa)',
+            data: [],
+            borderColor: '#9966FF',
+            backgroundColor: 'rgba(153, 102, 255, 0.1)',
+            tension: 0.4,
+            fill: true
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: true,
+        scales: {
+            y: {
+                beginAtZero: false
+            }
+        }
+    }
+});
+
+const airQualityChart = new Chart(document.getElementById('airQualityChart'), {
+    type: 'bar',
+    data: {
+        labels: [],
+        datasets: [{
+            label: 'Air Quality (AQI)',
+            data: [],
+            backgroundColor: '#4BC0C0'
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: true,
+        scales: {
+            y: {
+                beginAtZero: true
+            }
+        }
+    }
+});
+
+const windSpeedChart = new Chart(document.getElementById('windSpeedChart'), {
+    type: 'line',
+    data: {
+        labels: [],
+        datasets: [{
+            label: 'Wind Speed (km/h)',
+            data: [],
+            borderColor: '#FF9F40',
+            backgroundColor: 'rgba(255, 159, 64, 0.1)',
+            tension: 0.4,
+            fill: true
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: true,
+        scales: {
+            y: {
+                beginAtZero: true
+            }
+        }
+    }
+});
+
+const rainfallChart = new Chart(document.getElementById('rainfallChart'), {
+    type: 'bar',
+    data: {
+        labels: [],
+        datasets: [{
+            label: 'Rainfall (mm)',
+            data: [],
+            backgroundColor: '#1E88E5'
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: true,
+        scales: {
+            y: {
+                beginAtZero: true
+            }
+        }
+    }
+});
+
+const windDirectionChart = new Chart(document.getElementById('windDirectionChart'), {
+    type: 'radar',
+    data: {
+        labels: ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW'],
+        datasets: [{
+            label: 'Wind Direction Frequency',
+            data: [0, 0, 0, 0, 0, 0, 0, 0],
+            backgroundColor: 'rgba(38, 166, 154, 0.2)',
+            borderColor: '#26A69A',
+            pointBackgroundColor: '#26A69A'
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: true,
+        scales: {
+            r: {
+                beginAtZero: true
+            }
+        }
+    }
+});
+
+// Line/bar charts and the reading field each one plots
+const seriesCharts = [
+    [tempChart, 'temperature'],
+    [humidityChart, 'humidity'],
+    [pressureChart, 'pressure'],
+    [airQualityChart, 'air_quality'],
+    [windSpeedChart, 'wind_speed'],
+    [rainfallChart, 'rainfall']
+];
+
+const WINDOW = 50;
+const SERIES_POINTS = 300;
+const RANGES = {
+    '1h': ['1 hour', 60 * 60 * 1000],
+    '24h': ['24 hours', 24 * 60 * 60 * 1000],
+    '7d': ['7 days', 7 * 24 * 60 * 60 * 1000],
+    '30d': ['30 days', 30 * 24 * 60 * 60 * 1000]
+};
+let range = 'live';
+let station = 'default';
+let stream = null;
+let recent = [];
+let lastId = null;
+
+// API path of the station being charted
+function stationPath() {
+    return `/api/stations/${encodeURIComponent(station)}`;
+}
+
+// Update wind direction chart (frequency distribution)
+function updateDirectionChart(directions) {
+    const directionBins = [0, 0, 0, 0, 0, 0, 0, 0];
+    directions.forEach(dir => {
+        const bin = Math.floor(dir / 45) % 8;
+        directionBins[bin]++;
+    });
+
+    windDirectionChart.data.datasets[0].data = directionBins;
+    windDirectionChart.update('none');
+}
+
+// Append new readings to all charts
+function appendReadings(rows) {
+    rows = rows.filter(r => lastId === null || r.id > lastId);
+    if (rows.length === 0) {
+        return;
+    }
+    lastId = rows[rows.length - 1].id;
+
+    recent = recent.concat(rows);
+    recent = recent.slice(Math.max(0, recent.length - WINDOW));
+
+    // Push new points and drop the oldest to keep the last 50
+    const labels = rows.map(r => new Date(r.timestamp).toLocaleTimeString());
+    seriesCharts.forEach(([chart, field]) => {
+        const values = chart.data.datasets[0].data;
+        chart.data.labels.push(...labels);
+        values.push(...rows.map(r => r[field]));
+        chart.data.labels.splice(0, chart.data.labels.length - recent.length);
+        values.splice(0, values.length - recent.length);
+        chart.update('none');
+    });
+
+    updateDirectionChart(recent.map(r => r.wind_direction));
+}
+
+// Decode the packed column layout served with format=binary
+function decodeColumns(buffer) {
+    const view = new DataView(buffer);
+    const rows = view.getUint32(4, true);
+    const count = view.getUint32(8, true);
+    const decoder = new TextDecoder();
+    const header = [];
+    let offset = 12;
+    for (let i = 0; i < count; i++) {
+        const type = String.fromCharCode(view.getUint8(offset));
+        const length = view.getUint8(offset + 1);
+        const name = decoder.decode(new Uint8Array(buffer, offset + 2, length));
+        header.push([name, type]);
+        offset += 2 + length;
+    }
+    offset = Math.ceil(offset / 8) * 8;
+
+    const columns = {};
+    header.forEach(([name, type]) => {
+        const size = type === 'q' ? 8 : 4;
+        columns[name] = type === 'q'
+            ? new BigInt64Array(buffer, offset, rows)
+            : new Float32Array(buffer, offset, rows);
+        offset += Math.ceil(rows * size / 8) * 8;
+    });
+    return { rows, columns };
+}
+
+// Load the most recent readings
+async function loadCharts() {
+    try {
+        const charted = station;
+        const response = await fetch(`${stationPath()}/data/delta?limit=${WINDOW}&format=binary`);
+        const { rows, columns } = decodeColumns(await response.arrayBuffer());
+        if (station !== charted) {
+            return;
+        }
+
+        const readings = [];
+        for (let i = 0; i < rows; i++) {
+            const reading = {};
+            Object.entries(columns).forEach(([name, values]) => {
+                reading[name] = typeof values[i] === 'bigint' ? Number(values[i]) : values[i];
+            });
+            readings.push(reading);
+        }
+        appendReadings(readings);
+    } catch (error) {
+        console.error('Error updating charts:', error);
+    }
+}
+
+// Load a downsampled series covering a whole time range
+async function loadRange(name) {
+    try {
+        const charted = station;
+        const [label, length] = RANGES[name];
+        const to = Date.now();
+        const metrics = seriesCharts.map(([, field]) => field).concat('wind_direction');
+        const response = await fetch(
+            `${stationPath()}/series?metric=${metrics.join(',')}&from=${to - length}&to=${to}&points=${SERIES_POINTS}`
+        );
+        const result = await response.json();
+        if (range !== name || station !== charted) {
+            return;
+        }
+
+        seriesCharts.forEach(([chart, field]) => {
+            const series = result.series[field];
+            chart.data.labels = series.timestamp.map(t => new Date(t).toLocaleString());
+            chart.data.datasets[0].data = series.value;
+            chart.update('none');
+        });
+        updateDirectionChart(result.series.wind_direction.value);
+
+        document.getElementById('range-info').textContent =
+            `Last ${label} | Downsampled to ${SERIES_POINTS} points per chart`;
+    } catch (error) {
+        console.error('Error loading range:', error);
+    }
+}
+
+// Switch between live updates and a fixed time range
+function selectRange(name) {
+    range = name;
+    document.querySelectorAll('.range-picker button').forEach(button => {
+        button.classList.toggle('active', button.dataset.range === name);
+    });
+
+    seriesCharts.forEach(([chart]) => {
+        chart.data.labels = [];
+        chart.data.datasets[0].data = [];
+    });
+    recent = [];
+    lastId = null;
+
+    if (name === 'live') {
+        document.getElementById('range-info').textContent =
+            'Live updates | Last 50 readings displayed';
+        loadCharts();
+    } else {
+        loadRange(name);
+    }
+}
+
+// Follow the live stream of the station being charted
+function followStream() {
+    if (stream !== null) {
+        stream.close();
+    }
+    stream = new EventSource(`${stationPath()}/stream?last_id=${lastId ?? ''}`);
+    stream.addEventListener('reading', event => {
+        if (range === 'live') {
+            appendReadings([JSON.parse(event.data)]);
+        }
+    });
+}
+
+// Chart another station from scratch
+function selectStation(id) {
+    station = id;
+    selectRange(range);
+    followStream();
+}
+
+// Fill the station picker with the registered stations
+async function loadStations() {
+    try {
+        const response = await fetch('/api/stations');
+        const { stations } = await response.json();
+        const picker = document.getElementById('station-picker');
+        stations.forEach(({ station_id, name }) => {
+            picker.add(new Option(name || station_id, station_id, false, station_id === station));
+        });
+    } catch (error) {
+        console.error('Error loading stations:', error);
+    }
+}
+
+// Initial update, then follow the live stream
+loadStations();
+loadCharts().then(followStream);
@@ -0,0 +1,131 @@
+// Fetch and display statistics
+async function loadStats() {
+    try {
+        const response = await fetch('/api/stats');
+        const stats = await response.json();
+
+        const statsHTML = `
+            <div class="stat-card" style="animation-delay: 0.1s">
+                <div class="stat-title">Average Temperature</div>
+                <div class="stat-value">
+                    ${stats.avg_temperature.toFixed(1)}
+                    <span class="stat-unit">°C</span>
+                </div>
+            </div>
+            <div class="stat-card" style="animation-delay: 0.2s">
+                <div class="stat-title">Average Humidity</div>
+                <div class="stat-value">
+                    ${stats.avg_humidity.toFixed(1)}
+                    <span class="stat-unit">%</span>
+                </div>
+            </div>
+            <div class="stat-card" style="animation-delay: 0.3s">
+                <div class="stat-title">Max Wind Speed</div>
+                <div class="stat-value">
+                    ${stats.max_wind_speed.toFixed(1)}
+                    <span class="stat-unit">km/h</span>
+                </div>
+            </div>
+            <div class="stat-card" style="animation-delay: 0.4s">
+                <div class="stat-title">Total Rainfall</div>
+                <div class="stat-value">
+                    ${stats.total_rainfall.toFixed(1)}
+                    <span class="stat-unit">mm</span>
+                </div>
+            </div>
+        `;
+
+        document.getElementById('stats-section').innerHTML = statsHTML;
+        document.getElementById('record-count').textContent = stats.total_readings;
+    } catch (error) {
+        console.error('Error loading stats:', error);
+    }
+}
+
+// Display a reading in the latest reading panel
+function renderLatest(data) {
+    const readingHTML = `
+        <div class="reading-item">
+            <div class="reading-label">🌡️ Temperature</div>
+            <div class="reading-value">${data.temperature}°C</div>
+        </div>
+        <div class="reading-item">
+            <div class="reading-label">💧 Humidity</div>
+            <div class="reading-value">${data.humidity}%</div>
+        </div>
+        <div class="reading-item">
+            <div class="reading-label">🎈 Pressure</div>
+            <div class="reading-value">${data.pressure} hPa</div>
+        </div>
+        <div class="reading-item">
+            <div class="reading-label">💨 Air Quality</div>
+            <div class="reading-value">${data.air_quality} AQI</div>
+        </div>
+        <div class="reading-item">
+            <div class="reading-label">🌪️ Wind Speed</div>
+            <div class="reading-value">${data.wind_speed} km/h</div>
+        </div>
+        <div class="reading-item">
+            <div class="reading-label">🧭 Wind Direction</div>
+            <div class="reading-value">${data.wind_direction}°</div>
+        </div>
+        <div class="reading-item">
+            <div class="reading-label">🌧️ Rainfall</div>
+            <div class="reading-value">${data.rainfall} mm</div>
+        </div>
+    `;
+
+    document.getElementById('latest-reading').innerHTML = readingHTML;
+    document.getElementById('last-update').textContent = 
+        `Last updated: ${new Date(data.timestamp).toLocaleString()}`;
+}
+
+// Fetch and display latest reading
+async function loadLatest() {
+    try {
+        const response = await fetch('/api/latest');
+        renderLatest(await response.json());
+    } catch (error) {
+        console.error('Error loading latest data:', error);
+    }
+}
+
+// Refresh all data
+function refreshData() {
+    lastStatsLoad = Date.now();
+    loadStats();
+    loadLatest();
+}
+
+// Export CSV
+function exportCSV() {
+    window.location.href = '/api/export';
+}
+
+// Stats are refreshed at most once per STATS_INTERVAL_MS while readings
+// stream in, rather than once per reading
+const STATS_INTERVAL_MS = 5000;
+let lastStatsLoad = 0;
+let statsTimer = null;
+
+function scheduleStats() {
+    if (statsTimer !== null) {
+        return;
+    }
+    const wait = Math.max(0, lastStatsLoad + STATS_INTERVAL_MS - Date.now());
+    statsTimer = setTimeout(() => {
+        statsTimer = null;
+        lastStatsLoad = Date.now();
+        loadStats();
+    }, wait);
+}
+
+// Live updates: new readings are pushed by the server
+const stream = new EventSource('/api/stream');
+stream.addEventListener('reading', event => {
+    renderLatest(JSON.parse(event.data));
+    scheduleStats();
+});
+
+// Initial load
+refreshData();
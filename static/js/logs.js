@@ -0,0 +1,67 @@
+const MAX_ROWS = 500;
+let lastId = null;
+let recordCount = 0;
+
+// Newest first: insert each new row at the top
+function prependRows(rows) {
+    const tbody = document.getElementById('table-body');
+
+    rows.forEach(row => {
+        if (lastId !== null && row.id <= lastId) {
+            return;
+        }
+        const tr = document.createElement('tr');
+        tr.innerHTML = `
+            <td>${row.id}</td>
+            <td>${new Date(row.timestamp).toLocaleString()}</td>
+            <td>${row.temperature}</td>
+            <td>${row.humidity}</td>
+            <td>${row.pressure}</td>
+            <td>${row.air_quality}</td>
+            <td>${row.wind_speed}</td>
+            <td>${row.wind_direction}</td>
+            <td>${row.rainfall}</td>
+        `;
+        tbody.insertBefore(tr, tbody.firstChild);
+        lastId = row.id;
+        recordCount++;
+    });
+
+    while (tbody.rows.length > MAX_ROWS) {
+        tbody.deleteRow(-1);
+    }
+    document.getElementById('record-count').textContent = recordCount;
+}
+
+async function loadTableData() {
+    try {
+        // Only fetch readings newer than the last one shown
+        const url = lastId === null
+            ? `/api/data/delta?limit=${MAX_ROWS}`
+            : `/api/data/delta?after_id=${lastId}&limit=${MAX_ROWS}`;
+        const response = await fetch(url);
+        const delta = await response.json();
+
+        const statsResponse = await fetch('/api/stats');
+        const stats = await statsResponse.json();
+        recordCount = stats.total_readings - delta.data.length;
+
+        prependRows(delta.data);
+    } catch (error) {
+        console.error('Error loading table data:', error);
+    }
+}
+
+function refreshTable() {
+    lastId = null;
+    document.getElementById('table-body').innerHTML = '';
+    loadTableData();
+}
+
+// Initial load, then follow the live stream
+loadTableData().then(() => {
+    const stream = new EventSource(`/api/stream?last_id=${lastId ?? ''}`);
+    stream.addEventListener('reading', event => {
+        prependRows([JSON.parse(event.data)]);
+    });
+});
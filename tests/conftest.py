@@ -0,0 +1,42 @@
+import pytest
+
+import app
+
+
+def _reset_state():
+    while not app._db_pool.empty():
+        app._db_pool.get_nowait().close()
+    app._stations.clear()
+    app._station_misses.clear()
+    app._station_sequences.clear()
+    app._rings.clear()
+    app._reset_aggregates()
+    app.clear_response_cache()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    A fresh database (with its partitions) under tmp_path, migrated and
+    loaded as at startup; yields a connection to it
+    """
+    monkeypatch.setattr(app, 'DATABASE_PATH', str(tmp_path / 'weather_data.db'))
+    _reset_state()
+    app.init_database()
+    conn = app.get_db_connection()
+    yield conn
+    app.stop_ingest_writer()
+    conn.close()
+    _reset_state()
+
+
+@pytest.fixture
+def client(db):
+    return app.app.test_client()
+
+
+def reading(timestamp, station_id='default', **values):
+    data = dict(temperature=21.5, humidity=60.0, pressure=1012.25, air_quality=42,
+                wind_speed=3.5, wind_direction=180.0, rainfall=0.0, station_id=station_id)
+    data.update(values, timestamp=timestamp)
+    return data
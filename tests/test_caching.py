@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+import app
+from tests.conftest import reading
+
+START = 1_760_000_000_000
+
+
+@pytest.mark.parametrize('path', ['/api/latest', '/api/stats', '/api/data?limit=5', '/api/stations/default/stats'])
+def test_unchanged_data_is_answered_with_304(client, path):
+    client.post('/api/data/batch', json=[reading(START)])
+    first = client.get(path)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache' and first.data
+
+    again = client.get(path, headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    assert again.headers['ETag'] == etag
+
+    client.post('/api/data/batch', json=[reading(START + 1000)])
+    changed = client.get(path, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.data != first.data
+    assert changed.headers['ETag'] != etag
+
+
+def test_etags_differ_by_response_format(client):
+    client.post('/api/data/batch', json=[reading(START)])
+    response = client.get('/api/data')
+    json_etag = response.headers['ETag']
+    binary = client.get('/api/data', headers={'Accept': app.READ_FORMATS['binary']})
+    assert binary.headers['ETag'] != json_etag and binary.data != response.data
+    assert 'Accept' in binary.headers['Vary']
+    assert client.get('/api/data', headers={'If-None-Match': json_etag,
+                                            'Accept': app.READ_FORMATS['binary']}).data == binary.data
+
+
+def test_errors_carry_no_etag(client):
+    response = client.get('/api/data?order=sideways')
+    assert response.status_code == 400 and 'ETag' not in response.headers
+
+
+def cache_counts():
+    stats = app.response_cache_stats()
+    return stats['hits'], stats['misses'], stats['size']
+
+
+def test_responses_are_cached_until_the_data_changes(client):
+    client.post('/api/data/batch', json=[reading(START)])
+    hits, misses, _ = cache_counts()
+    first = client.get('/api/stats').data
+    assert client.get('/api/stats').data == first
+    assert cache_counts() == (hits + 1, misses + 1, 1)
+
+    app.bump_data_version()
+    assert cache_counts()[2] == 0
+    client.get('/api/stats')
+    assert cache_counts() == (hits + 1, misses + 2, 1)
+
+    client.post('/api/data/batch', json=[reading(START + 1000)])
+    assert cache_counts()[2] == 0
+    assert client.get('/api/stats').get_json()['total_readings'] == 2
+
+
+def test_cached_responses_expire_and_are_evicted(client, monkeypatch):
+    client.post('/api/data/batch', json=[reading(START)])
+    monkeypatch.setattr(app, 'RESPONSE_CACHE_TTL', 0)
+    hits, misses, _ = cache_counts()
+    client.get('/api/stats')
+    client.get('/api/stats')
+    assert cache_counts()[:2] == (hits, misses + 2)
+
+    monkeypatch.setattr(app, 'RESPONSE_CACHE_TTL', 60)
+    monkeypatch.setattr(app, 'RESPONSE_CACHE_SIZE', 1)
+    evictions = app.response_cache_stats()['evictions']
+    client.get('/api/stats')
+    client.get('/api/latest')
+    assert app.response_cache_stats()['evictions'] == evictions + 1
+    assert cache_counts()[2] == 1
+
+
+def test_concurrent_misses_are_computed_once(db):
+    calls, started = [], threading.Event()
+
+    @app.cache_response
+    def view():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'computed'
+
+    def get(results):
+        with app.app.test_request_context('/slow'):
+            results.append(view().get_data())
+
+    coalesced = app.response_cache_stats()['coalesced']
+    results = []
+    threads = [threading.Thread(target=get, args=(results,)) for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b'computed'] * 4 and len(calls) == 1
+    assert app.response_cache_stats()['coalesced'] == coalesced + 3
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import app
+from tests.conftest import reading
+
+
+def round_trip(ids, timestamps, values):
+    ids, timestamps, values = np.asarray(ids, np.int64), np.asarray(timestamps, np.int64), np.asarray(values)
+    decoded = app.decode_chunk(app.encode_chunk(ids, timestamps, values), len(ids))
+    np.testing.assert_array_equal(decoded[0], ids)
+    np.testing.assert_array_equal(decoded[1], timestamps)
+    # Bitwise, so NaN payloads and the sign of zero count
+    np.testing.assert_array_equal(decoded[2].view(np.uint64), values.view(np.uint64))
+    return decoded
+
+
+def metric_rows(*columns):
+    return np.column_stack([np.asarray(column, np.float64) for column in columns])
+
+
+def test_sensor_readings_round_trip():
+    rng = np.random.default_rng(1)
+    rows = 5000
+    values = metric_rows(*(np.round(rng.uniform(-40, 1100, rows), 2) for _ in app.METRICS))
+    timestamps = 1_760_000_000_000 + np.arange(rows) * 10_000 + rng.integers(-50, 50, rows)
+    round_trip(np.arange(1, rows + 1), timestamps, values)
+
+
+@pytest.mark.parametrize('rows', [1, 2, 3])
+def test_short_chunks_round_trip(rows):
+    values = metric_rows(*([23.7 + i for i in range(rows)] for _ in app.METRICS))
+    round_trip(np.arange(7, 7 + rows), 1_760_000_000_000 + np.arange(rows) * 1000, values)
+
+
+@pytest.mark.parametrize('special', [np.nan, -np.nan, np.inf, -np.inf, 0.0, -0.0])
+def test_special_floats_round_trip(special):
+    column = [1.5, special, 2.25, special]
+    round_trip(np.arange(1, 5), np.arange(4) * 1000, metric_rows(*([column] * len(app.METRICS))))
+
+
+@pytest.mark.parametrize('value', [np.nan, -0.0, 0.0])
+def test_single_special_value_round_trips(value):
+    round_trip([42], [1_760_000_000_000], metric_rows(*([[value]] * len(app.METRICS))))
+
+
+def test_unscalable_floats_round_trip():
+    values = metric_rows(*([0.1 + 0.2, 1 / 3, 2 ** 60 + 0.5, 5e-324] for _ in app.METRICS))
+    round_trip([1, 5, 6, 100], [0, 1, 2, 3], values)
+
+
+def test_wide_id_and_timestamp_gaps_round_trip():
+    ids = [1, 2, 2 ** 40, 2 ** 40 + 1]
+    timestamps = [-1_000, 0, 2 ** 45, 2 ** 45 + 7]
+    round_trip(ids, timestamps, metric_rows(*([[1.0, 2.0, 3.0, 4.0]] * len(app.METRICS))))
+
+
+def test_sealed_month_reads_back_unchanged(db, client):
+    start = app.parse_timestamp('2025-06-01T00:00:00')
+    readings = [reading(start + i * 60_000, temperature=round(-5 + i * 0.01, 2), rainfall=(i % 7) * 0.25)
+                for i in range(3000)]
+    assert client.post('/api/data/batch', json=readings).status_code == 201
+    before = client.get('/api/export?format=ndjson').data
+
+    app.compact_rollups(db)
+    assert app.archive_partitions(db, now=app.parse_timestamp('2026-01-01T00:00:00'))
+    sealed = db.execute("SELECT month, rows, sealed_rows FROM partitions").fetchall()
+    assert [tuple(row) for row in sealed] == [('2025-06', 3000, 3000)]
+
+    app.clear_response_cache()
+    assert client.get('/api/export?format=ndjson').data == before
+
+
+@pytest.mark.parametrize('now', ['2025-08-01T00:00:00', '2026-01-01T00:00:00'])
+def test_redelivered_readings_of_an_archived_month_are_skipped(db, client, now):
+    start = app.parse_timestamp('2025-06-01T00:00:00')
+    readings = [reading(start + i * 60_000, rainfall=0.5) for i in range(100)]
+    assert client.post('/api/data/batch', json=readings).status_code == 201
+    app.compact_rollups(db)
+    assert app.archive_partitions(db, now=app.parse_timestamp(now)) == ['2025-06']
+    before = client.get('/api/stats').get_json()
+
+    stored = app.insert_readings(db, [readings[5], readings[99], reading(start + 30), readings[5]])
+    assert [data is not None for data in stored] == [False, False, True, False]
+    app.compact_rollups(db)
+    app.clear_response_cache()
+    stats = client.get('/api/stats').get_json()
+    assert stats['total_readings'] == before['total_readings'] + 1
+    assert stats['total_rainfall'] == pytest.approx(before['total_rainfall'] + 0.0)
@@ -0,0 +1,59 @@
+import struct
+
+import numpy as np
+import pytest
+
+import app
+from tests.conftest import reading
+
+START = 1_760_000_000_000
+
+
+def unpack_columns(data):
+    """
+    Decode the format=binary layout as graphs.js does, checking the
+    alignment it relies on
+    """
+    assert data[:4] == b'WXC1'
+    rows, count = struct.unpack_from('<II', data, 4)
+    header, offset = [], 12
+    for _ in range(count):
+        kind, length = data[offset:offset + 1].decode(), data[offset + 1]
+        header.append((data[offset + 2:offset + 2 + length].decode(), kind))
+        offset += 2 + length
+    assert set(data[offset:-(-offset // 8) * 8]) <= {0}
+    offset = -(-offset // 8) * 8
+
+    columns = {}
+    for name, kind in header:
+        dtype = np.dtype('<i8') if kind == 'q' else np.dtype('<f4')
+        assert offset % dtype.itemsize == 0 and offset % 8 == 0
+        columns[name] = np.frombuffer(data, dtype, rows, offset)
+        offset += -(-rows * dtype.itemsize // 8) * 8
+    assert offset == len(data)
+    return columns
+
+
+@pytest.mark.parametrize('rows', [0, 1, 3, 4])
+def test_packed_columns_are_aligned_and_typed(rows):
+    data = [(i + 1, START + i, 21.5 + i, 60.0, 1012.25, 42 + i, 3.5, 180.0, 0.25, 'default') for i in range(rows)]
+    packed = app.pack_columns(app.rows_to_columns(data))
+    columns = unpack_columns(packed)
+
+    assert list(columns) == app.READING_COLUMNS[:-1]
+    assert columns['id'].dtype == '<i8' and columns['timestamp'].dtype == '<i8'
+    assert all(columns[metric].dtype == '<f4' for metric in app.METRICS)
+    np.testing.assert_array_equal(columns['timestamp'], [START + i for i in range(rows)])
+    np.testing.assert_array_equal(columns['air_quality'], [42 + i for i in range(rows)])
+    np.testing.assert_array_equal(columns['temperature'], np.float32([21.5 + i for i in range(rows)]))
+
+
+def test_binary_reads_match_json(client):
+    client.post('/api/data/batch', json=[reading(START + i * 1000, temperature=20 + i / 4) for i in range(5)])
+    response = client.get('/api/data?format=binary')
+    assert response.mimetype == app.READ_FORMATS['binary']
+    columns = unpack_columns(response.data)
+    rows = client.get('/api/data').get_json()['data']
+    assert columns['id'].tolist() == [row['id'] for row in rows]
+    assert columns['temperature'].tolist() == [row['temperature'] for row in rows]
+    assert client.get('/api/data', headers={'Accept': app.READ_FORMATS['binary']}).data == response.data
@@ -0,0 +1,41 @@
+import json
+
+import app
+from tests.conftest import reading
+
+
+def test_air_quality_is_stored_as_an_integer(db, client):
+    start = app.parse_timestamp('2025-06-01T00:00:00')
+    readings = [reading(start + i * 60_000, air_quality=45.5 + i) for i in range(3)]
+    assert client.post('/api/data/batch', json=readings).status_code == 201
+
+    def air_quality():
+        app.clear_response_cache()
+        return ([row['air_quality'] for row in client.get('/api/data?order=asc').get_json()['data']],
+                client.get('/api/latest').get_json()['air_quality'],
+                [json.loads(line)['air_quality'] for line in client.get('/api/export?format=ndjson').data.splitlines()])
+
+    assert air_quality() == ([46, 46, 48], 48, [46, 46, 48])
+    app.compact_rollups(db)
+    app.archive_partitions(db, now=app.parse_timestamp('2026-01-01T00:00:00'))
+    assert db.execute("SELECT sealed_at IS NOT NULL FROM partitions").fetchone()[0]
+    assert air_quality() == ([46, 46, 48], 48, [46, 46, 48])
+
+
+def test_unknown_stations_are_remembered_briefly(db, monkeypatch):
+    assert not app.station_exists('ghost')
+    # Registered by another process: not seen until the miss expires
+    db.execute("INSERT INTO stations (station_id, registered_at) VALUES ('ghost', 0)")
+    db.commit()
+    assert not app.station_exists('ghost')
+    monkeypatch.setattr(app, 'STATION_MISS_TTL', 0)
+    assert app.station_exists('ghost')
+
+
+def test_registering_forgets_the_miss(db, monkeypatch):
+    monkeypatch.setattr(app, 'STATION_MISS_LIMIT', 2)
+    for station_id in ('a', 'b', 'c'):
+        assert not app.station_exists(station_id)
+    assert list(app._station_misses) == ['b', 'c']
+    app.register_station(db, 'c')
+    assert app.station_exists('c') and list(app._station_misses) == ['b']
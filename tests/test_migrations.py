@@ -0,0 +1,189 @@
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app
+from tests.conftest import _reset_state, reading
+
+SHIPPED_DATABASE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'weather_data.db')
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def shipped_rows():
+    conn = sqlite3.connect(f'file:{SHIPPED_DATABASE}?mode=ro', uri=True)
+    try:
+        return conn.execute("SELECT * FROM weather_readings ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def shipped(tmp_path, monkeypatch):
+    """
+    A copy of the shipped weather_data.db, not yet opened by the app
+    """
+    path = tmp_path / 'weather_data.db'
+    shutil.copy(SHIPPED_DATABASE, path)
+    monkeypatch.setattr(app, 'DATABASE_PATH', str(path))
+    _reset_state()
+    yield path
+    app.stop_ingest_writer()
+    _reset_state()
+
+
+def test_shipped_database_upgrades_to_epoch_timestamps(shipped):
+    before = shipped_rows()
+    app.init_database()
+
+    conn = app.get_db_connection()
+    versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [version for version, _, _ in app.MIGRATIONS]
+    columns = {row['name']: row['type'] for row in conn.execute("PRAGMA table_info(weather_readings)")}
+    assert columns['timestamp'] == 'INTEGER'
+
+    after = conn.execute(f"SELECT {', '.join(app.READING_COLUMNS)} FROM weather_readings ORDER BY id").fetchall()
+    assert len(after) == len(before)
+    for old, new in zip(before, after):
+        # Stored ISO text was naive IST
+        moment = datetime.fromisoformat(old[1]).replace(tzinfo=IST)
+        assert new['timestamp'] == (moment - datetime(1970, 1, 1, tzinfo=timezone.utc)) // timedelta(milliseconds=1)
+        assert (new['id'],) + tuple(new)[2:-1] == (old[0],) + old[2:]
+        assert new['station_id'] == app.DEFAULT_STATION
+    assert conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'weather_readings'").fetchone()[0] == 97
+    conn.close()
+
+
+def test_unparseable_legacy_timestamps_do_not_stop_the_upgrade(shipped):
+    before = shipped_rows()
+    legacy = sqlite3.connect(shipped)
+    for value in ('18/10/2025 10:00', 'yesterday', ' 2025-10-18T10:05:00 '):
+        legacy.execute("INSERT INTO weather_readings (timestamp, temperature, humidity, pressure, air_quality, "
+                       "wind_speed, wind_direction, rainfall) VALUES (?, 20, 50, 1000, 40, 1, 90, 0)", (value,))
+    legacy.commit()
+    legacy.close()
+    app.init_database()
+
+    conn = app.get_db_connection()
+    stamps = [row[0] for row in conn.execute("SELECT timestamp FROM weather_readings WHERE id > ? ORDER BY id",
+                                             (len(before),))]
+    # The unknown one is placed just after the reading before it
+    known = app.parse_timestamp('2025-10-18T10:00:00')
+    assert stamps == [known, known + 1, app.parse_timestamp('2025-10-18T10:05:00')]
+    conn.close()
+
+
+def test_upgraded_database_serves_the_shipped_readings(shipped):
+    before = shipped_rows()
+    app.init_database()
+    client = app.app.test_client()
+
+    stats = client.get('/api/stats').get_json()
+    assert stats['total_readings'] == len(before)
+    assert stats['total_rainfall'] == pytest.approx(sum(row[8] for row in before))
+    latest = client.get('/api/latest').get_json()
+    assert latest['id'] == max(before, key=lambda row: row[1])[0]
+    assert latest['timestamp'].startswith(max(row[1] for row in before)[:23])
+
+
+def test_migrations_run_once(shipped):
+    app.init_database()
+    conn = app.get_db_connection()
+    assert app.migrate_database(conn) == []
+    conn.close()
+
+
+def roll_up_before_stations(conn):
+    """
+    Fill the rollup tables as compaction did before migration 10, with
+    one row per bucket for all stations
+    """
+    columns = ['bucket', 'count'] + [f'{metric}_{agg}' for metric in app.METRICS for agg in ('sum', 'min', 'max')]
+    for resolution, length in app.ROLLUP_RESOLUTIONS.items():
+        selects = [f'timestamp - (timestamp + {app.IST_MS}) % {length}', 'COUNT(*)']
+        selects += [f'{agg}({metric})' for metric in app.METRICS for agg in ('SUM', 'MIN', 'MAX')]
+        conn.execute(f"DELETE FROM weather_rollup_{resolution}")
+        conn.execute(f"INSERT INTO weather_rollup_{resolution} ({', '.join(columns)}) "
+                     f"SELECT {', '.join(selects)} FROM weather_readings GROUP BY 1")
+        conn.execute("INSERT OR REPLACE INTO rollup_state (resolution, last_id) "
+                     "SELECT ?, MAX(id) FROM weather_readings", (resolution,))
+    conn.commit()
+
+
+def test_unique_reading_keys_drop_duplicates_from_rollups(shipped, monkeypatch):
+    migrations = app.MIGRATIONS
+    monkeypatch.setattr(app, 'MIGRATIONS', migrations[:8])
+    app.init_database()
+    conn = app.get_db_connection()
+    # Redeliveries stored before the unique index, and rolled up with them
+    conn.execute(f"""
+        INSERT INTO weather_readings ({', '.join(app.READING_COLUMNS[1:])})
+        SELECT {', '.join(app.READING_COLUMNS[1:])} FROM weather_readings WHERE id % 10 = 0
+    """)
+    roll_up_before_stations(conn)
+    monkeypatch.setattr(app, 'MIGRATIONS', migrations[:9])
+
+    assert app.migrate_database(conn) == [9]
+    # The first copy of each reading is kept
+    ids = [row[0] for row in conn.execute("SELECT id FROM weather_readings ORDER BY id")]
+    assert ids == [row[0] for row in shipped_rows()]
+    for resolution, length in app.ROLLUP_RESOLUTIONS.items():
+        rollup = conn.execute(
+            f"SELECT bucket, count, rainfall_sum FROM weather_rollup_{resolution} ORDER BY bucket"
+        ).fetchall()
+        expected = conn.execute(
+            f"SELECT timestamp - (timestamp + {app.IST_MS}) % {length}, COUNT(*), SUM(rainfall) "
+            f"FROM weather_readings GROUP BY 1 ORDER BY 1"
+        ).fetchall()
+        assert [tuple(row)[:2] for row in rollup] == [tuple(row)[:2] for row in expected]
+        assert [row[2] for row in rollup] == pytest.approx([row[2] for row in expected])
+
+    index = conn.execute(
+        "SELECT \"unique\" FROM pragma_index_list('weather_readings') "
+        "WHERE name = 'idx_weather_readings_station_timestamp'"
+    ).fetchone()
+    assert index[0] == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute(f"INSERT INTO weather_readings ({', '.join(app.READING_COLUMNS[1:])}) "
+                     f"SELECT {', '.join(app.READING_COLUMNS[1:])} FROM weather_readings LIMIT 1")
+    conn.close()
+
+
+def test_rollups_are_split_by_station(shipped, monkeypatch):
+    migrations = app.MIGRATIONS
+    monkeypatch.setattr(app, 'MIGRATIONS', migrations[:9])
+    app.init_database()
+    conn = app.get_db_connection()
+    app.register_station(conn, 'roof')
+    june, august = app.parse_timestamp('2025-06-10T00:00:00'), app.parse_timestamp('2025-08-10T00:00:00')
+    app.insert_readings(conn, [reading(june + i * 600_000, station, rainfall=1.0)
+                               for i in range(12) for station in ('default', 'roof')])
+    app.insert_readings(conn, [reading(august + i * 600_000, 'roof', temperature=float(i)) for i in range(12)])
+    roll_up_before_stations(conn)
+    # June is dropped, August sealed and the shipped readings archived
+    monkeypatch.setattr(app, 'RETENTION_DAYS', 170)
+    app.archive_partitions(conn, now=app.parse_timestamp('2026-01-01T00:00:00'))
+    assert [tuple(row) for row in conn.execute(
+        "SELECT month, dropped_at IS NOT NULL, sealed_at IS NOT NULL FROM partitions ORDER BY month"
+    )] == [('2025-06', 1, 0), ('2025-08', 0, 1), ('2025-10', 0, 0), ('2025-11', 0, 0)]
+    before = app.query_rollup(conn, 'hour')
+
+    monkeypatch.setattr(app, 'MIGRATIONS', migrations)
+    assert app.migrate_database(conn) == [10]
+    after = app.query_rollup(conn, 'hour')
+    assert [(row['bucket'], row['count']) for row in after] == [(row['bucket'], row['count']) for row in before]
+    assert [row['sum_rainfall'] for row in after] == pytest.approx([row['sum_rainfall'] for row in before])
+
+    roof = app.query_rollup(conn, 'day', station_id='roof')
+    assert [(row['bucket'], row['count'], row['max_temperature']) for row in roof] == [
+        (app.format_timestamp(app.bucket_start(august, 'day')), 12, 11.0)]
+    assert sum(row['count'] for row in app.query_rollup(conn, 'day', station_id='default')) == len(shipped_rows())
+
+    # Compaction adds to the station's own buckets
+    app.insert_readings(conn, [reading(august + 7_200_000 + 1, 'roof', temperature=30.0)])
+    app.compact_rollups(conn)
+    roof = app.query_rollup(conn, 'day', station_id='roof')
+    assert (roof[0]['count'], roof[0]['max_temperature']) == (13, 30.0)
+    conn.close()
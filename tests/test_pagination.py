@@ -0,0 +1,36 @@
+import base64
+import json
+
+import pytest
+
+import app
+from tests.conftest import reading
+
+START = 1_760_000_000_000
+
+
+def test_cursors_page_through_every_reading(client):
+    client.post('/api/data/batch', json=[reading(START + i * 1000) for i in range(25)])
+    for order in ('asc', 'desc'):
+        ids, url = [], f'/api/data?limit=10&order={order}'
+        while url:
+            page = client.get(url).get_json()
+            ids += [row['id'] for row in page['data']]
+            url = page['next_cursor'] and f"/api/data?limit=10&order={order}&cursor={page['next_cursor']}"
+        assert ids == sorted(range(1, 26), reverse=order == 'desc')
+
+
+@pytest.mark.parametrize('position', [[1, None], ['x', 1], [None, 1], [True, 1], [1.5, 1], [2 ** 70, 1],
+                                      [1, -1], [1], {}])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_malformed_cursors_are_rejected(client, position, order):
+    cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+    response = client.get(f'/api/data?order={order}&cursor={cursor}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+def test_cursor_round_trips():
+    assert app.decode_cursor(app.encode_cursor(START, 42)) == (START, 42)
+    with pytest.raises(ValueError):
+        app.decode_cursor('not base64!')
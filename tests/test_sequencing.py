@@ -0,0 +1,163 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import app
+from tests.conftest import reading
+
+START = 1_790_000_000_000
+
+
+def upload(db, session, seqs, station_id='default'):
+    """
+    Store one sequenced upload; returns the seqs kept and the new ack
+    """
+    readings = [reading(START + session * 1_000_000 + seq, station_id) for seq in seqs]
+    stored = app.insert_readings(db, readings, [(session, seq) for seq in seqs])
+    return [seq for seq, data in zip(seqs, stored) if data is not None], app.sequence_ack(station_id, session)
+
+
+def test_in_order_readings_are_stored_and_acked(db):
+    assert upload(db, 1, [1, 2, 3]) == ([1, 2, 3], 3)
+    assert upload(db, 1, [4]) == ([4], 4)
+
+
+def test_replayed_readings_are_skipped(db):
+    upload(db, 1, [1, 2, 3])
+    assert upload(db, 1, [2, 3, 4, 5]) == ([4, 5], 5)
+    assert upload(db, 1, [1, 2, 3, 4, 5]) == ([], 5)
+
+
+def test_readings_past_a_gap_wait_for_the_missing_one(db):
+    upload(db, 1, [1, 2])
+    assert upload(db, 1, [4, 5]) == ([], 2)
+    assert upload(db, 1, [3, 4, 5]) == ([3, 4, 5], 5)
+
+
+def test_a_gap_inside_one_upload_stops_it_there(db):
+    assert upload(db, 1, [1, 2, 4, 5]) == ([1, 2], 2)
+
+
+def test_new_session_starts_again_from_one(db):
+    upload(db, 1, [1, 2, 3])
+    assert upload(db, 2, [1, 2]) == ([1, 2], 2)
+    # The node rebooted without having uploaded seq 1 of the new session
+    assert upload(db, 3, [2]) == ([], 0)
+
+
+def test_older_session_is_stale(db):
+    upload(db, 2, [1])
+    assert upload(db, 1, [1, 2]) == ([], 0)
+    assert app.sequence_ack('default', 2) == 1
+
+
+def test_stations_are_sequenced_separately(db):
+    app.register_station(db, 'roof')
+    upload(db, 1, [1, 2], 'roof')
+    assert upload(db, 1, [1]) == ([1], 1)
+    assert upload(db, 1, [3], 'roof') == ([3], 3)
+
+
+def test_positions_survive_a_restart(db):
+    upload(db, 5, [1, 2, 3])
+    app._station_sequences.clear()
+    assert upload(db, 5, [3, 4]) == ([4], 4)
+    assert tuple(db.execute("SELECT seq_session, last_seq FROM stations WHERE station_id = 'default'")
+                 .fetchone()) == (5, 4)
+
+
+def test_unsequenced_readings_in_the_same_group_are_stored(db):
+    readings = [reading(START + i) for i in range(4)]
+    stored = app.insert_readings(db, readings, [None, (1, 1), None, (1, 3)])
+    assert [data is not None for data in stored] == [True, True, True, False]
+
+
+def test_redelivered_readings_are_skipped(db):
+    first = app.insert_readings(db, [reading(START), reading(START + 1)])
+    again = app.insert_readings(db, [reading(START + 1), reading(START + 2), reading(START + 2)])
+    assert [data is not None for data in again] == [False, True, False]
+    assert again[1]['id'] > first[1]['id']
+    assert db.execute("SELECT COUNT(*) FROM weather_readings").fetchone()[0] == 3
+
+
+def test_readings_stamped_on_arrival_are_never_skipped(db):
+    # As if another process had stamped one in the same millisecond
+    app.insert_readings(db, [reading(START), reading(START + 1)])
+    stamped = [dict(reading(START), **{app.STAMPED: True}) for _ in range(2)]
+    stored = app.insert_readings(db, stamped)
+    assert [data['timestamp'] for data in stored] == [START + 2, START + 3]
+    assert app.server_timestamps('default')[0] > START + 3
+    assert db.execute("SELECT COUNT(*) FROM weather_readings").fetchone()[0] == 4
+
+
+def test_upload_endpoint_acks(client):
+    body = {'station_id': 'default', 'session': 7,
+            'readings': [dict(reading(START + seq), seq=seq) for seq in (1, 2, 3)]}
+    response = client.post('/api/data/upload', json=body)
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'session': 7, 'ack': 3, 'inserted': 3}
+
+    response = client.post('/api/data/upload', json=body)
+    assert response.get_json()['ack'] == 3
+    assert response.get_json()['inserted'] == 0
+
+
+@pytest.mark.parametrize('seqs, error', [
+    ([2, 1], 'seq must increase'),
+    ([1, 1], 'seq must increase'),
+    ([0], 'seq must be an integer'),
+    ([True], 'seq must be an integer'),
+    ([2 ** 32], 'seq must be an integer'),
+])
+def test_upload_endpoint_rejects_bad_seqs(client, seqs, error):
+    body = {'station_id': 'default', 'session': 1,
+            'readings': [dict(reading(START + i), seq=seq) for i, seq in enumerate(seqs)]}
+    response = client.post('/api/data/upload', json=body)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+
+@pytest.mark.parametrize('session', [None, -1, 2 ** 32, '1'])
+def test_upload_endpoint_rejects_bad_sessions(client, session):
+    body = {'station_id': 'default', 'session': session, 'readings': [dict(reading(START), seq=1)]}
+    assert client.post('/api/data/upload', json=body).status_code == 400
+
+
+def packet(session, seqs, station_id=b'default', stamped=True):
+    records = np.zeros(len(seqs), app.PACKET_RECORD)
+    records['seq'] = seqs
+    if stamped:
+        records['timestamp'] = [START + session * 1_000_000 + seq for seq in seqs]
+    records['temperature'] = 19.5
+    header = app.PACKET_HEADER.pack(app.PACKET_MAGIC, app.PACKET_SEQUENCED_VERSION, len(station_id), len(seqs))
+    return header + app.PACKET_SESSION.pack(session) + station_id + records.tobytes()
+
+
+def test_sequenced_packets_are_acked(db):
+    def send(session, seqs):
+        magic, status, ack = app.PACKET_ACK.unpack(asyncio.run(app._ingest_packet(packet(session, seqs))))
+        assert (magic, status) == (app.PACKET_ACK_MAGIC, app.PACKET_OK)
+        return ack
+
+    assert send(1, [1, 2, 3]) == 3
+    assert send(1, [2, 3]) == 3
+    assert send(1, [5]) == 3
+    assert send(2, [1]) == 1
+    assert db.execute("SELECT COUNT(*) FROM weather_readings").fetchone()[0] == 4
+
+
+def test_only_registered_stations_get_arrival_stamps(db):
+    def send(station_id):
+        return app.PACKET_ACK.unpack(asyncio.run(app._ingest_packet(packet(1, [1, 2], station_id, False))))[1]
+
+    assert send(b'made-up') == app.PACKET_UNKNOWN_STATION
+    assert 'made-up' not in app._server_timestamps
+    assert send(b'default') == app.PACKET_OK
+    stamps = [row[0] for row in db.execute("SELECT timestamp FROM weather_readings ORDER BY id")]
+    assert len(stamps) == 2 and 0 < stamps[0] < stamps[1] == app._server_timestamps['default']
+
+
+def test_packets_with_decreasing_seqs_are_invalid(db):
+    with pytest.raises(ValueError):
+        app.decode_packet(packet(1, [2, 1]))
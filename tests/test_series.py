@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import app
+from tests.conftest import reading
+
+START = app.parse_timestamp('2025-10-18T10:00:00')
+
+
+def post_two_stations(client, db):
+    app.register_station(db, 'roof')
+    client.post('/api/data/batch', json=[reading(START + i * 60_000, station, temperature=float(i) + offset)
+                                         for i in range(10) for station, offset in (('default', 0), ('roof', 100))])
+
+
+def test_series_are_kept_apart_per_station(db, client):
+    post_two_stations(client, db)
+    window = f'metric=temperature&from={START}&to={START + 600_000}'
+    stations = client.get(f'/api/series?{window}').get_json()['stations']
+    assert sorted(stations) == ['default', 'roof']
+    assert stations['default']['temperature']['value'] == [float(i) for i in range(10)]
+    assert stations['roof']['temperature']['value'] == [float(i) + 100 for i in range(10)]
+
+    roof = client.get(f'/api/stations/roof/series?{window}').get_json()['series']
+    assert roof == stations['roof']
+    assert client.get(f'/api/stations/nowhere/series?{window}').status_code == 404
+
+
+def test_rollups_per_station(db, client):
+    post_two_stations(client, db)
+    app.compact_rollups(db)
+    window = f'from={START}&to={START + 600_000}&resolution=hour'
+    [both] = client.get(f'/api/rollup?{window}').get_json()['data']
+    [roof] = client.get(f'/api/stations/roof/rollup?{window}').get_json()['data']
+    assert (both['count'], both['min_temperature'], both['max_temperature']) == (20, 0.0, 109.0)
+    assert (roof['count'], roof['min_temperature'], roof['max_temperature']) == (10, 100.0, 109.0)
+    assert client.get(f'/api/stations/nowhere/rollup?{window}').status_code == 404
+
+
+def noisy_line(size):
+    rng = np.random.default_rng(size)
+    x = np.arange(size, dtype=np.float64) * 1000
+    return x, np.sin(x / 50_000) * 10 + rng.normal(0, 1, size)
+
+
+@pytest.mark.parametrize('size, points', [(1000, 100), (1000, 3), (101, 100), (10_000, 999)])
+def test_lttb_keeps_the_ends_within_the_budget(size, points):
+    x, y = noisy_line(size)
+    index = app.lttb(x, y, points)
+    assert len(index) == points
+    assert index[0] == 0 and index[-1] == size - 1
+    assert (np.diff(index) > 0).all()
+
+
+def test_lttb_keeps_a_lone_spike():
+    x, y = noisy_line(1000)
+    y[637] = 1000
+    assert 637 in app.lttb(x, y, 50)
+
+
+@pytest.mark.parametrize('size, points', [(0, 10), (1, 10), (10, 10), (5, 300)])
+def test_short_series_are_returned_whole(size, points):
+    x, y = noisy_line(size)
+    np.testing.assert_array_equal(app.lttb(x, y, points), np.arange(size))
+    np.testing.assert_array_equal(app.minmax_downsample(y, points), np.arange(size))
+
+
+@pytest.mark.parametrize('size, points', [(1000, 100), (1000, 3), (101, 100), (10_000, 999)])
+def test_minmax_keeps_every_extreme_within_the_budget(size, points):
+    x, y = noisy_line(size)
+    index = app.minmax_downsample(y, points)
+    assert len(index) <= points
+    assert index[0] == 0 and index[-1] == size - 1
+    assert (np.diff(index) > 0).all()
+    if points >= 4:
+        assert y.argmin() in index and y.argmax() in index
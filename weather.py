@@ -0,0 +1,300 @@
+"""
+Production entry point for the weather monitoring server:
+
+    python -m weather serve --workers 4
+
+The master process binds the dashboard/API port and the sensor
+ingestion ports (HTTP, and TCP and UDP for binary packets) and runs, on
+those shared sockets, one writer process that owns ingestion, rollups
+and archiving, and N reader processes that serve the Flask app from
+the shared WAL-mode database. Readers follow the writer's commits, so
+every worker serves current data and gives it the same ETag.
+
+SIGHUP reloads: a fresh set of processes running the current code is
+started on the same sockets, then the old ones stop accepting and exit
+once the requests they hold are answered, so no sensor post is dropped.
+SIGTERM and SIGINT shut everything down the same way.
+
+Sensors still posting to the dashboard port (the original firmware
+does) are relayed by the readers to the writer's ingestion server.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+
+import app
+
+# Dashboard and API port; the ingestion ports are app.INGEST_PORT and
+# app.PACKET_PORT
+DEFAULT_PORT = 5000
+
+# Seconds a stopping worker gets to answer the requests it holds, and
+# a starting one to report that it is serving
+GRACEFUL_TIMEOUT = 30
+START_TIMEOUT = 60
+
+# Kept-open connections each reader holds to the writer for relaying
+# sensor posts, and how long (seconds) a relayed post may take; a batch
+# waits for its commit, which may wait out a busy database
+FORWARD_POOL_SIZE = 8
+FORWARD_TIMEOUT = app.INGEST_BUSY_TIMEOUT + GRACEFUL_TIMEOUT
+
+# Response headers passed back from the writer
+FORWARD_HEADERS = ('content-type', 'retry-after', 'allow')
+
+# Idle relay connections of this reader process
+_forward_pool = queue.LifoQueue()
+
+
+def log(message):
+    print(f"[weather {os.getpid()}] {message}", flush=True)
+
+
+# worker process functions
+
+def _handle_stop_signals(stop):
+    """
+    Workers leave SIGINT and SIGHUP to the master and stop on SIGTERM
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop())
+
+
+def _writer_main(ingest_sock, packet_tcp_sock, packet_udp_sock, boot, counter, ready):
+    stopping = threading.Event()
+    _handle_stop_signals(stopping.set)
+    app.share_data_version(boot, counter)
+    app.init_database()
+    app.start_ingest_server(sock=ingest_sock, packet_socks=(packet_tcp_sock, packet_udp_sock),
+                            drain_timeout=GRACEFUL_TIMEOUT)
+    app.start_rollup_worker()
+    ready.set()
+
+    stopping.wait()
+    # Answers the posts in flight and commits everything queued
+    app.stop_ingest_server()
+
+
+def _forward_ingest(address, method, path, body, content_type):
+    """
+    Relay a sensor post to the writer's ingestion server over a pooled
+    keep-alive connection. Returns (body, status, headers).
+    """
+    headers = {'Content-Type': content_type or 'application/json'}
+    while True:
+        try:
+            conn, reused = _forward_pool.get_nowait(), True
+        except queue.Empty:
+            conn, reused = http.client.HTTPConnection(*address, timeout=FORWARD_TIMEOUT), False
+        try:
+            conn.request(method, path, body, headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            if reused:
+                # Closed by the writer while pooled (e.g. on reload); the
+                # post never reached it, so send it on a fresh connection
+                continue
+            error = json.dumps({'error': 'Ingestion unavailable, retry later'})
+            return error, 503, {'Content-Type': 'application/json', 'Retry-After': '1'}
+        break
+
+    if response.will_close or _forward_pool.qsize() >= FORWARD_POOL_SIZE:
+        conn.close()
+    else:
+        _forward_pool.put(conn)
+    headers = {name: value for name, value in response.getheaders() if name.lower() in FORWARD_HEADERS}
+    return data, response.status, headers
+
+
+def _reader_main(http_sock, ingest_address, boot, counter, ready):
+    from flask import request
+    from werkzeug.serving import make_server
+
+    app.share_data_version(boot, counter)
+    app.init_database()
+    app.start_follower()
+
+    @app.app.before_request
+    def forward_ingest():
+        # Readings are only written by the writer process. Relay rather
+        # than redirect: sensor HTTP clients don't follow redirects.
+        if request.method == 'POST' and app.INGEST_ROUTE.fullmatch(request.path):
+            path = request.full_path if request.query_string else request.path
+            return _forward_ingest(ingest_address, request.method, path, request.get_data(),
+                                   request.content_type)
+
+    host, port = http_sock.getsockname()[:2]
+    server = make_server(host, port, app.app, threaded=True, fd=http_sock.fileno())
+    # Let server_close() wait for the requests in flight
+    server.daemon_threads = False
+    _handle_stop_signals(lambda: threading.Thread(target=server.shutdown).start())
+    ready.set()
+
+    server.serve_forever()
+    closer = threading.Thread(target=server.server_close, daemon=True)
+    closer.start()
+    closer.join(GRACEFUL_TIMEOUT)
+    # Long-lived streams still open reconnect to the new workers
+    os._exit(0)
+
+
+# master process functions
+
+class Generation:
+    """
+    One writer and its readers, started together and retired together
+    """
+
+    def __init__(self, ctx, sockets, workers, boot, counter):
+        http_sock, ingest_sock, packet_tcp_sock, packet_udp_sock = sockets
+        self.ctx = ctx
+        self.targets = [(_writer_main, (ingest_sock, packet_tcp_sock, packet_udp_sock))]
+        self.targets += [(_reader_main, (http_sock, _local_address(ingest_sock)))] * workers
+        self.shared = (boot, counter)
+        self.processes = []
+
+    def _spawn(self, target, args):
+        ready = self.ctx.Event()
+        process = self.ctx.Process(target=target, args=args + self.shared + (ready,),
+                                   name=target.__name__.strip('_'))
+        process.start()
+        deadline = time.monotonic() + START_TIMEOUT
+        while not ready.wait(0.1):
+            if not process.is_alive() or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError(f"{process.name} failed to start")
+        return process
+
+    def start(self):
+        """
+        Start the writer, which also migrates the database, then the
+        readers. Raises RuntimeError, leaving nothing running, if any
+        of them fails to start.
+        """
+        try:
+            for target, args in self.targets:
+                self.processes.append(self._spawn(target, args))
+        except Exception:
+            self.stop()
+            raise
+        log(f"serving with {len(self.processes) - 1} readers and a writer")
+
+    def respawn(self):
+        """
+        Replace processes that exited unexpectedly
+        """
+        for i, process in enumerate(self.processes):
+            if not process.is_alive():
+                log(f"{process.name} {process.pid} exited with {process.exitcode}; restarting")
+                self.processes[i] = self._spawn(*self.targets[i])
+
+    def stop(self):
+        """
+        Ask every process to finish its requests and exit; kill those
+        still running after GRACEFUL_TIMEOUT
+        """
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT + 5
+        for process in self.processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                log(f"{process.name} {process.pid} did not stop; killing it")
+                process.kill()
+                process.join()
+
+
+def _local_address(sock):
+    """
+    Address on which this host reaches a listening socket
+    """
+    host, port = sock.getsockname()[:2]
+    if host in ('0.0.0.0', '::'):
+        host = '127.0.0.1' if host == '0.0.0.0' else '::1'
+    return host, port
+
+
+def serve(host, port, ingest_port, packet_port, workers):
+    """
+    Run the server until SIGTERM or SIGINT, reloading on SIGHUP
+    """
+    # Workers import the app themselves, so a reload runs current code
+    ctx = multiprocessing.get_context('spawn')
+    sockets = (socket.create_server((host, port), backlog=app.INGEST_BACKLOG),
+               socket.create_server((host, ingest_port), backlog=app.INGEST_BACKLOG),
+               *app.bind_packet_sockets(host, packet_port))
+    boot, counter = os.urandom(4).hex(), ctx.Value('q', 0)
+
+    requested = []
+    signal.signal(signal.SIGHUP, lambda signum, frame: requested.append('reload'))
+    signal.signal(signal.SIGTERM, lambda signum, frame: requested.append('stop'))
+    signal.signal(signal.SIGINT, lambda signum, frame: requested.append('stop'))
+
+    def generation():
+        return Generation(ctx, sockets, workers, boot, counter)
+
+    current = generation()
+    current.start()
+    log(f"dashboard on http://{host}:{port}, sensors post to http://{host}:{ingest_port}/api/data "
+        f"or send packets to TCP/UDP port {packet_port}")
+
+    while True:
+        time.sleep(0.5)
+        if 'stop' in requested:
+            break
+        if 'reload' in requested:
+            requested.clear()
+            log("reloading")
+            # Both generations accept on the sockets until the old one stops
+            fresh = generation()
+            try:
+                fresh.start()
+            except RuntimeError as e:
+                log(f"reload failed, keeping the running workers: {e}")
+                continue
+            current.stop()
+            current = fresh
+            log("reloaded")
+            continue
+        current.respawn()
+
+    log("shutting down")
+    current.stop()
+    for sock in sockets:
+        sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m weather', description='Weather monitoring server')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='run the production server')
+    serve_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                              help='reader processes (default: one per CPU)')
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                              help='dashboard and API port')
+    serve_parser.add_argument('--ingest-port', type=int, default=app.INGEST_PORT,
+                              help='sensor ingestion port')
+    serve_parser.add_argument('--packet-port', type=int, default=app.PACKET_PORT,
+                              help='binary packet port (TCP and UDP)')
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    serve(args.host, args.port, args.ingest_port, args.packet_port, args.workers)
+
+
+if __name__ == '__main__':
+    sys.exit(main())